@@ -4,9 +4,10 @@
 
 #define LED_PIN 12                // pin the LED strip is connected to [INT]
 #define LED_NUMBER 86             // number of LEDs in a strip [INT]
-#define MAXIMUM_BRIGHTNESS 127    // maximum brightness of all LEDs [BYTE]
+#define MAXIMUM_BRIGHTNESS 255    // maximum brightness of all LEDs [BYTE], the transmitter limits it with the `brightness` setting
 #define BAUDRATE 9600             // baud rate for serial communication [INT]
-#define TIMEOUT_ITERATIONS 20000  // play the shutdown animation after this many iterations without any serial data [INT]
+#define TIMEOUT 3000              // play the shutdown animation after this many milliseconds without any serial data [INT]
+#define FRAME_TIMEOUT 50          // milliseconds to wait for the rest of a binary frame [INT]
 
 //////////// END OF USER SETTINGS ////////////
 
@@ -16,14 +17,25 @@
 Adafruit_NeoPixel strip = Adafruit_NeoPixel(LED_NUMBER, LED_PIN, NEO_GRB + NEO_KHZ800);
 Adafruit_NeoPixel onboard_pixel = Adafruit_NeoPixel(1, 8, NEO_GRB + NEO_KHZ800);
 
+// protocol constants, must match transmitter/protocol.py
+// version 2 added the delta packets
+#define PROTOCOL_VERSION 2
+#define MAGIC_1 0xF1
+#define MAGIC_2 0xA5
+#define PACKET_FRAME 0x01
+#define PACKET_DELTA 0x02
+#define FLAG_CHECKSUM 0x80
+
 // variables
 byte led_index = 0;
 byte led_red = 0;
 byte led_green = 0;
 byte led_blue = 0;
-int unavailable_count = 0;
+unsigned long last_data = 0;  // millis() of the last packet
 bool onOffSwitch = true;  // false if the strip should be off
 int index = 0;
+byte frame_buffer[LED_NUMBER * 3];
+byte mask_buffer[(LED_NUMBER + 7) / 8];
 
 
 void setup()
@@ -41,6 +53,7 @@ void setup()
 
     // initialise serial communication
     Serial.begin(BAUDRATE);
+    Serial.setTimeout(FRAME_TIMEOUT);
 }
 
 void loop()
@@ -48,13 +61,26 @@ void loop()
     if (Serial.available())
     { 
         // wait for the starting character
-        if (Serial.read() != '>')
+        int start = Serial.read();
+        if (start == '?') {
+            // handshake, tell the transmitter that binary frames are supported
+            Serial.print("flashy:");
+            Serial.print(PROTOCOL_VERSION);
+            Serial.print("\n");
+            return;
+        }
+        if (start != '>' && start != MAGIC_1)
             return;
 
         // if the serial data is coming in, reset the variables used to shut down
-        unavailable_count = 0;
+        last_data = millis();
         onOffSwitch = true;
 
+        if (start == MAGIC_1) {
+            readBinaryFrame();
+            return;
+        }
+
         // read the next 12 characters
         led_index = readSerialThreeDigitNumber();
         led_red = readSerialThreeDigitNumber();
@@ -75,16 +101,68 @@ void loop()
         }
     } else {
         // logic to turn off LEDs if no serial data is coming in for a while
-        if (unavailable_count > TIMEOUT_ITERATIONS && onOffSwitch)
+        // the transmitter sends the frame again every second if nothing changes
+        if (millis() - last_data > TIMEOUT && onOffSwitch)
         {
             shutdownSequence();
             onOffSwitch = false;
-        } else {
-            unavailable_count++;
         }
     }
 }
 
+void readBinaryFrame()
+{
+    // read the rest of the header: second magic byte, packet type and LED count
+    byte header[4];
+    if (Serial.readBytes(header, 4) != 4 || header[0] != MAGIC_2)
+        return;
+    byte packet_type = header[1] & ~FLAG_CHECKSUM;
+    unsigned int count = ((unsigned int)header[2] << 8) | header[3];
+    if ((packet_type != PACKET_FRAME && packet_type != PACKET_DELTA) || count > LED_NUMBER)
+        return;
+    byte sum = header[2] + header[3];
+
+    // delta packets only carry the colours of the LEDs set in the bitmask
+    unsigned int changed = count;
+    if (packet_type == PACKET_DELTA) {
+        unsigned int mask_length = (count + 7) / 8;
+        if (Serial.readBytes(mask_buffer, mask_length) != mask_length)
+            return;
+        for (unsigned int i = 0; i < mask_length; i++)
+            sum += mask_buffer[i];
+        // only the bits of the LEDs, a corrupted packet may set the padding bits of the last byte
+        // and must not read more colours than frame_buffer holds
+        changed = 0;
+        for (unsigned int i = 0; i < count; i++)
+            changed += bitRead(mask_buffer[i / 8], i % 8);
+    }
+
+    // read the colours and verify them before touching the strip
+    unsigned int length = changed * 3;
+    if (Serial.readBytes(frame_buffer, length) != length)
+        return;
+    if (header[1] & FLAG_CHECKSUM) {
+        for (unsigned int i = 0; i < length; i++)
+            sum += frame_buffer[i];
+        byte expected;
+        if (Serial.readBytes(&expected, 1) != 1 || expected != sum)
+            return;
+    }
+
+    unsigned int position = 0;
+    for (unsigned int i = 0; i < count; i++) {
+        if (packet_type == PACKET_DELTA && !bitRead(mask_buffer[i / 8], i % 8))
+            continue;
+        updateLEDValue(i, frame_buffer[position], frame_buffer[position + 1], frame_buffer[position + 2]);
+        position += 3;
+    }
+
+    // the whole frame is in, refresh the strip exactly once
+    strip.show();
+    onboard_pixel.show();
+    index = 0;
+}
+
 byte readSerialThreeDigitNumber()
 {
     // read and parse 3 consecutive characters into a byte value
@@ -0,0 +1,230 @@
+import numpy as np
+import pytest
+
+from transmitter.filters import BlackGateFilter, EmaFilter, FilterChain, MedianFilter, SlewFilter
+
+LENGTH = 8
+
+
+def _frames(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, size=(LENGTH, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def _apply(f, colours):
+    mask = np.ones(len(colours), dtype=bool)
+    out = f.apply(colours, mask)
+    return out.copy(), mask
+
+
+def _median(lst):
+    # the per-channel median the Linux flicker workaround used to take
+    sortedLst = sorted(lst)
+    lstLen = len(lst)
+    index = (lstLen - 1) // 2
+
+    if (lstLen % 2):
+        return sortedLst[index]
+    else:
+        return (sortedLst[index] + sortedLst[index + 1])/2.0
+
+
+class _ReferenceBlackGate:
+    """The per-LED black frame counting the MacOS flicker workaround used to do."""
+    def __init__(self, length, limit):
+        self._black_pixel_counts = [0] * length
+        self._black_pixel_limit = limit
+
+    def apply(self, items):
+        result = []
+        for i, item in enumerate(items):
+            if item == (0, 0, 0) and self._black_pixel_counts[i] <= self._black_pixel_limit:
+                item = None
+                self._black_pixel_counts[i] += 1
+            elif item != (0, 0, 0):
+                self._black_pixel_counts[i] = 0
+            result.append(item)
+        return result
+
+
+def test_median_matches_reference():
+    frames = _frames(20)
+    f = MedianFilter(LENGTH, frames=5)
+    for count, colours in enumerate(frames, start=1):
+        out, mask = _apply(f, colours)
+        window = frames[max(0, count - 5):count]
+        expected = [[np.round(_median([int(frame[led][channel]) for frame in window])) for channel in range(3)]
+                    for led in range(LENGTH)]
+        assert np.array_equal(out, np.array(expected, dtype=np.uint8))
+        assert mask.all()
+
+
+def test_median_removes_a_single_frame_flash():
+    f = MedianFilter(LENGTH, frames=3)
+    grey = np.full((LENGTH, 3), 100, dtype=np.uint8)
+    for _ in range(3):
+        _apply(f, grey)
+    out, _ = _apply(f, np.zeros((LENGTH, 3), dtype=np.uint8))
+    assert np.array_equal(out, grey)
+
+
+def test_median_settled_and_reset():
+    f = MedianFilter(LENGTH, frames=3)
+    colours = _frames(1)[0]
+    assert not f.settled
+    for _ in range(2):
+        _apply(f, colours)
+    assert not f.settled
+    _apply(f, colours)
+    assert f.settled
+    _apply(f, _frames(1, seed=1)[0])
+    assert not f.settled
+
+    f.reset()
+    assert not f.settled
+    out, _ = _apply(f, colours)
+    # the frames from before the reset are forgotten
+    assert np.array_equal(out, colours)
+
+
+def test_median_rejects_no_frames():
+    with pytest.raises(ValueError):
+        MedianFilter(LENGTH, frames=0)
+
+
+def test_ema_matches_reference():
+    alpha = 0.25
+    frames = _frames(10)
+    f = EmaFilter(LENGTH, alpha=alpha)
+    average = frames[0].astype(np.float64)
+    for count, colours in enumerate(frames):
+        out, _ = _apply(f, colours)
+        if count:
+            average = average + alpha * (colours - average)
+        assert np.abs(out.astype(np.int16) - np.rint(average)).max() <= 1
+
+
+def test_ema_settled_and_reset():
+    f = EmaFilter(LENGTH, alpha=0.5)
+    black = np.zeros((LENGTH, 3), dtype=np.uint8)
+    white = np.full((LENGTH, 3), 255, dtype=np.uint8)
+    assert f.settled
+    _apply(f, black)
+    assert f.settled
+    out, _ = _apply(f, white)
+    assert not f.settled
+    assert np.all(out == 128)
+    # converges on a static frame and settles there
+    for _ in range(20):
+        out, _ = _apply(f, white)
+    assert np.array_equal(out, white)
+    assert f.settled
+
+    f.reset()
+    out, _ = _apply(f, black)
+    assert np.array_equal(out, black)
+
+
+def test_ema_rejects_alpha_out_of_range():
+    with pytest.raises(ValueError):
+        EmaFilter(LENGTH, alpha=0)
+    with pytest.raises(ValueError):
+        EmaFilter(LENGTH, alpha=1.5)
+
+
+def test_black_gate_matches_reference():
+    rng = np.random.default_rng(0)
+    frames = 5
+    f = BlackGateFilter(LENGTH, frames=frames)
+    # skipping `frames` black frames in a row is the old limit of `frames - 1`
+    reference = _ReferenceBlackGate(LENGTH, frames - 1)
+    for _ in range(200):
+        colours = rng.integers(0, 256, size=(LENGTH, 3), dtype=np.uint8)
+        # long runs of black on some LEDs, short flashes on others
+        colours[rng.random(LENGTH) < 0.6] = 0
+        out, mask = _apply(f, colours)
+        expected = reference.apply([tuple(int(value) for value in colour) for colour in colours])
+        assert mask.tolist() == [item is not None for item in expected]
+        assert np.array_equal(out, colours)
+
+
+def test_black_gate_settled_and_reset():
+    f = BlackGateFilter(LENGTH, frames=2)
+    black = np.zeros((LENGTH, 3), dtype=np.uint8)
+    assert f.settled
+    _, mask = _apply(f, black)
+    assert not mask.any()
+    assert not f.settled
+    _apply(f, black)
+    _, mask = _apply(f, black)
+    # a black that lasts longer goes through
+    assert mask.all()
+    assert f.settled
+
+    f.reset()
+    _, mask = _apply(f, black)
+    assert not mask.any()
+
+
+def test_slew_limits_the_change_per_frame():
+    f = SlewFilter(LENGTH, limit=10)
+    _apply(f, np.zeros((LENGTH, 3), dtype=np.uint8))
+    target = np.full((LENGTH, 3), 35, dtype=np.uint8)
+    outputs = [_apply(f, target)[0] for _ in range(4)]
+    assert [int(out[0, 0]) for out in outputs] == [10, 20, 30, 35]
+    # and downwards
+    out, _ = _apply(f, np.zeros((LENGTH, 3), dtype=np.uint8))
+    assert np.all(out == 25)
+
+
+def test_slew_settled_and_reset():
+    f = SlewFilter(LENGTH, limit=10)
+    assert f.settled
+    _apply(f, np.zeros((LENGTH, 3), dtype=np.uint8))
+    white = np.full((LENGTH, 3), 255, dtype=np.uint8)
+    _apply(f, white)
+    assert not f.settled
+    for _ in range(30):
+        _apply(f, white)
+    assert f.settled
+
+    f.reset()
+    out, _ = _apply(f, np.zeros((LENGTH, 3), dtype=np.uint8))
+    assert np.all(out == 0)
+
+
+def test_slew_rejects_no_limit():
+    with pytest.raises(ValueError):
+        SlewFilter(LENGTH, limit=0)
+
+
+def test_chain_applies_the_filters_in_order():
+    chain = FilterChain.from_settings([{"type": "median", "frames": 3}, {"type": "slew", "limit": 20}], LENGTH)
+    median = MedianFilter(LENGTH, frames=3)
+    slew = SlewFilter(LENGTH, limit=20)
+    for colours in _frames(10):
+        out, _ = _apply(chain, colours)
+        expected = slew.apply(median.apply(colours, np.ones(LENGTH, dtype=bool)), np.ones(LENGTH, dtype=bool))
+        assert np.array_equal(out, expected)
+
+
+def test_chain_settled_and_reset():
+    chain = FilterChain.from_settings([{"type": "median", "frames": 2}, {"type": "black_gate", "frames": 1}], LENGTH)
+    colours = np.full((LENGTH, 3), 50, dtype=np.uint8)
+    _apply(chain, colours)
+    assert not chain.settled
+    _apply(chain, colours)
+    assert chain.settled
+
+    chain.reset()
+    assert not chain.settled
+    assert all(not f.settled for f in chain.filters if isinstance(f, MedianFilter))
+
+
+def test_chain_from_settings():
+    assert FilterChain.from_settings([], LENGTH).filters == []
+    chain = FilterChain.from_settings([{"type": "ema", "alpha": 0.3}], LENGTH)
+    assert isinstance(chain.filters[0], EmaFilter)
+    assert chain.filters[0].alpha == 0.3
+    with pytest.raises(ValueError):
+        FilterChain.from_settings([{"type": "blur"}], LENGTH)
@@ -0,0 +1,80 @@
+import time
+
+from transmitter.reader_supervisor import ReaderSupervisor
+
+INTERVAL = 0.02
+
+
+class _Worker:
+    """Stands in for a ScreenReaderProcess that crashes `lifetime` seconds after it starts, None to keep running."""
+    def __init__(self, name, lifetime, starts):
+        self.name = name
+        self.lifetime = lifetime
+        self.starts = starts
+        self.exitcode = None
+        self._started = None
+
+    def start(self):
+        self._started = time.monotonic()
+        self.starts.append(self._started)
+
+    def is_alive(self):
+        if self.lifetime is not None and time.monotonic() - self._started >= self.lifetime:
+            self.exitcode = 1
+            return False
+        return True
+
+    def copy(self):
+        return _Worker(self.name, self.lifetime, self.starts)
+
+    def close(self):
+        pass
+
+    def stop(self):
+        self.lifetime = 0
+
+    def join(self, timeout=None):
+        pass
+
+
+def _supervise(workers, duration, **kwargs):
+    supervisor = ReaderSupervisor(workers, interval=INTERVAL, **kwargs)
+    supervisor.start()
+    time.sleep(duration)
+    supervisor.stop()
+    supervisor.join()
+    return supervisor
+
+
+def test_a_worker_crashing_after_start_backs_off():
+    starts = []
+    # crashes soon after every start, but only once the supervisor saw it alive
+    _supervise([_Worker("reader", 3 * INTERVAL, starts)], 1.5, max_delay=100, min_uptime=1.0)
+    delays = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert 2 <= len(delays) <= 6
+    # the wait before every restart doubles, the first one is not immediate
+    waits = [delay - 3 * INTERVAL for delay in delays]
+    assert waits[0] >= INTERVAL
+    assert all(later > 1.5 * earlier for earlier, later in zip(waits, waits[1:]))
+
+
+def test_a_stable_worker_is_restarted_without_delay_again():
+    starts = []
+    supervisor = _supervise([_Worker("reader", 10 * INTERVAL, starts)], 1.0, max_delay=100, min_uptime=5 * INTERVAL)
+    # every run is longer than the minimum uptime, so the delay never grows
+    assert supervisor.restarts >= 3
+    assert max(later - earlier for earlier, later in zip(starts, starts[1:])) < 20 * INTERVAL
+
+
+def test_waiting_to_restart_one_worker_does_not_hold_up_the_others():
+    slow, fast = [], []
+    workers = [_Worker("slow", 0, slow), _Worker("fast", 0, fast)]
+    supervisor = ReaderSupervisor(workers, interval=INTERVAL, max_delay=100, min_uptime=100)
+    # the slow worker crashed a lot already, its next restart is far away
+    supervisor._failures[0] = 10
+    supervisor.start()
+    time.sleep(0.5)
+    supervisor.stop()
+    supervisor.join()
+    assert len(slow) == 1
+    assert len(fast) >= 3
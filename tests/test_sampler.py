@@ -0,0 +1,52 @@
+import random
+
+import numpy as np
+
+from transmitter.layout import layout_rects
+from transmitter.sampler import LedSampler
+
+WIDTH, HEIGHT = 640, 360
+
+
+def _perimeter():
+    rects = layout_rects({"edges": {"top": 20, "right": 10, "bottom": 20, "left": 10}, "depth": 0.1})
+    return [[int(x1 * WIDTH), int(y1 * HEIGHT), int(x2 * WIDTH), int(y2 * HEIGHT)] for x1, y1, x2, y2 in rects]
+
+
+def _summed(windows):
+    return LedSampler(np.zeros(0), np.zeros(0), np.zeros(len(windows), dtype=np.int64), windows=np.array(windows))
+
+
+def _gathered(windows):
+    return LedSampler.from_pixel_lists(
+        [[(x, y) for x in range(x1, x2) for y in range(y1, y2)] for x1, y1, x2, y2 in windows])
+
+
+def test_summed_windows_match_the_gathered_pixels():
+    windows = _perimeter()
+    random.Random(0).shuffle(windows)
+    frame = np.random.default_rng(0).integers(0, 256, size=(HEIGHT, WIDTH, 4), dtype=np.uint8)
+    assert np.array_equal(_summed(windows).sample(frame, (0, 0)), _gathered(windows).sample(frame, (0, 0)))
+
+
+def test_groups_do_not_depend_on_the_order_of_the_leds():
+    windows = _perimeter()
+    in_order = _summed(windows)
+    # a group per edge
+    assert len(in_order._groups) == 4
+    for seed in range(5):
+        shuffled = list(windows)
+        random.Random(seed).shuffle(shuffled)
+        sampler = _summed(shuffled)
+        assert sorted(bbox for _, bbox, *_ in sampler._groups) == sorted(bbox for _, bbox, *_ in in_order._groups)
+
+
+def test_summed_and_gathered_leds_mixed():
+    windows = _perimeter()[:12]
+    frame = np.random.default_rng(1).integers(0, 256, size=(HEIGHT, WIDTH, 4), dtype=np.uint8)
+    gathered = _gathered(windows)
+    # every other LED keeps its pixel list
+    mixed = LedSampler(gathered.xs, gathered.ys, gathered.starts,
+                       windows=np.array([window if i % 2 else [-1, -1, -1, -1] for i, window in enumerate(windows)]))
+    assert len(mixed.windows) == 6
+    assert np.array_equal(mixed.sample(frame, (0, 0)), gathered.sample(frame, (0, 0)))
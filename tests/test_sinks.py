@@ -0,0 +1,95 @@
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from transmitter.frame_buffer import FrameBuffer
+from transmitter.network_protocol import WledProtocol
+from transmitter.serial_transmitter_async import SerialTransmitterAsync
+
+LENGTH = 86
+
+
+@pytest.fixture
+def controller():
+    """A UDP socket standing in for a network controller, records the arrival time of every datagram."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(0.1)
+    arrivals = []
+    running = True
+
+    def receive():
+        while running:
+            try:
+                sock.recv(65536)
+            except socket.timeout:
+                continue
+            arrivals.append(time.monotonic())
+
+    thread = threading.Thread(target=receive, daemon=True)
+    thread.start()
+    yield sock.getsockname()[1], arrivals
+    running = False
+    thread.join()
+    sock.close()
+
+
+def _transmit(url, duration, static_frames=False):
+    """Write one frame, then either nothing, like readers skipping a static screen, or the same frame again."""
+    frame_buffer = FrameBuffer(LENGTH)
+    transmitter = SerialTransmitterAsync("test", frame_buffer, url)
+    transmitter.start()
+    colours = np.full((LENGTH, 3), 50, dtype=np.uint8)
+    frame_buffer.write(slice(None), colours)
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        if static_frames:
+            frame_buffer.write(slice(None), colours)
+        time.sleep(0.03)
+    transmitter.stop()
+    transmitter.join()
+    return transmitter
+
+
+@pytest.mark.parametrize("protocol", ["ddp", "e131", "wled"])
+def test_skipped_frames_are_resent_before_the_controller_times_out(controller, protocol):
+    port, arrivals = controller
+    transmitter = _transmit(f"{protocol}://127.0.0.1:{port}", 2.6)
+    assert transmitter.frames_refreshed >= 2
+    gaps = np.diff([arrivals[0]] + arrivals + [time.monotonic()])
+    # the controllers leave realtime mode after 2 s (WLED) or 2.5 s
+    assert gaps.max() < 1.5
+
+
+def test_unchanged_frames_are_resent_before_the_controller_times_out(controller):
+    port, arrivals = controller
+    transmitter = _transmit(f"ddp://127.0.0.1:{port}", 2.6, static_frames=True)
+    assert transmitter.frames_suppressed > 0
+    assert transmitter.frames_refreshed >= 2
+    assert np.diff(arrivals).max() < 1.5
+
+
+def test_wled_refresh_follows_the_timeout(controller):
+    port, arrivals = controller
+    _transmit(f"wled://127.0.0.1:{port}?timeout=1", 1.6)
+    assert np.diff(arrivals).max() < 0.8
+
+    assert WledProtocol(LENGTH, "127.0.0.1", timeout=1).refresh_interval == 0.5
+    assert WledProtocol(LENGTH, "127.0.0.1", timeout=255).refresh_interval == 1.0
+
+
+def test_network_sinks_get_whole_frames(controller):
+    port, arrivals = controller
+    frame_buffer = FrameBuffer(LENGTH)
+    transmitter = SerialTransmitterAsync("test", frame_buffer, f"ddp://127.0.0.1:{port}")
+    colours = np.zeros((LENGTH, 3), dtype=np.uint8)
+    frame_buffer.read(transmitter.snapshot)
+    full = transmitter.send_frame()
+    colours[3] = 200
+    frame_buffer.write(slice(None), colours)
+    frame_buffer.read(transmitter.snapshot)
+    assert transmitter.send_frame() == full
+    transmitter.close()
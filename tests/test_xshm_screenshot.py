@@ -0,0 +1,204 @@
+import ctypes
+import ctypes.util
+import os
+import shutil
+import subprocess
+import time
+from sys import platform
+
+import numpy as np
+import pytest
+
+from transmitter import xshm_screenshot
+from transmitter.screen_reader_async import capture_backend
+from transmitter.xshm_screenshot import XErrorEvent, XShmAttachError, XShmScreenshot
+
+needs_xlib = pytest.mark.skipif(
+    not platform.startswith("linux") or ctypes.util.find_library("X11") is None, reason="needs Linux and Xlib")
+needs_xvfb = pytest.mark.skipif(
+    not platform.startswith("linux") or shutil.which("Xvfb") is None, reason="needs Linux and Xvfb")
+
+WIDTH, HEIGHT = 320, 240
+
+
+@pytest.fixture(scope="module")
+def xvfb():
+    """Run Xvfb on a free display, and point DISPLAY at it."""
+    number = next(n for n in range(99, 200) if not os.path.exists(f"/tmp/.X11-unix/X{n}"))
+    server = subprocess.Popen(["Xvfb", f":{number}", "-screen", "0", f"{WIDTH}x{HEIGHT}x24", "-nolisten", "tcp"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while not os.path.exists(f"/tmp/.X11-unix/X{number}"):
+        if server.poll() is not None or time.time() > deadline:
+            server.kill()
+            pytest.skip("Xvfb did not start")
+        time.sleep(0.05)
+    display = os.environ.get("DISPLAY")
+    os.environ["DISPLAY"] = f":{number}"
+    yield
+    if display is None:
+        del os.environ["DISPLAY"]
+    else:
+        os.environ["DISPLAY"] = display
+    server.terminate()
+    server.wait()
+
+
+def _segments():
+    with open("/proc/sysvipc/shm") as shm:
+        return len(shm.readlines())
+
+
+@pytest.fixture
+def failing_attach(monkeypatch):
+    """Make XShmAttach fail the way it does over ssh -X, with an error that arrives on XSync."""
+    xshm_screenshot._load_libraries()
+
+    def attach(display, shminfo):
+        # BadAccess, reported by the error handler asynchronously
+        xshm_screenshot._errors[display].append(10)
+        return 1
+
+    monkeypatch.setattr(xshm_screenshot._xext, "XShmAttach", attach)
+
+
+BLOCK = 8
+
+
+@pytest.fixture
+def pattern(xvfb):
+    """Fill the root window with blocks of different colours in every channel.
+
+    Returns:
+        numpy.ndarray: RGB values of the screen, shape (HEIGHT, WIDTH, 3)
+    """
+    xlib = ctypes.CDLL(ctypes.util.find_library("X11"))
+    xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    xlib.XOpenDisplay.restype = ctypes.c_void_p
+    xlib.XDefaultScreen.argtypes = [ctypes.c_void_p]
+    xlib.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    xlib.XRootWindow.restype = ctypes.c_ulong
+    xlib.XCreateGC.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_void_p]
+    xlib.XCreateGC.restype = ctypes.c_void_p
+    xlib.XSetForeground.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_ulong]
+    xlib.XFillRectangle.argtypes = [
+        ctypes.c_void_p, ctypes.c_ulong, ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_uint, ctypes.c_uint]
+    xlib.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    xlib.XFreeGC.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+    xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+
+    display = xlib.XOpenDisplay(None)
+    root = xlib.XRootWindow(display, xlib.XDefaultScreen(display))
+    gc = xlib.XCreateGC(display, root, 0, None)
+    expected = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    for y in range(0, HEIGHT, BLOCK):
+        for x in range(0, WIDTH, BLOCK):
+            red, green, blue = (x * 7) % 256, (y * 5 + 40) % 256, (x * y + 90) % 256
+            # the 24 bit TrueColor visual of Xvfb
+            xlib.XSetForeground(display, gc, (red << 16) | (green << 8) | blue)
+            xlib.XFillRectangle(display, root, gc, x, y, BLOCK, BLOCK)
+            expected[y:y + BLOCK, x:x + BLOCK] = (red, green, blue)
+    xlib.XSync(display, 0)
+    xlib.XFreeGC(display, gc)
+    xlib.XCloseDisplay(display)
+    return expected
+
+
+@needs_xvfb
+def test_grab_matches_the_pattern(pattern):
+    assert XShmScreenshot.available()
+    # not aligned to the blocks and an odd width, so an offset or a stride bug shows
+    bbox = (13, 21, 114, 70)
+    width, height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    expected = pattern[bbox[1]:bbox[3], bbox[0]:bbox[2]]
+    with XShmScreenshot(bbox) as capture:
+        frame = capture.grab()
+        assert frame.shape[0] == height
+        assert frame.shape[1] >= width
+        # BGRX -> RGB
+        shm_pixels = frame[:, :width, 2::-1].copy()
+    with capture_backend("mss")(bbox=bbox) as capture:
+        mss_pixels = np.asarray(capture.grab())[:, :width, 2::-1]
+    assert len(np.unique(expected.reshape(-1, 3), axis=0)) > 50
+    assert np.array_equal(shm_pixels, expected)
+    assert np.array_equal(mss_pixels, expected)
+
+
+@needs_xvfb
+def test_close_frees_the_segment(xvfb):
+    before = _segments()
+    capture = XShmScreenshot((0, 0, WIDTH, HEIGHT)).open()
+    capture.grab()
+    capture.close()
+    assert _segments() == before
+
+
+@needs_xvfb
+def test_attach_error_is_raised(xvfb, failing_attach):
+    before = _segments()
+    with pytest.raises(XShmAttachError):
+        XShmScreenshot((0, 0, WIDTH, HEIGHT)).open()
+    # the segment is removed even though the server never attached it
+    assert _segments() == before
+
+
+@needs_xvfb
+def test_auto_falls_back_to_mss(xvfb, failing_attach):
+    assert not XShmScreenshot.available()
+    assert capture_backend("auto").__name__ == "MSSScreenshot"
+
+
+@pytest.fixture
+def error_handler():
+    """Install a handler like the one of mss before the sessions, and restore the original one afterwards."""
+    xshm_screenshot._load_libraries()
+    xlib = xshm_screenshot._xlib
+    received = []
+
+    @xshm_screenshot._ErrorHandler
+    def handler(display, event):
+        received.append((display, event.contents.error_code))
+        return 0
+
+    original = xlib.XSetErrorHandler(handler)
+    yield handler, received
+    xlib.XSetErrorHandler(original)
+
+
+def _raise_error(display, code):
+    # what Xlib does when an error of the display arrives
+    event = XErrorEvent(error_code=code, display=display)
+    return xshm_screenshot._error_handler(display, ctypes.byref(event))
+
+
+@needs_xlib
+def test_errors_are_kept_per_display(error_handler):
+    # display pointers of two sessions on different threads
+    first, second = 0x1000, 0x2000
+    xshm_screenshot._watch_errors(first)
+    xshm_screenshot._watch_errors(second)
+    try:
+        _raise_error(first, 10)
+        # the first session clearing its errors before a request does not lose the error of the second one
+        _raise_error(second, 11)
+        assert xshm_screenshot._take_errors(first) == [10]
+        assert xshm_screenshot._take_errors(first) == []
+        assert xshm_screenshot._take_errors(second) == [11]
+    finally:
+        xshm_screenshot._unwatch_errors(first)
+        xshm_screenshot._unwatch_errors(second)
+
+
+@needs_xlib
+def test_other_displays_go_to_the_previous_handler(error_handler):
+    handler, received = error_handler
+    xlib = xshm_screenshot._xlib
+    xshm_screenshot._watch_errors(0x1000)
+    _raise_error(0x3000, 10)
+    assert received == [(0x3000, 10)]
+    assert xshm_screenshot._take_errors(0x1000) == []
+
+    xshm_screenshot._unwatch_errors(0x1000)
+    # the handler from before the first session is back
+    current = xlib.XSetErrorHandler(handler)
+    assert current == ctypes.cast(handler, ctypes.c_void_p).value
@@ -1,13 +1,27 @@
-from .queue_array import QueueArray
-from .screen_reader_async import ScreenReaderAsync
-from .serial_transmitter_async import SerialTransmitterAsync
-from .settings import Settings
-from .app import FlashyApp
-
-__all__ = [
-    "QueueArray",
-    "ScreenReaderAsync",
-    "SerialTransmitterAsync",
-    "Settings",
-    "FlashyApp"
-]
+import importlib
+
+# the classes are imported from their modules on first use, so importing the package
+# does not load numpy, pyserial, multiprocessing or the capture libraries up front
+_EXPORTS = {
+    "FrameBuffer": ".frame_buffer",
+    "SharedFrameBuffer": ".shared_frame_buffer",
+    "ScreenReaderAsync": ".screen_reader_async",
+    "ScreenReaderProcess": ".screen_reader_process",
+    "SerialTransmitterAsync": ".serial_transmitter_async",
+    "Settings": ".settings",
+    "FlashyApp": ".app",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -3,10 +3,7 @@ Entry point of flashy
 """
 
 import logging
-import os
 import sys
-import serial.tools.list_ports
-import time
 
 from . import Settings, FlashyApp
 
@@ -30,26 +27,16 @@ if __name__ == "__main__":
     )
     logger = logging.getLogger("App")
 
-    # find first available serial port
+    # without a port, the transmitter looks for a serial device whenever it connects,
+    # so the screen readers start right away and the LEDs light up once a board is plugged in
     autodetected = settings.port is None
-    while settings.port is None:
-        comports = serial.tools.list_ports.comports()
-        if len(comports) > 1:
-            logger.info(f"Serial devices connected:")
-            for comport in comports:
-                logger.info(f"   -- {comport.device}: {comport.description}")
-        if len(comports) == 0:
-            logger.info(f"No serial devices connected")
-            time.wait(3)
-        else:
-            settings.port = [
-                port for port in comports if "Bluetooth" not in port.device
-            ][0].device
 
     logger.info(f"Starting with settings from {settings_path}")
-    logger.info(f"  -- Serial port: {settings.port}" +
-                f"{' (autodetected)' if autodetected else ''}")
+    logger.info(f"  -- Serial port: {'first serial device found' if autodetected else settings.port}")
     logger.info(f"  --   Baud rate: {settings.baud}")
+    for output in settings.outputs or []:
+        logger.info(f"  --      Output: LEDs {output.get('leds', [0, settings.strip_size])} on " +
+                    f"{output.get('port', settings.port)} at {output.get('baud', settings.baud)} baud")
     logger.info(f"  --     Threads: {settings.threads}")
     logger.info(f"  --  Strip size: {settings.strip_size}")
     logger.info(f"  --   Log level: {settings.log_level}")
@@ -57,8 +44,4 @@ if __name__ == "__main__":
     logger.info(f"  --    Log file: {settings.logfile}")
 
     app = FlashyApp(settings)
-    while (True):            
-        try:
-            app.start()
-        except Exception as e:
-            logger.error(e.message)
+    app.start()
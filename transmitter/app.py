@@ -1,6 +1,10 @@
-import time
 import logging
-from . import QueueArray, ScreenReaderAsync, SerialTransmitterAsync
+import threading
+from . import metrics
+from .frame_buffer import FrameBuffer
+from .screen_reader_async import ScreenReaderAsync
+from .serial_transmitter_async import SerialTransmitterAsync
+from .watcher import FileWatcher
 
 
 class FlashyApp:
@@ -9,8 +13,15 @@ class FlashyApp:
     Attributes:
         settings (transmitter.settings.Settings): settings object
         logger (logging.Logger): settings logger object
-        readers (list[ScreenReaderAsync]): list of screen reader threads
-        transmitter (SerialTransmitterAsync): serial transmitter thread
+        frame_buffer (FrameBuffer/SharedFrameBuffer): frame buffer shared by the readers and the transmitter
+        readers (list[ScreenReaderAsync/ScreenReaderProcess]): list of screen reader threads or processes
+        supervisor (ReaderSupervisor): thread restarting crashed reader processes, None with reader threads
+        transmitters (list[SerialTransmitterAsync]): serial transmitter threads, one per output
+        engine (AsyncEngine): event loop engine running the readers and the transmitters, None with threads
+        reporter (MetricsReporter): thread logging, dumping and serving the metrics
+        watcher (FileWatcher): thread reloading the settings when the files change, None without `hot_reload`
+        display_watcher (DisplayWatcher): thread recompiling the profile when the displays change,
+            None if the profile is not relative to the displays or `displays` is set
 
     Args:
         path (str, optional): path to settings.json, defaults to 'settings/settings.json'
@@ -19,50 +30,226 @@ class FlashyApp:
         self.settings = settings
         self.logger = logging.getLogger("FlashyApp")
         self.readers = []
+        self.transmitters = []
+        self.supervisor = None
+        self.engine = None
+        self.watcher = None
+        self.display_watcher = None
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
         self.setup()
 
     def setup(self):
         """Set up the app and create all the threads.
         """
-        # set up the queue
-        self.queue = QueueArray(length=self.settings.strip_size, size=3)
+        # set up the frame buffer shared by the readers and the transmitter,
+        # in shared memory if the readers run in separate processes
+        processes = self.settings.reader_mode == "processes"
+        if processes:
+            # only loaded when needed, multiprocessing adds to the startup time
+            from .reader_supervisor import ReaderSupervisor
+            from .screen_reader_process import ScreenReaderProcess
+            from .shared_frame_buffer import SharedFrameBuffer
+            self.frame_buffer = SharedFrameBuffer(length=self.settings.strip_size)
+            reader_class = ScreenReaderProcess
+        else:
+            self.frame_buffer = FrameBuffer(length=self.settings.strip_size)
+            reader_class = ScreenReaderAsync
 
-        # create the reader threads
+        # create the readers
         for i in range(self.settings.threads):
             index_range = [
                 i * self.settings.strip_size//self.settings.threads,
                 (i+1) * self.settings.strip_size//self.settings.threads
             ]
 
-            reader = ScreenReaderAsync(
+            reader = reader_class(
                 name=f"ScreenReader_{index_range[0]}_{index_range[1]}",
                 index_range=index_range,
-                queue=self.queue,
+                frame_buffer=self.frame_buffer,
                 settings=self.settings
             )
             reader.daemon = True
             self.readers.append(reader)
 
-        # create the transmitter thread
-        self.transmitter = SerialTransmitterAsync(
-            name=f"SerialTransmitter_{self.settings.port}",
-            queue=self.queue,
-            port=self.settings.port,
-            baud=self.settings.baud
+        if processes:
+            self.supervisor = ReaderSupervisor(self.readers)
+
+        # create a transmitter thread for every output, they all read the same frame buffer
+        # and the readers adapt to the fastest one, the slower ones skip frames
+        outputs = self.settings.outputs or [{}]
+        link_costs = {}
+        for output in outputs:
+            options = {
+                key: output.get(key, getattr(self.settings, key))
+                for key in ("port", "baud", "protocol", "checksum", "delta_threshold", "power_limit")
+            }
+            index_range = output.get("leds", [0, self.settings.strip_size])
+            name = f"SerialTransmitter_{options['port']}"
+            if len(outputs) > 1:
+                name += f"_{index_range[0]}_{index_range[1]}"
+            transmitter = SerialTransmitterAsync(
+                name=name,
+                frame_buffer=self.frame_buffer,
+                index_range=index_range,
+                link_costs=link_costs,
+                **options
+            )
+            transmitter.daemon = True
+            self.transmitters.append(transmitter)
+
+        # the reader threads and the transmitters run as tasks of an event loop instead
+        if self.settings.engine == "asyncio":
+            from .engine import AsyncEngine
+            self.engine = AsyncEngine(
+                readers=[] if processes else self.readers,
+                transmitters=self.transmitters,
+                frame_buffer=self.frame_buffer
+            )
+        self.reporter = metrics.MetricsReporter(
+            metrics.registry,
+            interval=self.settings.metrics_interval,
+            path=self.settings.metrics_file,
+            port=self.settings.metrics_port
         )
-        self.transmitter.daemon = True
-        self.logger.debug(f"The threads are set up: transmitters=1, screenreaders={len(self.readers)}")
-    
+        if self.settings.hot_reload:
+            self.watcher = FileWatcher(self.settings.files, lambda paths: self.reload())
+        if self.settings.display_geometry is not None and self.settings.displays is None:
+            from .displays import DisplayWatcher
+            self.display_watcher = DisplayWatcher(self.settings.display_geometry, self.update_displays)
+        self.logger.debug(f"The threads are set up: transmitters={len(self.transmitters)}, screenreaders={len(self.readers)}, " +
+                          f"reader_mode={self.settings.reader_mode}, engine={self.settings.engine}")
+
     def start(self):
-        """Start the daemon threads and wait in the main thread indefinitely.
+        """Run the app in the main thread until `stop` is called or the process is interrupted,
+        then stop everything and free the resources.
         """
-        self.transmitter.start()
-        for reader in self.readers:
-            reader.daemon = True
-            reader.start()
-        
         self.logger.info("The app is running")
+        self.reporter.start()
+        if self.watcher is not None:
+            self.watcher.start()
+        if self.display_watcher is not None:
+            self.display_watcher.start()
+        try:
+            if self.engine is not None:
+                import asyncio
+                if self.supervisor is not None:
+                    self.supervisor.start()
+                asyncio.run(self.engine.run())
+            else:
+                for transmitter in self.transmitters:
+                    transmitter.start()
+                self.start_readers()
+                # wake up every now and then, Ctrl+C does not interrupt an endless wait on Windows
+                while not self._stop_event.wait(1.0):
+                    pass
+        except KeyboardInterrupt:
+            self.logger.info("Interrupted")
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        """Ask the app to stop, `start` returns once everything is shut down. Can be called from any thread.
+        """
+        self._stop_event.set()
+        if self.engine is not None:
+            self.engine.stop()
+
+    def reload(self):
+        """Load the settings files again and apply the changes without restarting anything.
+
+        The new profile, capture plan and colour stages are built in the calling thread and
+        swapped into the readers between two frames, the transmitters keep their connections.
+        The settings that need a restart keep their values, see `Settings.RESTART_SETTINGS`.
+
+        Returns:
+            list[str]: names of the settings that changed
+        """
+        with self._reload_lock:
+            try:
+                settings, changes = self.settings.reload()
+            except Exception as e:
+                self.logger.error(f"Could not reload the settings, keeping the current ones: {e}")
+                return []
+            if self.watcher is not None:
+                self.watcher.watch(settings.files)
+            if changes:
+                self._apply(settings)
+                self.logger.info(f"Reloaded the settings, changed: {', '.join(changes)}")
+            return changes
 
-        # wait indefinitely
-        while True:
-            time.sleep(3600)
+    def update_displays(self, display_geometry):
+        """Compile the profile for new display geometry and apply it without restarting anything.
+        Only the LEDs on the displays that changed are compiled again.
+
+        Args:
+            display_geometry (list[Display]): displays
+        """
+        with self._reload_lock:
+            self._apply(self.settings.with_displays(display_geometry))
+            self.logger.info(f"Compiled the profile for the displays {display_geometry}")
+
+    def _apply(self, settings):
+        """Swap new settings into the readers and the transmitters.
+
+        Args:
+            settings (settings.Settings): settings with the same values of `Settings.RESTART_SETTINGS`
+        """
+        self.settings = settings
+        if self.supervisor is not None:
+            # the processes reload the settings themselves, restarted ones start with the new settings
+            for process in self.supervisor.processes:
+                process.settings = settings
+        else:
+            for reader in self.readers:
+                reader.reload(settings)
+        outputs = settings.outputs or [{}]
+        for output, transmitter in zip(outputs, self.transmitters):
+            transmitter.configure(
+                delta_threshold=output.get("delta_threshold", settings.delta_threshold),
+                power_limit=output.get("power_limit", settings.power_limit)
+            )
+
+    def shutdown(self):
+        """Stop the readers and the transmitters, close the serial ports and free the frame buffer.
+        """
+        # joined, so a watcher cannot reload the settings of an app that has stopped
+        for watcher in (self.watcher, self.display_watcher):
+            if watcher is not None:
+                watcher.stop()
+        for watcher in (self.watcher, self.display_watcher):
+            if watcher is not None and watcher.is_alive():
+                watcher.join()
+        if self.engine is None or self.supervisor is not None:
+            self.stop_readers()
+        for transmitter in self.transmitters:
+            transmitter.stop()
+        for transmitter in self.transmitters:
+            if transmitter.is_alive():
+                transmitter.join()
+        self.frame_buffer.close()
+        self.reporter.stop()
+        self.logger.info("The app has stopped")
+
+    def start_readers(self):
+        """Start the screen reader threads, or the supervisor of the reader processes.
+        """
+        if self.supervisor is not None:
+            self.supervisor.start()
+        else:
+            for reader in self.readers:
+                reader.start()
+
+    def stop_readers(self):
+        """Stop the screen readers and wait for them to finish.
+        """
+        if self.supervisor is not None:
+            if self.supervisor.is_alive():
+                self.supervisor.stop()
+                self.supervisor.join()
+        else:
+            for reader in self.readers:
+                reader.stop()
+            for reader in self.readers:
+                if reader.is_alive():
+                    reader.join()
@@ -0,0 +1,5 @@
+"""
+Benchmarks of the flashy transmitter that run without a display or a board.
+
+Run with `python -m transmitter.bench <benchmark> [options]` from the repo directory.
+"""
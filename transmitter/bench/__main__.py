@@ -0,0 +1,38 @@
+"""
+Entry point of the flashy benchmarks
+"""
+
+import argparse
+import logging
+import sys
+
+from . import accuracy, capture, latency, network, pipeline, plan, sampling, scaling, serial_link, startup
+
+
+BENCHMARKS = {
+    "accuracy": accuracy,
+    "capture": capture,
+    "latency": latency,
+    "network": network,
+    "pipeline": pipeline,
+    "plan": plan,
+    "sampling": sampling,
+    "scaling": scaling,
+    "serial": serial_link,
+    "startup": startup,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m transmitter.bench")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    for name, module in BENCHMARKS.items():
+        module.add_arguments(subparsers.add_parser(name, help=module.__doc__.strip().splitlines()[0]))
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="%(asctime)s %(levelname)s: %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    BENCHMARKS[args.benchmark].run(args)
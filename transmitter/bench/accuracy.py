@@ -0,0 +1,138 @@
+"""
+Report the colour error of strided and subsampled sampling against the full mean of every LED.
+"""
+
+import random
+import time
+
+import numpy as np
+
+from ..compiled_profile import CompiledProfile
+from ..settings import Settings
+
+
+CANDIDATES = [{"stride": stride} for stride in (2, 3, 4, 6, 8)] + \
+    [{"samples": samples} for samples in (4, 8, 16, 32, 64)]
+
+
+def srgb_to_lab(rgb):
+    """Convert sRGB colours to CIELAB (D65).
+
+    Args:
+        rgb (numpy.ndarray): RGB values 0..255, shape (..., 3)
+
+    Returns:
+        numpy.ndarray: L*, a*, b* values, shape (..., 3)
+    """
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ np.array([
+        [0.4124564, 0.2126729, 0.0193339],
+        [0.3575761, 0.7151522, 0.1191920],
+        [0.1804375, 0.0721750, 0.9503041],
+    ]) / np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([
+        116 * f[..., 1] - 16,
+        500 * (f[..., 0] - f[..., 1]),
+        200 * (f[..., 1] - f[..., 2]),
+    ], axis=-1)
+
+
+def delta_e(rgb1, rgb2):
+    """CIE76 colour difference, about 2.3 is just noticeable.
+
+    Args:
+        rgb1 (numpy.ndarray): RGB values 0..255, shape (..., 3)
+        rgb2 (numpy.ndarray): RGB values 0..255, shape (..., 3)
+
+    Returns:
+        numpy.ndarray: colour differences, shape (...)
+    """
+    return np.linalg.norm(srgb_to_lab(rgb1) - srgb_to_lab(rgb2), axis=-1)
+
+
+def synthetic_frames(pattern, shape, count, seed=0):
+    """Generate BGRA frames.
+
+    Args:
+        pattern (str): "noise", "gradient" or "text"
+        shape (tuple): (height, width)
+        count (int): number of frames
+        seed (int): random seed
+
+    Returns:
+        list[numpy.ndarray]: frames with the shape (height, width, 4)
+    """
+    rng = np.random.default_rng(seed)
+    height, width = shape
+    frames = []
+    for i in range(count):
+        if pattern == "noise":
+            frame = rng.integers(0, 256, size=(height, width, 4), dtype=np.uint8)
+        else:
+            # smooth colour gradients, like photos and videos
+            x = np.linspace(0, 1, width)[None, :, None]
+            y = np.linspace(0, 1, height)[:, None, None]
+            phase = rng.random(3)[None, None, :] * 2 * np.pi
+            frame = 127.5 * (1 + np.sin(2 * np.pi * (x * (1 + i % 3) + y) + phase))
+            frame = np.concatenate([frame, np.zeros((height, width, 1))], axis=-1).astype(np.uint8)
+            if pattern == "text":
+                # thin dark lines on a light background, like text on web pages
+                frame[:, :, :3] = 230
+                lines = rng.random((height, width)) < 0.15
+                frame[lines, :3] = rng.integers(0, 60, size=(lines.sum(), 3), dtype=np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def _name(sampling):
+    return "full" if sampling is None else ", ".join(f"{k}={v}" for k, v in sampling.items())
+
+
+def add_arguments(parser):
+    parser.add_argument("settings", nargs="?", default="primary",
+                        help="name of the settings file in settings/ (default: primary)")
+    parser.add_argument("--frames-file", default=None,
+                        help="recorded BGRA frames in a .npy file, shape (frames, height, width, 4)")
+    parser.add_argument("--origin", nargs=2, type=int, default=None, metavar=("X", "Y"),
+                        help="screen coordinates of the top left pixel of the recorded frames (default: 0 0)")
+    parser.add_argument("--pattern", default="gradient", choices=["noise", "gradient", "text"],
+                        help="synthetic frames to use if no frames file is given (default: gradient)")
+    parser.add_argument("--frames", type=int, default=20, help="number of synthetic frames")
+    parser.add_argument("--threshold", type=float, default=2.3,
+                        help="maximum acceptable 95th percentile colour error, CIE76 (default: 2.3)")
+
+
+def run(args):
+    settings = Settings(f"settings/{args.settings}.json")
+    # in a random order, like the screen readers sample them
+    indices = list(range(settings.strip_size))
+    random.shuffle(indices)
+    reference = CompiledProfile.compile(settings.profile.map).sampler(indices)
+
+    if args.frames_file is not None:
+        frames = list(np.load(args.frames_file, mmap_mode="r"))
+        origin = tuple(args.origin) if args.origin is not None else (0, 0)
+    else:
+        bbox = reference.bbox
+        origin = bbox[:2]
+        frames = synthetic_frames(args.pattern, (bbox[3] - bbox[1], bbox[2] - bbox[0]), args.frames)
+    expected = np.array([reference.sample(frame, origin) for frame in frames])
+
+    print(f"profile: {settings.profile.description}, {len(frames)} frames")
+    print(f"{'sampling':>16} {'pixels':>8} {'ms/frame':>9} {'mean dE':>8} {'p95 dE':>8} {'max dE':>8}")
+    rows = []
+    for sampling in [None] + CANDIDATES:
+        sampler = CompiledProfile.compile(settings.profile.map, sampling).sampler(indices)
+        start = time.perf_counter()
+        colours = np.array([sampler.sample(frame, origin) for frame in frames])
+        duration = (time.perf_counter() - start) / len(frames)
+        errors = delta_e(colours, expected)
+        p95 = np.percentile(errors, 95)
+        rows.append((sampler.pixels, sampling, p95))
+        print(f"{_name(sampling):>16} {sampler.pixels:8d} {duration*1000:9.3f} "
+              f"{errors.mean():8.2f} {p95:8.2f} {errors.max():8.2f}")
+
+    pixels, sampling, p95 = min((row for row in rows if row[2] <= args.threshold), key=lambda row: row[0])
+    print(f"cheapest sampling with p95 dE <= {args.threshold}: {_name(sampling)} ({pixels} pixels)")
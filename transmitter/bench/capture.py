@@ -0,0 +1,40 @@
+"""
+Time the screen capture backends and check that they capture the same pixels (works under Xvfb).
+"""
+
+import time
+
+import numpy as np
+
+from ..screen_reader_async import capture_backend
+
+
+def add_arguments(parser):
+    parser.add_argument("--backend", nargs="+", default=["auto"],
+                        help="capture backends to compare, e.g. mss xshm (default: auto)")
+    parser.add_argument("--bbox", nargs=4, type=int, default=[0, 0, 640, 480],
+                        metavar=("X1", "Y1", "X2", "Y2"), help="region to capture (default: 0 0 640 480)")
+    parser.add_argument("--frames", type=int, default=100, help="number of frames to grab")
+
+
+def run(args):
+    width = args.bbox[2] - args.bbox[0]
+    reference = None
+    for name in args.backend:
+        screenshot_class = capture_backend(name)
+        with screenshot_class(bbox=args.bbox) as capture:
+            frame = capture.grab()
+            start = time.perf_counter()
+            for _ in range(args.frames):
+                frame = capture.grab()
+            duration = (time.perf_counter() - start) / args.frames
+            # drop the row padding and the unused alpha/X byte
+            pixels = np.array(frame[:, :width, :3])
+
+        if reference is None:
+            reference = pixels
+            match = ""
+        else:
+            match = ", same pixels" if np.array_equal(reference, pixels) else ", DIFFERENT pixels"
+        print(f"{screenshot_class.__name__:>16}: {duration*1000:8.3f} ms/frame "
+              f"({1/duration:8.1f} fps){match}")
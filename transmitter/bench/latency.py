@@ -0,0 +1,134 @@
+"""
+Measure capture-to-send latency of the frame buffer against the old per-LED queues.
+
+Both exchanges send with the same encoder over the same emulated link, so only
+the exchange differs between them.
+"""
+
+import threading
+import time
+from queue import Queue
+
+import numpy as np
+
+from ..frame_buffer import FrameBuffer
+from ..protocol import AsciiProtocol, BinaryProtocol
+
+PROTOCOLS = {"ascii": AsciiProtocol, "binary": BinaryProtocol}
+
+
+def _link_delay(data, baud):
+    # 10 bits per byte with the start and stop bits
+    time.sleep(len(data) * 10 / baud)
+
+
+def _percentiles(latencies):
+    return np.percentile(np.array(latencies) * 1000, [50, 95, 99]) if latencies else [np.nan] * 3
+
+
+def measure_queues(strip_size, fps, baud, duration, protocol="ascii", frame_delay=1):
+    """The exchange as it used to be: one Queue(3) per LED, the reader skipping
+    frames when all queues are full and the transmitter polling every queue
+    every `frame_delay` ms and sending one packet per LED.
+
+    Args:
+        protocol (str): name of the encoder in PROTOCOLS
+
+    Returns:
+        tuple: list of latencies in seconds, number of frames completely sent
+    """
+    queues = [Queue(3) for _ in range(strip_size)]
+    stop = threading.Event()
+    colours = np.zeros((strip_size, 3), dtype=np.uint8)
+    latencies = []
+    frames = [0]
+    encoder = PROTOCOLS[protocol]()
+
+    def produce():
+        while not stop.is_set():
+            if not all(queue.full() for queue in queues):
+                capture_time = time.perf_counter()
+                for i in range(strip_size):
+                    if not queues[i].full():
+                        queues[i].put((capture_time, (0, 0, 0)))
+            time.sleep(1.0 / fps)
+
+    def transmit():
+        while not stop.is_set():
+            time.sleep(frame_delay / 1000)
+            for i in range(strip_size):
+                if not queues[i].empty():
+                    capture_time, colours[i] = queues[i].get()
+                    _link_delay(encoder.encode(colours, [i]), baud)
+                    latencies.append(time.perf_counter() - capture_time)
+                    if i == strip_size - 1:
+                        frames[0] += 1
+
+    return _run(produce, transmit, stop, duration), latencies, frames[0]
+
+
+def measure_frame_buffer(strip_size, fps, baud, duration, protocol="ascii"):
+    """The frame buffer exchange: the reader publishes a frame at the fps limit
+    and the transmitter waits for the newest one and sends it whole.
+
+    Args:
+        protocol (str): name of the encoder in PROTOCOLS
+
+    Returns:
+        tuple: list of latencies in seconds, number of frames completely sent
+    """
+    frame_buffer = FrameBuffer(length=strip_size)
+    stop = threading.Event()
+    colours = np.zeros((strip_size, 3), dtype=np.uint8)
+    frame = np.zeros((strip_size, 3), dtype=np.uint8)
+    latencies = []
+    frames = [0]
+    encoder = PROTOCOLS[protocol]()
+
+    def produce():
+        while not stop.is_set():
+            frame_buffer.write(slice(None), colours)
+            time.sleep(1.0 / fps)
+
+    def transmit():
+        sequence = 0
+        while not stop.is_set():
+            info = frame_buffer.wait(sequence, out=frame, timeout=0.1)
+            if info is None:
+                continue
+            sequence = info.sequence
+            _link_delay(encoder.encode(frame, [], keyframe=True), baud)
+            latencies.append(time.perf_counter() - info.timestamp)
+            frames[0] += 1
+
+    return _run(produce, transmit, stop, duration), latencies, frames[0]
+
+
+def _run(produce, transmit, stop, duration):
+    threads = [threading.Thread(target=target, daemon=True) for target in (produce, transmit)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return duration
+
+
+def add_arguments(parser):
+    parser.add_argument("--leds", type=int, default=86, help="number of LEDs (default: 86)")
+    parser.add_argument("--fps", type=float, default=30, help="frames produced per second (default: 30)")
+    parser.add_argument("--baud", type=int, default=115200, help="emulated baud rate (default: 115200)")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to measure every exchange")
+    parser.add_argument("--protocol", choices=sorted(PROTOCOLS), nargs="+", default=["ascii", "binary"],
+                        help="encoders both exchanges are measured with (default: ascii binary)")
+
+
+def run(args):
+    print(f"LEDs: {args.leds}, produced: {args.fps} fps, baud: {args.baud}")
+    for protocol in args.protocol:
+        for name, measure in (("queues", measure_queues), ("frame buffer", measure_frame_buffer)):
+            duration, latencies, frames = measure(args.leds, args.fps, args.baud, args.duration, protocol)
+            p50, p95, p99 = _percentiles(latencies)
+            print(f"{protocol:>6} {name:>12}: latency p50={p50:7.2f}ms p95={p95:7.2f}ms p99={p99:7.2f}ms, "
+                  f"{frames / duration:6.2f} frames/s sent")
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+
+from ..protocol import (
+    MAGIC, HANDSHAKE_QUERY, HANDSHAKE_REPLY, PACKET_FRAME, PACKET_DELTA, FLAG_CHECKSUM, DELTA_VERSION, checksum
+)
+
+
+class LoopbackReceiver(threading.Thread):
+    """Emulates the receiver board on a pseudo-terminal, so the transmitter
+    can be run against it without hardware.
+
+    The transmitter opens `port` like a real serial device. The receiver
+    parses both protocols the same way `receiver/receiver.ino` does, answers
+    the handshake and counts the bytes, LED updates and strip refreshes.
+    Reading is throttled to the given baud rate to emulate the serial link.
+
+    Args:
+        strip_size (int): number of LEDs on the emulated strip
+        baud (int): baud rate to emulate, no throttling if None
+        handshake (bool): answer the protocol handshake like the current receiver code
+        version (int): protocol version to answer the handshake with
+
+    Attributes:
+        port (str): path of the pseudo-terminal to open as a serial port
+        bytes_received (int): number of bytes read from the link
+        updates (int): number of LED values updated
+        shows (int): number of strip refreshes, i.e. frames displayed
+        errors (int): number of binary frames dropped because of a bad checksum or header
+    """
+    def __init__(self, strip_size, baud=None, handshake=True, version=DELTA_VERSION):
+        super(LoopbackReceiver, self).__init__()
+        self.daemon = True
+        self.strip_size = strip_size
+        self.baud = baud
+        self.handshake = handshake
+        self.version = version
+        self._master, self._slave = os.openpty()
+        self.port = os.ttyname(self._slave)
+        self._buffer = bytearray()
+        self._ascii_count = 0
+        self._running = True
+        self.reset()
+
+    def reset(self):
+        """Reset the counters.
+        """
+        self.bytes_received = 0
+        self.updates = 0
+        self.shows = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+
+    def stop(self):
+        """Stop reading and close the pseudo-terminal.
+        """
+        self._running = False
+        os.close(self._master)
+        os.close(self._slave)
+
+    def run(self):
+        # read in small chunks when throttled, so the byte rate stays smooth
+        chunk_size = 4096 if self.baud is None else max(1, self.baud // 1000)
+        while self._running:
+            try:
+                data = os.read(self._master, chunk_size)
+            except OSError:
+                break
+            self.bytes_received += len(data)
+            self._buffer += data
+            self._parse()
+            if self.baud is not None:
+                # 10 bits per byte with the start and stop bits
+                time.sleep(len(data) * 10 / self.baud)
+
+    def _parse(self):
+        buffer = self._buffer
+        while len(buffer) > 0:
+            start = buffer[0]
+            if start == HANDSHAKE_QUERY[0]:
+                del buffer[:1]
+                if self.handshake:
+                    os.write(self._master, HANDSHAKE_REPLY + f"{self.version}\n".encode("ascii"))
+            elif start == ord(">"):
+                if len(buffer) < 13:
+                    return
+                del buffer[:13]
+                self.updates += 1
+                # same heuristic as the receiver code
+                if self._ascii_count >= self.strip_size * 0.41:
+                    self.shows += 1
+                    self._ascii_count = 0
+                else:
+                    self._ascii_count += 1
+            elif start == MAGIC[0]:
+                if len(buffer) < 5:
+                    return
+                packet_type = buffer[2] & ~FLAG_CHECKSUM
+                if buffer[1] != MAGIC[1] or packet_type not in (PACKET_FRAME, PACKET_DELTA):
+                    self.errors += 1
+                    del buffer[:1]
+                    continue
+                count = int.from_bytes(buffer[3:5], "big")
+                changed, header = count, 5
+                if packet_type == PACKET_DELTA:
+                    header += (count + 7) // 8
+                    if len(buffer) < header:
+                        return
+                    # only the bits of the LEDs, not the padding of the last byte
+                    changed = sum((buffer[5 + i // 8] >> (i % 8)) & 1 for i in range(count))
+                length = header + 3 * changed + (1 if buffer[2] & FLAG_CHECKSUM else 0)
+                if len(buffer) < length:
+                    return
+                if buffer[2] & FLAG_CHECKSUM and checksum(buffer[3:length - 1]) != buffer[length - 1]:
+                    self.errors += 1
+                else:
+                    self.updates += changed
+                    self.shows += 1
+                del buffer[:length]
+            else:
+                del buffer[:1]
@@ -0,0 +1,79 @@
+"""
+Measure frames per second and bytes per frame of the network protocols on a local UDP listener.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from ..frame_buffer import FrameBuffer
+from ..serial_transmitter_async import SerialTransmitterAsync
+from .serial_link import _produce
+from .udp_listener import UdpListener
+
+
+def measure(protocol, strip_size, duration, fps=30, content="random", seed=0):
+    """Run the transmitter against an emulated network controller.
+
+    Args:
+        protocol (str): "ddp", "e131" or "wled"
+        strip_size (int): number of LEDs
+        duration (float): measurement time in seconds
+        fps (float): frames per second produced
+        content (str): how the colours change, "random", "partial" or "static"
+        seed (int): random seed of the colours
+
+    Returns:
+        dict: frames per second, bytes per frame and datagrams per frame received, the errors,
+            and whether the last frame received is the last frame sent
+    """
+    listener = UdpListener(strip_size, protocol)
+    listener.start()
+    frame_buffer = FrameBuffer(length=strip_size)
+    transmitter = SerialTransmitterAsync(
+        name=f"Transmitter_{protocol}", frame_buffer=frame_buffer, port=listener.url, delta_threshold=0
+    )
+    transmitter.daemon = True
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce, args=(frame_buffer, stop, content, fps, seed), daemon=True)
+    producer.start()
+    transmitter.start()
+
+    while listener.shows == 0:
+        time.sleep(0.01)
+    listener.reset()
+    time.sleep(duration)
+    elapsed = time.perf_counter() - listener.started
+    stop.set()
+    transmitter.stop()
+    transmitter.join()
+    # let the last datagrams arrive
+    time.sleep(0.1)
+    listener.stop()
+    return dict(
+        fps=listener.shows / elapsed,
+        bytes_per_frame=listener.bytes_received / max(listener.shows, 1),
+        datagrams_per_frame=listener.datagrams / max(listener.shows, 1),
+        errors=listener.errors,
+        intact=transmitter.last_sent is not None and np.array_equal(listener.frame, transmitter.last_sent),
+    )
+
+
+def add_arguments(parser):
+    parser.add_argument("--leds", type=int, nargs="+", default=[86, 1000, 5000],
+                        help="numbers of LEDs (default: 86 1000 5000)")
+    parser.add_argument("--protocols", nargs="+", default=["ddp", "e131", "wled"], choices=["ddp", "e131", "wled"],
+                        help="protocols to measure (default: all)")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds to measure every run (default: 3)")
+    parser.add_argument("--fps", type=float, default=60, help="frames produced per second (default: 60)")
+
+
+def run(args):
+    print(f"produced: {args.fps} fps of random colours")
+    for leds in args.leds:
+        for protocol in args.protocols:
+            result = measure(protocol, leds, args.duration, fps=args.fps)
+            print(f"{leds:6d} LEDs {protocol:>5}: {result['fps']:6.1f} frames/s, "
+                  f"{result['bytes_per_frame']:8.0f} bytes/frame, {result['datagrams_per_frame']:4.1f} datagrams/frame, "
+                  f"{result['errors']} errors, last frame {'intact' if result['intact'] else 'DIFFERENT'}")
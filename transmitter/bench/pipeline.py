@@ -0,0 +1,139 @@
+"""
+Run the whole app headless on generated, recorded or video frames and report throughput, latency, CPU and memory.
+"""
+
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .. import metrics
+from ..app import FlashyApp
+from ..settings import Profile, Settings
+
+
+def _memory():
+    """Resident memory of this process in MB, None if unknown."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        import sys
+        # peak instead of current, in bytes on MacOS and in kB elsewhere
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+    except ImportError:
+        return None
+
+
+def _children_cpu():
+    """CPU seconds of the finished child processes, 0 if unknown."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure(profile_path, args, settings_dir):
+    """Run the app on one profile for `args.duration` seconds.
+
+    Returns:
+        dict: results of the run
+    """
+    with open(profile_path) as profile_file:
+        strip_size = len(Profile(json.load(profile_file)).map)
+    options = {"pattern": args.pattern} if args.source == "synthetic" else {"path": os.path.abspath(args.path)}
+    path = os.path.join(settings_dir, "pipeline.json")
+    with open(path, "w") as settings_file:
+        json.dump({
+            "port": "null",
+            "baud": args.baud,
+            "protocol": args.protocol,
+            "strip_size": strip_size,
+            "threads": args.threads,
+            "reader_mode": args.reader_mode,
+            "engine": args.engine,
+            "capture_backend": args.source,
+            "capture_options": options,
+            "fps_limit": args.fps,
+            "metrics_interval": 0,
+            "profile": os.path.abspath(profile_path),
+            "displays": [[0, 0, args.screen[0], args.screen[1]]],
+            # the bench rewrites the settings file for every run
+            "hot_reload": False,
+        }, settings_file)
+
+    metrics.registry.clear()
+    app = FlashyApp(Settings(path))
+    sequences = []
+
+    def finish():
+        sequences.append(app.frame_buffer.sequence)
+        app.stop()
+
+    cpu, children_cpu = time.process_time(), _children_cpu()
+    timer = threading.Timer(args.duration, finish)
+    timer.start()
+    start = time.perf_counter()
+    app.start()
+    elapsed = time.perf_counter() - start
+
+    transmitter = app.transmitters[0]
+    latency = metrics.registry.histogram("latency_seconds", {"output": transmitter.name})
+    return {
+        "profile": os.path.basename(profile_path),
+        "leds": strip_size,
+        "captured_fps": sequences[0] / args.threads / elapsed if sequences else 0.0,
+        "sent_fps": transmitter.frames_sent / elapsed,
+        "bytes_per_s": transmitter.bytes_sent / elapsed,
+        "latency_ms": [latency.percentile(q) * 1000 for q in (50, 95, 99)],
+        "cpu_percent": 100 * (time.process_time() - cpu + _children_cpu() - children_cpu) / elapsed,
+        "memory_mb": _memory(),
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument("profiles", nargs="*",
+                        help="profile files to run (default: all in settings/profiles/)")
+    parser.add_argument("--source", default="synthetic", choices=["synthetic", "replay", "video", "recording"],
+                        help="where the frames come from (default: synthetic)")
+    parser.add_argument("--pattern", default="gradient", choices=["noise", "gradient", "static"],
+                        help="synthetic frames (default: gradient)")
+    parser.add_argument("--path", default=None, help="recorded .npy frames, video file or `record` path for --source replay/video/recording")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run every profile (default: 10)")
+    parser.add_argument("--fps", type=float, default=30, help="fps_limit (default: 30)")
+    parser.add_argument("--baud", type=int, default=115200, help="baud rate of the emulated board (default: 115200)")
+    parser.add_argument("--protocol", default="auto", choices=["auto", "binary", "ascii"],
+                        help="protocol (default: auto, i.e. binary)")
+    parser.add_argument("--screen", nargs=2, type=int, default=[2560, 1440], metavar=("WIDTH", "HEIGHT"),
+                        help="display size for the profiles relative to the display (default: 2560 1440)")
+    parser.add_argument("--threads", type=int, default=1, help="number of screen readers (default: 1)")
+    parser.add_argument("--reader-mode", default="threads", choices=["threads", "processes"],
+                        help="reader_mode (default: threads)")
+    parser.add_argument("--engine", default="threads", choices=["threads", "asyncio"],
+                        help="engine (default: threads)")
+
+
+def run(args):
+    if args.source != "synthetic" and args.path is None:
+        raise SystemExit(f"--source {args.source} needs a --path")
+    profiles = args.profiles or sorted(glob.glob("settings/profiles/*.json"))
+    print(f"source: {args.source}, {args.duration:.0f}s per profile, fps_limit {args.fps}, "
+          f"{args.baud} baud, readers: {args.threads} ({args.reader_mode}), engine: {args.engine}")
+    print(f"{'profile':>40} {'LEDs':>5} {'capture fps':>11} {'sent fps':>8} {'kB/s':>6} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'CPU %':>6} {'RSS MB':>7}")
+    with tempfile.TemporaryDirectory() as settings_dir:
+        for profile_path in profiles:
+            result = measure(profile_path, args, settings_dir)
+            p50, p95, p99 = result["latency_ms"]
+            memory = f"{result['memory_mb']:7.1f}" if result["memory_mb"] is not None else f"{'?':>7}"
+            print(f"{result['profile']:>40} {result['leds']:5d} {result['captured_fps']:11.1f} "
+                  f"{result['sent_fps']:8.1f} {result['bytes_per_s']/1000:6.1f} "
+                  f"{p50:7.1f} {p95:7.1f} {p99:7.1f} {result['cpu_percent']:6.1f} {memory}")
@@ -0,0 +1,30 @@
+"""
+Show the capture regions planned for a settings profile and how many pixels they save.
+"""
+
+import time
+
+from ..capture_plan import plan_capture, bounding_box, capture_size
+from ..settings import Settings
+
+
+def add_arguments(parser):
+    parser.add_argument("settings", nargs="?", default="primary",
+                        help="name of the settings file in settings/ (default: primary)")
+
+
+def run(args):
+    settings = Settings(f"settings/{args.settings}.json")
+    rects = settings.profile.compiled.rects
+    start = time.perf_counter()
+    regions = plan_capture(rects)
+    duration = time.perf_counter() - start
+
+    union = bounding_box(rects)
+    union_size = (union[2] - union[0]) * (union[3] - union[1])
+    planned_size = capture_size(regions)
+    print(f"profile: {settings.profile.description}")
+    for region in regions:
+        print(f"  region {region.bbox}: {len(region.leds)} LEDs")
+    print(f"bounding box: {union_size} pixels, planned: {planned_size} pixels in {len(regions)} regions "
+          f"({100 * (1 - planned_size / union_size):.1f}% less), planned in {duration*1000:.1f}ms")
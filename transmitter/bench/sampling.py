@@ -0,0 +1,106 @@
+"""
+Compare the vectorised LED sampler against the per-pixel getpixel loop on synthetic frames.
+"""
+
+import random
+import struct
+import time
+
+import numpy as np
+
+from ..settings import Settings
+
+
+class _GetpixelScreenshot:
+    """Synthetic screenshot with the per-pixel access of the capture backends.
+
+    Args:
+        frame (numpy.ndarray): BGRA buffer with the shape (height, width, 4)
+    """
+    def __init__(self, frame):
+        self.width = frame.shape[1]
+        self._data = frame.tobytes()
+
+    def getpixel(self, x, y):
+        b, g, r, a = struct.unpack_from("BBBB", self._data, offset=4 * (self.width * y + x))
+        return (r, g, b)
+
+
+def _mean_rgb(rgb_values):
+    N = len(rgb_values)
+    if N == 1:
+        return rgb_values[0]
+    return (
+        sum(value[0] for value in rgb_values) // N,
+        sum(value[1] for value in rgb_values) // N,
+        sum(value[2] for value in rgb_values) // N,
+    )
+
+
+def _weighted_mean_rgb(rgb_values, weights):
+    total = sum(weights)
+    return tuple(
+        round(sum(value[channel] * weight for value, weight in zip(rgb_values, weights)) / total)
+        for channel in range(3)
+    )
+
+
+def _getpixel_frame(settings, indices, bbox, screenshot):
+    compiled = settings.profile.compiled
+    rgb = []
+    for i in indices:
+        rgb_values = [
+            screenshot.getpixel(x=coords[0]-bbox[0], y=coords[1]-bbox[1])
+            for coords in settings.get_pixel_list(i)
+        ]
+        if compiled.weights is None:
+            rgb.append(_mean_rgb(rgb_values))
+        else:
+            rgb.append(_weighted_mean_rgb(rgb_values, compiled.weights[compiled.starts[i]:compiled.starts[i + 1]].tolist()))
+    return rgb
+
+
+def _time_per_frame(function, frames):
+    start = time.perf_counter()
+    for frame in frames:
+        function(frame)
+    return (time.perf_counter() - start) / len(frames)
+
+
+def add_arguments(parser):
+    parser.add_argument("settings", nargs="?", default="primary",
+                        help="name of the settings file in settings/ (default: primary)")
+    parser.add_argument("--frames", type=int, default=20, help="number of synthetic frames")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the synthetic frames")
+
+
+def run(args):
+    settings = Settings(f"settings/{args.settings}.json")
+    # in a random order, like the screen readers sample them
+    indices = list(range(settings.strip_size))
+    random.Random(args.seed).shuffle(indices)
+    sampler = settings.profile.compiled.sampler(indices)
+    bbox = sampler.bbox
+    size = (bbox[3] - bbox[1], bbox[2] - bbox[0])
+
+    rng = np.random.default_rng(args.seed)
+    frames = [rng.integers(0, 256, size=size + (4,), dtype=np.uint8) for _ in range(args.frames)]
+    screenshots = [_GetpixelScreenshot(frame) for frame in frames]
+
+    # both paths must agree before the timings mean anything, weighted kernels are summed
+    # in single precision and can round the other way
+    tolerance = 0 if settings.profile.compiled.weights is None else 1
+    for frame, screenshot in zip(frames, screenshots):
+        expected = np.array(_getpixel_frame(settings, indices, bbox, screenshot), dtype=np.int16)
+        if np.abs(sampler.sample(frame, bbox[:2]).astype(np.int16) - expected).max() > tolerance:
+            raise AssertionError("Vectorised sampler does not match the getpixel loop")
+
+    getpixel_time = _time_per_frame(
+        lambda screenshot: _getpixel_frame(settings, indices, bbox, screenshot), screenshots)
+    sampler_time = _time_per_frame(lambda frame: sampler.sample(frame, bbox[:2]), frames)
+
+    print(f"profile:    {settings.profile.description}")
+    print(f"LEDs:       {len(indices)}, pixels sampled: {sampler.pixels}, bbox: {bbox}")
+    print(f"getpixel:   {getpixel_time*1000:9.3f} ms/frame ({1/getpixel_time:9.1f} fps)")
+    print(f"vectorised: {sampler_time*1000:9.3f} ms/frame ({1/sampler_time:9.1f} fps)")
+    print(f"speedup:    {getpixel_time/sampler_time:9.1f}x")
@@ -0,0 +1,108 @@
+"""
+Measure how the frame rate scales with the number of reader threads and processes.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+from ..app import FlashyApp
+from ..settings import Settings
+
+
+def perimeter_map(width, height, count, depth):
+    """Profile map with LEDs evenly spaced around the edges of the screen, clockwise from the top left.
+
+    Args:
+        width (int): screen width
+        height (int): screen height
+        count (int): number of LEDs
+        depth (int): how far into the screen every LED samples
+
+    Returns:
+        dict: profile map
+    """
+    perimeter = 2 * (width + height)
+    size = perimeter / count
+    profile_map = {}
+    for i in range(count):
+        position = i * size
+        if position < width:
+            x = int(position)
+            bbox = [x, 0, min(width, x + int(size) + 1), depth]
+        elif position < width + height:
+            y = int(position - width)
+            bbox = [width - depth, y, width, min(height, y + int(size) + 1)]
+        elif position < 2 * width + height:
+            x = int(2 * width + height - position)
+            bbox = [max(0, x - int(size) - 1), height - depth, x, height]
+        else:
+            y = int(perimeter - position)
+            bbox = [0, max(0, y - int(size) - 1), depth, y]
+        profile_map[str(i)] = {"bbox": bbox}
+    return profile_map
+
+
+def measure(settings_dir, profile, mode, workers, duration, sampling=None):
+    """Run the readers on synthetic frames and count the frames written to the frame buffer.
+
+    Returns:
+        float: whole strip updates per second
+    """
+    path = os.path.join(settings_dir, f"scaling-{mode}-{workers}.json")
+    with open(path, "w") as settings_file:
+        json.dump({
+            "port": "none",
+            "strip_size": len(profile["map"]),
+            "threads": workers,
+            "reader_mode": mode,
+            "capture_backend": "synthetic",
+            "fps_limit": 1000,
+            "skip_static_frames": False,
+            "sampling": sampling,
+            "profile": profile,
+        }, settings_file)
+
+    app = FlashyApp(Settings(path))
+    app.start_readers()
+    try:
+        # let the readers plan their regions and open the captures
+        time.sleep(min(2.0, duration))
+        start_sequence, start = app.frame_buffer.sequence, time.perf_counter()
+        time.sleep(duration)
+        writes = app.frame_buffer.sequence - start_sequence
+        elapsed = time.perf_counter() - start
+    finally:
+        app.stop_readers()
+        app.frame_buffer.close()
+    # every reader writes its own part of the strip
+    return writes / workers / elapsed
+
+
+def add_arguments(parser):
+    parser.add_argument("--leds", type=int, default=600, help="number of LEDs (default: 600)")
+    parser.add_argument("--screen", nargs=2, type=int, default=[3840, 2160], metavar=("WIDTH", "HEIGHT"),
+                        help="screen size (default: 3840 2160)")
+    parser.add_argument("--depth", type=int, default=80, help="how far into the screen the LEDs sample (default: 80)")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4],
+                        help="numbers of readers to try (default: 1 2 4)")
+    parser.add_argument("--mode", nargs="+", default=["threads", "processes"], choices=["threads", "processes"],
+                        help="reader modes to compare (default: both)")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to measure every run (default: 5)")
+
+
+def run(args):
+    profile = {
+        "description": f"{args.leds} LEDs around a {args.screen[0]}x{args.screen[1]} screen",
+        "map": perimeter_map(args.screen[0], args.screen[1], args.leds, args.depth),
+    }
+    print(f"profile: {profile['description']}, {args.depth} pixels deep, {os.cpu_count()} CPUs")
+    print(f"{'mode':>10} {'workers':>8} {'fps':>8} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as settings_dir:
+        for mode in args.mode:
+            baseline = None
+            for workers in args.workers:
+                fps = measure(settings_dir, profile, mode, workers, args.duration)
+                baseline = baseline or fps
+                print(f"{mode:>10} {workers:8d} {fps:8.1f} {fps / baseline:7.2f}x")
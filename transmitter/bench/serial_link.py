@@ -0,0 +1,114 @@
+"""
+Measure bytes per frame and frames per second of the serial protocols on an emulated receiver.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from ..frame_buffer import FrameBuffer
+from ..serial_transmitter_async import SerialTransmitterAsync
+from .loopback import LoopbackReceiver
+
+
+def _produce(frame_buffer, stop, content, fps, seed):
+    rng = np.random.default_rng(seed)
+    length = frame_buffer.length
+    colours = rng.integers(0, 256, size=(length, 3), dtype=np.uint8)
+    while not stop.is_set():
+        if content == "random":
+            colours = rng.integers(0, 256, size=(length, 3), dtype=np.uint8)
+        elif content == "partial":
+            # a tenth of the LEDs change every frame
+            changed = rng.random(length) < 0.1
+            colours[changed] = rng.integers(0, 256, size=(changed.sum(), 3), dtype=np.uint8)
+        frame = colours
+        if content == "static":
+            # capture noise of a unit or so on a static picture
+            frame = np.clip(colours.astype(np.int16) + rng.integers(-1, 2, size=colours.shape), 0, 255)
+        frame_buffer.write(slice(None), frame)
+        time.sleep(1.0 / fps)
+
+
+def measure(protocol, strip_size, baud, duration, checksum=True, delta_threshold=2,
+            content="random", fps=30, seed=0):
+    """Run the transmitter against an emulated receiver.
+
+    Args:
+        protocol (str): protocol setting of the transmitter
+        strip_size (int): number of LEDs
+        baud (int): emulated baud rate
+        duration (float): measurement time in seconds
+        checksum (bool): checksum setting of the transmitter
+        delta_threshold (int): delta threshold setting of the transmitter
+        content (str): how the colours change, "random", "partial" or "static"
+        fps (float): frames per second produced
+        seed (int): random seed of the colours
+
+    Returns:
+        dict: bytes per frame, frames per second and the raw counters of the receiver and the transmitter
+    """
+    receiver = LoopbackReceiver(strip_size, baud=baud)
+    receiver.start()
+    frame_buffer = FrameBuffer(length=strip_size)
+    transmitter = SerialTransmitterAsync(
+        name=f"SerialTransmitter_{protocol}", frame_buffer=frame_buffer, port=receiver.port,
+        baud=baud, protocol=protocol, checksum=checksum, delta_threshold=delta_threshold
+    )
+    transmitter.daemon = True
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce, args=(frame_buffer, stop, content, fps, seed), daemon=True)
+    producer.start()
+    transmitter.start()
+
+    # do not count the connection and the handshake
+    while receiver.shows == 0:
+        time.sleep(0.01)
+    receiver.reset()
+    sent, suppressed = transmitter.bytes_sent, transmitter.bytes_suppressed
+    time.sleep(duration)
+    elapsed = time.perf_counter() - receiver.started
+    result = dict(
+        protocol=transmitter.sink.name,
+        bytes=receiver.bytes_received,
+        frames=receiver.shows,
+        updates=receiver.updates,
+        errors=receiver.errors,
+        bytes_per_frame=receiver.bytes_received / max(receiver.shows, 1),
+        fps=receiver.shows / elapsed,
+        bytes_per_second=receiver.bytes_received / elapsed,
+        bytes_sent=transmitter.bytes_sent - sent,
+        bytes_suppressed=transmitter.bytes_suppressed - suppressed,
+    )
+    # stopped before the receiver, the transmitter keeps sending the last frame
+    # and would write into the port of the next measurement
+    stop.set()
+    transmitter.stop()
+    transmitter.join()
+    receiver.stop()
+    return result
+
+
+def add_arguments(parser):
+    parser.add_argument("--leds", type=int, default=86, help="number of LEDs (default: 86)")
+    parser.add_argument("--baud", type=int, default=9600, help="emulated baud rate (default: 9600)")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to measure every protocol")
+    parser.add_argument("--no-checksum", action="store_true", help="send binary frames without a checksum")
+    parser.add_argument("--threshold", type=int, default=2, help="delta threshold (default: 2)")
+    parser.add_argument("--fps", type=float, default=30, help="frames produced per second (default: 30)")
+    parser.add_argument("--content", nargs="+", default=["random", "partial", "static"],
+                        choices=["random", "partial", "static"], help="how the colours change between frames")
+
+
+def run(args):
+    print(f"LEDs: {args.leds}, baud: {args.baud}, produced: {args.fps} fps, delta threshold: {args.threshold}")
+    for content in args.content:
+        for protocol in ("ascii", "auto"):
+            result = measure(protocol, args.leds, args.baud, args.duration, checksum=not args.no_checksum,
+                             delta_threshold=args.threshold, content=content, fps=args.fps)
+            total = result["bytes_sent"] + result["bytes_suppressed"]
+            print(f"{content:>7} {result['protocol']:>6}: {result['bytes_per_frame']:7.1f} bytes/frame, "
+                  f"{result['bytes_per_second']:7.1f} bytes/s, {result['fps']:6.2f} strip refreshes/s, "
+                  f"{100 * result['bytes_suppressed'] / max(total, 1):5.1f}% suppressed, "
+                  f"{result['errors']} errors")
@@ -0,0 +1,109 @@
+"""
+Measure the startup time of the app in a fresh process, from the launch to the first frame sent, with a cold and a warm cache.
+"""
+
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from ..settings import Profile
+
+# run in a fresh interpreter, so nothing is imported or cached in memory yet
+_CHILD = """
+import json, sys, threading, time
+interpreter = time.time() - float(sys.argv[1])
+start = time.perf_counter()
+from transmitter.app import FlashyApp
+from transmitter.settings import Settings
+imported = time.perf_counter()
+settings = Settings(sys.argv[2])
+loaded = time.perf_counter()
+app = FlashyApp(settings)
+set_up = time.perf_counter()
+runner = threading.Thread(target=app.start, daemon=True)
+runner.start()
+while app.transmitters[0].frames_sent == 0 and runner.is_alive():
+    time.sleep(0.0005)
+first_frame = time.perf_counter()
+app.stop()
+runner.join()
+print(json.dumps({
+    "interpreter": interpreter,
+    "import": imported - start,
+    "settings": loaded - imported,
+    "setup": set_up - loaded,
+    "first_frame": first_frame - set_up,
+}))
+"""
+
+PHASES = ["interpreter", "import", "settings", "setup", "first_frame"]
+
+
+def measure(profile_path, settings_dir, args):
+    """Start the app in a new process and wait for the first frame it sends.
+
+    Returns:
+        dict: seconds spent in every phase and in total
+    """
+    with open(profile_path) as profile_file:
+        strip_size = len(Profile(json.load(profile_file)).map)
+    path = os.path.join(settings_dir, "startup.json")
+    with open(path, "w") as settings_file:
+        json.dump({
+            "port": "null",
+            "baud": args.baud,
+            "strip_size": strip_size,
+            "threads": args.threads,
+            "reader_mode": args.reader_mode,
+            "engine": args.engine,
+            "capture_backend": "synthetic",
+            "capture_options": {"pattern": "gradient"},
+            "metrics_interval": 0,
+            "profile": os.path.abspath(profile_path),
+            "displays": [[0, 0, args.screen[0], args.screen[1]]],
+            # the bench rewrites the settings file for every run
+            "hot_reload": False,
+        }, settings_file)
+
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD, repr(time.time()), path],
+        cwd=root, check=True, stdout=subprocess.PIPE, universal_newlines=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["total"] = sum(result[phase] for phase in PHASES)
+    return result
+
+
+def add_arguments(parser):
+    parser.add_argument("profiles", nargs="*",
+                        help="profile files to start with (default: all in settings/profiles/)")
+    parser.add_argument("--runs", type=int, default=3, help="warm starts per profile (default: 3)")
+    parser.add_argument("--baud", type=int, default=115200, help="baud rate of the emulated board (default: 115200)")
+    parser.add_argument("--screen", nargs=2, type=int, default=[2560, 1440], metavar=("WIDTH", "HEIGHT"),
+                        help="display size for the profiles relative to the display (default: 2560 1440)")
+    parser.add_argument("--threads", type=int, default=1, help="number of screen readers (default: 1)")
+    parser.add_argument("--reader-mode", default="threads", choices=["threads", "processes"],
+                        help="reader_mode (default: threads)")
+    parser.add_argument("--engine", default="threads", choices=["threads", "asyncio"],
+                        help="engine (default: threads)")
+
+
+def run(args):
+    profiles = args.profiles or sorted(glob.glob("settings/profiles/*.json"))
+    print(f"port null, synthetic frames, readers: {args.threads} ({args.reader_mode}), engine: {args.engine}, "
+          f"warm: best of {args.runs}")
+    print(f"{'profile':>40} {'cache':>5} " + " ".join(f"{phase + ' ms':>14}" for phase in PHASES + ["total"]))
+    for profile_path in profiles:
+        with tempfile.TemporaryDirectory() as settings_dir:
+            # the first start compiles the profile and caches the settings, the next ones load them
+            cold = measure(profile_path, settings_dir, args)
+            warm = min((measure(profile_path, settings_dir, args) for _ in range(args.runs)),
+                       key=lambda result: result["total"])
+        for cache, result in (("cold", cold), ("warm", warm)):
+            print(f"{os.path.basename(profile_path):>40} {cache:>5} "
+                  + " ".join(f"{result[phase] * 1000:14.1f}" for phase in PHASES + ["total"]))
@@ -0,0 +1,108 @@
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from ..network_protocol import DdpProtocol, E131Protocol, WledProtocol
+
+
+class UdpListener(threading.Thread):
+    """Emulates a network LED controller on a local UDP port, so the transmitter
+    can be run against it without hardware.
+
+    The transmitter sends to `url` like to a real controller. The listener
+    decodes DDP, E1.31 or WLED DNRGB datagrams into a frame of the whole strip
+    and counts the datagrams, bytes and frames shown: a DDP datagram with the
+    push flag, the E1.31 datagram of the last universe or the WLED datagram
+    with the last LED.
+
+    Args:
+        strip_size (int): number of LEDs on the emulated strip
+        protocol (str): "ddp", "e131" or "wled"
+
+    Attributes:
+        url (str): port setting for the transmitter
+        frame (numpy.ndarray): RGB values of the strip, shape (LEDs, 3)
+        datagrams (int): number of datagrams received
+        bytes_received (int): number of bytes received
+        shows (int): number of frames shown
+        errors (int): number of datagrams that could not be decoded
+    """
+    def __init__(self, strip_size, protocol="ddp"):
+        super(UdpListener, self).__init__()
+        self.daemon = True
+        self.strip_size = strip_size
+        self.protocol = protocol
+        self.frame = np.zeros((strip_size, 3), dtype=np.uint8)
+        self._data = self.frame.reshape(-1)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 2**20)
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.settimeout(0.1)
+        self.url = f"{protocol}://127.0.0.1:{self._socket.getsockname()[1]}"
+        self._running = True
+        self.reset()
+
+    def reset(self):
+        """Reset the counters.
+        """
+        self.datagrams = 0
+        self.bytes_received = 0
+        self.shows = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+
+    def stop(self):
+        """Stop listening and close the socket.
+        """
+        self._running = False
+        self.join()
+        self._socket.close()
+
+    def run(self):
+        buffer = bytearray(65536)
+        while self._running:
+            try:
+                size = self._socket.recv_into(buffer)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.datagrams += 1
+            self.bytes_received += size
+            try:
+                if self._decode(memoryview(buffer)[:size]):
+                    self.shows += 1
+            except (ValueError, struct.error):
+                self.errors += 1
+
+    def _decode(self, datagram):
+        """Copy the colours of a datagram into the frame.
+
+        Returns:
+            bool: True if the datagram completes a frame
+        """
+        if self.protocol == "ddp":
+            flags, _, _, _, offset, length = struct.unpack_from(">BBBBIH", datagram)
+            if flags & 0xC0 != DdpProtocol.VERSION or len(datagram) != 10 + length:
+                raise ValueError("Bad DDP header")
+            self._data[offset:offset + length] = datagram[10:]
+            return bool(flags & DdpProtocol.PUSH)
+        if self.protocol == "e131":
+            if datagram[4:16] != E131Protocol.ACN_IDENTIFIER:
+                raise ValueError("Bad E1.31 header")
+            universe, = struct.unpack_from(">H", datagram, 113)
+            count, = struct.unpack_from(">H", datagram, 123)
+            start = 3 * E131Protocol.leds_per_packet * (universe - 1)
+            self._data[start:start + count - 1] = datagram[126:126 + count - 1]
+            return start + count - 1 >= len(self._data)
+        if self.protocol == "wled":
+            if datagram[0] != WledProtocol.DNRGB:
+                raise ValueError("Bad WLED header")
+            start, = struct.unpack_from(">H", datagram, 2)
+            count = len(datagram) - 4
+            self._data[3 * start:3 * start + count] = datagram[4:]
+            return 3 * start + count >= len(self._data)
+        raise ValueError(f"Unknown protocol {self.protocol}")
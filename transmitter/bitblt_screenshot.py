@@ -1,11 +1,21 @@
+import ctypes
 import logging
-from datetime import datetime
+from ctypes import wintypes
 import win32gui, win32ui, win32con
-from PIL import Image
+import numpy as np
+
+
+_GetBitmapBits = ctypes.windll.gdi32.GetBitmapBits
+_GetBitmapBits.argtypes = [wintypes.HBITMAP, wintypes.LONG, wintypes.LPVOID]
+_GetBitmapBits.restype = wintypes.LONG
 
 
 class BitBltScreenshot:
-    """
+    """Capture session using BitBlt.
+
+    The device contexts and the bitmap are created once when the session is opened,
+    and every grab copies the bitmap bits into the same preallocated buffer.
+
     Using the code from 
     https://stackoverflow.com/questions/48092655/memory-leak-with-createdcfromhandle-createcompatibledc
     """
@@ -15,34 +25,55 @@ class BitBltScreenshot:
         self.size = (self.bbox[2]-self.bbox[0], self.bbox[3]-self.bbox[1])
         self.position = (self.bbox[0], self.bbox[1])
         self.logger = logging.getLogger("BitBltScreenshot")
-        self._grab()  # get the screenshot
+        self.hdc = None
 
-    def getpixel(self, x, y):
-        return self.screenshot.getpixel((x, y))
+    def open(self):
+        """Create the device contexts, the bitmap and the buffer.
 
-    def _grab(self):
-        start = datetime.utcnow()
+        Returns:
+            self
+        """
         self.hdc = win32gui.GetWindowDC(self.hwnd)
         self.dc = win32ui.CreateDCFromHandle(self.hdc)
         self.memdc = self.dc.CreateCompatibleDC()
         self.bitmap = win32ui.CreateBitmap()
         self.bitmap.CreateCompatibleBitmap(self.dc, self.size[0], self.size[1])
-        self.memdc.SelectObject(self.bitmap)        
-        try:
-            self.memdc.BitBlt((0, 0), self.size, self.dc, self.position, win32con.SRCCOPY)
-        except Exception as e:
-            self.logger.error(e.message)
-        self.bits = self.bitmap.GetBitmapBits(True)
-        self.screenshot = Image.frombuffer('RGB', self.size, self.bits, 'raw', 'BGRX', 0, 1)
-        grabtime_ms = (datetime.utcnow() - start).total_seconds() * 1000
-        self.logger.debug(f"grabbed a screenshot, duration={grabtime_ms}ms")
-
-    def __enter__(self):
+        self.memdc.SelectObject(self.bitmap)
+        self._buffer = ctypes.create_string_buffer(self.size[0] * self.size[1] * 4)
+        self._array = np.frombuffer(self._buffer, dtype=np.uint8).reshape(self.size[1], self.size[0], 4)
         return self
 
-    def __exit__(self, exc_type, exc_value, exc_traceback):
+    def grab(self):
+        """Capture the region.
+
+        Returns:
+            numpy.ndarray: raw BGRX pixel buffer with the shape (height, width, 4)
+        """
+        self.memdc.BitBlt((0, 0), self.size, self.dc, self.position, win32con.SRCCOPY)
+        copied = _GetBitmapBits(self.bitmap.GetHandle(), len(self._buffer), self._buffer)
+        if copied != len(self._buffer):
+            raise OSError(f"GetBitmapBits copied {copied} bytes out of {len(self._buffer)}")
+        return self._array
+
+    @property
+    def array(self):
+        """numpy.ndarray: raw BGRX pixel buffer of the last grab with the shape (height, width, 4)"""
+        return self._array
+
+    def close(self):
+        """Release the device contexts and the bitmap.
+        """
+        if self.hdc is None:
+            return
         win32gui.DeleteObject(self.bitmap.GetHandle())
         self.memdc.DeleteDC()
         win32gui.ReleaseDC(self.hwnd, self.hdc)
+        self.hdc = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
         self.logger.debug(f"exit called with exc_type={exc_type}, " +
                           f"exc_value={exc_value}, exc_traceback={exc_traceback}")
@@ -0,0 +1,107 @@
+from collections import namedtuple
+
+import numpy as np
+
+
+CaptureRegion = namedtuple("CaptureRegion", ["bbox", "leds"])
+CaptureRegion.__doc__ = """Rectangle of the screen captured in one grab.
+
+Attributes:
+    bbox (tuple): region of the screen, (x1, y1, x2, y2), exclusive at the end
+    leds (list): positions of the LEDs sampled from this region, in the list of rectangles that was planned
+"""
+
+# cost of one extra grab, expressed as the number of pixels that could be captured instead
+GRAB_OVERHEAD = 128 * 128
+
+
+def _area(boxes):
+    return (boxes[..., 2] - boxes[..., 0]) * (boxes[..., 3] - boxes[..., 1])
+
+
+def _union(box, boxes):
+    return np.stack([
+        np.minimum(box[0], boxes[:, 0]),
+        np.minimum(box[1], boxes[:, 1]),
+        np.maximum(box[2], boxes[:, 2]),
+        np.maximum(box[3], boxes[:, 3]),
+    ], axis=-1)
+
+
+def plan_capture(rects, overhead=GRAB_OVERHEAD):
+    """Group the LED rectangles into a small set of capture regions.
+
+    Starts with one region per LED and keeps merging the pair of regions
+    whose bounding box adds the fewest pixels, as long as capturing the
+    extra pixels is cheaper than one more grab. LEDs along one edge end up
+    in one region, while the opposite edges stay separate, instead of
+    capturing the whole screen in between.
+
+    Args:
+        rects (numpy.ndarray): rectangles sampled by every LED, (x1, y1, x2, y2), shape (LEDs, 4)
+        overhead (int): cost of one grab in pixels
+
+    Returns:
+        list[CaptureRegion]: capture regions, covering all the LEDs
+    """
+    boxes = np.array(rects, dtype=np.int64).reshape(-1, 4)
+    count = len(boxes)
+    members = [[i] for i in range(count)]
+    alive = np.ones(count, dtype=bool)
+
+    # cost[i, j]: pixels added by merging regions i and j, minus the grab saved
+    cost = np.full((count, count), np.iinfo(np.int64).max, dtype=np.int64)
+    areas = _area(boxes)
+    for i in range(count):
+        cost[i, i+1:] = _area(_union(boxes[i], boxes[i+1:])) - areas[i] - areas[i+1:] - overhead
+        cost[i+1:, i] = cost[i, i+1:]
+    np.fill_diagonal(cost, np.iinfo(np.int64).max)
+
+    for _ in range(count - 1):
+        i, j = np.unravel_index(np.argmin(cost), cost.shape)
+        if cost[i, j] > 0:
+            break
+
+        # merge j into i, and update the costs of i against everything else
+        boxes[i] = _union(boxes[i], boxes[j:j+1])[0]
+        areas[i] = _area(boxes[i])
+        members[i] += members[j]
+        alive[j] = False
+        cost[j, :] = cost[:, j] = np.iinfo(np.int64).max
+        others = np.flatnonzero(alive)
+        others = others[others != i]
+        cost[i, others] = _area(_union(boxes[i], boxes[others])) - areas[i] - areas[others] - overhead
+        cost[others, i] = cost[i, others]
+
+    return [
+        CaptureRegion(tuple(int(v) for v in boxes[i]), sorted(members[i]))
+        for i in np.flatnonzero(alive)
+    ]
+
+
+def bounding_box(rects):
+    """Bounding box of a set of rectangles.
+
+    Args:
+        rects (numpy.ndarray): rectangles, (x1, y1, x2, y2), shape (N, 4)
+
+    Returns:
+        tuple: bounding box, (x1, y1, x2, y2)
+    """
+    rects = np.asarray(rects).reshape(-1, 4)
+    return (
+        int(rects[:, 0].min()), int(rects[:, 1].min()),
+        int(rects[:, 2].max()), int(rects[:, 3].max())
+    )
+
+
+def capture_size(regions):
+    """Number of pixels captured for a plan.
+
+    Args:
+        regions (list[CaptureRegion]): capture regions
+
+    Returns:
+        int: number of pixels
+    """
+    return int(sum(_area(np.array(region.bbox)) for region in regions))
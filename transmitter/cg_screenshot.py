@@ -1,13 +1,16 @@
-import struct
 import math
 import logging
 
+import numpy as np
 import Quartz.CoreGraphics as CG
 
 
 class CGScreenshot(object):
-    """Captures the screen using CoreGraphics, and provides access to
-    the pixel values.
+    """Capture session using CoreGraphics.
+
+    CoreGraphics hands out a new image for every capture, so the session only
+    keeps the capture region, and every grab wraps the copied image data without
+    copying it again.
 
     From https://stackoverflow.com/questions/12978846/python-get-screen-pixel-value-in-os-x
     """
@@ -16,22 +19,37 @@ class CGScreenshot(object):
         self.logger = logging.getLogger("CGScreenshot")
         self.size = (self.bbox[2]-self.bbox[0], self.bbox[3]-self.bbox[1])
         self.position = (self.bbox[0], self.bbox[1])
-        self._grab(bbox)
+        self._region = None
+        self._array = None
+
+    def open(self):
+        """Prepare the capture region.
 
-    def _grab(self, bbox):
+        Returns:
+            self
+        """
         nearest_power_of_two = lambda n: 2**(int(math.log(n, 2)) + 1)
-        region = CG.CGRectMake(
+        self._region = CG.CGRectMake(
             self.position[0],
             self.position[1],
             nearest_power_of_two(self.size[0]),
             nearest_power_of_two(self.size[1])
         )
+        return self
 
+    def grab(self):
+        """Capture the region.
+
+        Returns:
+            numpy.ndarray: raw BGRA pixel buffer with the shape (height, bytes_per_row/4, 4)
+        """
         image = CG.CGWindowListCreateImage(
-            region,
+            self._region,
             CG.kCGWindowListOptionOnScreenOnly,
             CG.kCGNullWindowID,
             CG.kCGWindowImageNominalResolution)
+        if image is None:
+            raise OSError("CGWindowListCreateImage did not return an image")
 
         prov = CG.CGImageGetDataProvider(image)
         self._data = CG.CGDataProviderCopyData(prov)
@@ -39,16 +57,26 @@ class CGScreenshot(object):
         # Get width/height of image
         self.width = CG.CGImageGetWidth(image)
         self.height = CG.CGImageGetHeight(image)
+        self.bytes_per_row = CG.CGImageGetBytesPerRow(image)
+        self._array = np.frombuffer(self._data, dtype=np.uint8).reshape(self.height, self.bytes_per_row // 4, 4)
+        return self._array
+
+    @property
+    def array(self):
+        """numpy.ndarray: raw BGRA pixel buffer of the last grab with the shape (height, bytes_per_row/4, 4)"""
+        return self._array
 
-    def getpixel(self, x, y):
-        data_format = "BBBB"
-        offset = 4 * ((self.width*int(round(y))) + int(round(x)))
-        b, g, r, a = struct.unpack_from(data_format, self._data, offset=offset)
-        return (r, g, b)
+    def close(self):
+        """Forget the capture region and the last image.
+        """
+        self._region = None
+        self._data = None
+        self._array = None
 
     def __enter__(self):
-        return self
+        return self.open()
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
         self.logger.debug(f"exit called with exc_type={exc_type}, " +
                           f"exc_value={exc_value}, exc_traceback={exc_traceback}")
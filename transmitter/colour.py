@@ -0,0 +1,100 @@
+import numpy as np
+
+
+CHANNEL_OFFSETS = np.array([0, 256, 512], dtype=np.uint16)
+
+
+class ColourPipeline:
+    """Turns sampled screen colours into the values sent to the LEDs with one lookup table per channel.
+
+    The colour correction, the gamma curve, the white balance and the brightness
+    limit are compiled into 256-entry tables when the pipeline is built, so a
+    frame costs one vectorized table lookup. With `dithering`, the tables keep 8
+    fractional bits and the rounding error of every LED is carried over to the
+    next frame, so dim colours average out to in-between values over time
+    instead of all being rounded to the same few steps.
+
+    Args:
+        length (int): number of LEDs
+        correction (list): factors multiplying the r, g and b input values, negative values turn a channel off
+        gamma (float): exponent of the curve applied after the correction, 1 is linear
+        white_balance (list): relative r, g and b output levels, scaled so the largest one is 1
+        brightness (float): maximum output level, from 0 to 1
+        dithering (bool): carry the rounding error of every LED over to the next frame
+
+    Attributes:
+        lut (numpy.ndarray): output values, shape (3, 256), uint8
+        identity (bool): the pipeline does not change any value
+    """
+    def __init__(self, length, correction=(1.0, 1.0, 1.0), gamma=1.0, white_balance=(1.0, 1.0, 1.0),
+                 brightness=1.0, dithering=False):
+        if gamma <= 0:
+            raise ValueError("The gamma must be positive")
+        if not 0 <= brightness <= 1:
+            raise ValueError("The brightness must be from 0 to 1")
+        if min(white_balance) < 0 or max(white_balance) <= 0:
+            raise ValueError("The white balance needs positive values")
+        factors = np.array([1.0 if value < 0 else value for value in correction], dtype=np.float64)
+        balance = np.asarray(white_balance, dtype=np.float64) / max(white_balance)
+
+        levels = np.minimum(np.arange(256, dtype=np.float64)[np.newaxis, :] / 255 * factors[:, np.newaxis], 1.0)
+        levels = levels ** gamma * balance[:, np.newaxis] * brightness * 255
+        self.lut = np.rint(levels).astype(np.uint8)
+        self.identity = not dithering and np.array_equal(self.lut, np.tile(np.arange(256, dtype=np.uint8), (3, 1)))
+        self.dithering = dithering
+
+        # flat tables indexed by value + 256 * channel
+        self._lut = self.lut.ravel()
+        self._lut_fixed = np.rint(levels * 256).astype(np.uint16).ravel()
+        self._index = np.zeros((length, 3), dtype=np.uint16)
+        self._fixed = np.zeros((length, 3), dtype=np.uint16)
+        self._error = np.zeros((length, 3), dtype=np.uint16)
+        self._out = np.zeros((length, 3), dtype=np.uint8)
+
+    @classmethod
+    def from_settings(cls, settings, length):
+        """Build the pipeline from the colour settings.
+
+        Args:
+            settings (settings.Settings): flashy settings object
+            length (int): number of LEDs
+
+        Returns:
+            ColourPipeline: colour pipeline
+        """
+        return cls(
+            length,
+            correction=settings.colour_correction,
+            gamma=settings.gamma,
+            white_balance=settings.white_balance,
+            brightness=settings.brightness,
+            dithering=settings.dithering
+        )
+
+    @property
+    def settled(self):
+        """bool: whether the same input gives the same output again, not the case while dithering"""
+        return not self.dithering
+
+    def apply(self, colours):
+        """Map the colours of all the LEDs.
+
+        Args:
+            colours (numpy.ndarray): RGB values of the LEDs, shape (LEDs, 3), uint8
+
+        Returns:
+            numpy.ndarray: output RGB values, shape (LEDs, 3), uint8, overwritten by the next frame
+        """
+        if self.identity:
+            return colours
+        np.add(colours, CHANNEL_OFFSETS, out=self._index)
+        if not self.dithering:
+            self._lut.take(self._index, out=self._out)
+            return self._out
+        # 8.8 fixed point, the fraction left over is added to the next frame
+        self._lut_fixed.take(self._index, out=self._fixed)
+        self._fixed += self._error
+        np.bitwise_and(self._fixed, 0xFF, out=self._error)
+        np.right_shift(self._fixed, 8, out=self._fixed)
+        self._out[:] = self._fixed
+        return self._out
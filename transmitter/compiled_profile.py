@@ -0,0 +1,377 @@
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+from .kernels import normalise_kernel, weights as kernel_weights, window as kernel_window
+from .sampler import LedSampler
+
+
+class CompiledProfile:
+    """Array-backed representation of a profile map.
+
+    The pixels of all LEDs are stored as flat coordinate arrays with the offsets
+    where every LED starts, so the readers can build their sampling tables by slicing
+    instead of going through the map dictionary. The weights of the gaussian and
+    falloff kernels are evaluated here once, aligned with the pixels. The LEDs
+    averaging a whole window are summed from an integral image, they are marked
+    in `summed` and only have their window in `rects`, without any pixels.
+
+    Args:
+        rects (numpy.ndarray): bounding box of every LED, (x1, y1, x2, y2), shape (LEDs, 4)
+        xs (numpy.ndarray): x screen coordinates of the pixels of all LEDs
+        ys (numpy.ndarray): y screen coordinates of the pixels of all LEDs
+        starts (numpy.ndarray): index of the first pixel of every LED in xs/ys, shape (LEDs+1,)
+        weights (numpy.ndarray, optional): weight of every pixel in xs/ys, None if every LED is averaged
+        summed (numpy.ndarray, optional): whether every LED averages the whole window in `rects`
+            without a pixel list, shape (LEDs,)
+        displays (list[Display], optional): display geometry the `rect` entries were compiled for
+        source (str, optional): hash of the map and the sampling it was compiled from, without the displays
+
+    Attributes:
+        length (int): number of LEDs
+        rects (numpy.ndarray): bounding box of every LED, (x1, y1, x2, y2), shape (LEDs, 4)
+        xs (numpy.ndarray): x screen coordinates of the pixels of all LEDs
+        ys (numpy.ndarray): y screen coordinates of the pixels of all LEDs
+        starts (numpy.ndarray): index of the first pixel of every LED in xs/ys, shape (LEDs+1,)
+        weights (numpy.ndarray): weight of every pixel in xs/ys, None if every LED is averaged
+        summed (numpy.ndarray): whether every LED averages the whole window in `rects`
+            without a pixel list, shape (LEDs,)
+        displays (list[Display]): display geometry the `rect` entries were compiled for, None without any
+        source (str): hash of the map and the sampling it was compiled from, without the displays
+    """
+    VERSION = 3
+
+    def __init__(self, rects, xs, ys, starts, weights=None, summed=None, displays=None, source=None):
+        self.rects = rects
+        self.xs = xs
+        self.ys = ys
+        self.starts = starts
+        self.weights = weights
+        self.summed = summed if summed is not None else np.zeros(len(rects), dtype=bool)
+        self.displays = displays
+        self.source = source
+        self.length = len(rects)
+
+    @classmethod
+    def compile(cls, profile_map, sampling=None, displays=None, previous=None):
+        """Compile a normalised profile map.
+
+        Args:
+            profile_map (dict): map of the profile, string LED index -> {"bbox": [...]}, {"pixels": [...]}
+                or {"rect": [...], "display": int} in fractions of the size of a display, the `bbox` and
+                `rect` entries with an optional "kernel", see `kernels.normalise_kernel`
+            sampling (dict, optional): sampling density, {"stride": int} to sample every n-th pixel
+                in both directions, or {"samples": int} for a fixed number of samples per LED
+                on a jittered grid. Every pixel is sampled if None
+            displays (list[Display], optional): display geometry to compile the `rect` entries for
+            previous (CompiledProfile, optional): the same map and sampling compiled for other displays,
+                the LEDs that are not on a display that changed are copied from it
+
+        Returns:
+            compiled (CompiledProfile): compiled profile
+
+        Raises:
+            KeyError: the map indices are not consecutive from 0
+            ValueError: an LED has no pixels, has an invalid kernel or is on a display that does not exist
+        """
+        length = len(profile_map)
+        source = cls.hash(profile_map, sampling)
+        if previous is not None and previous.source != source:
+            previous = None
+        rects = np.zeros((length, 4), dtype=np.int32)
+        summed = np.zeros(length, dtype=bool)
+        xs, ys, weights = [], [], []
+        for index in range(length):
+            if str(index) not in profile_map:
+                raise KeyError(f"Key {index} does not appear in the map")
+            value = profile_map[str(index)]
+            led_weights = None
+            rect = None
+            if previous is not None and not _moved(value, previous.displays, displays):
+                start, end = previous.starts[index], previous.starts[index + 1]
+                led_xs, led_ys = previous.xs[start:end], previous.ys[start:end]
+                if previous.weights is not None:
+                    led_weights = previous.weights[start:end]
+                summed[index] = previous.summed[index]
+                rect = previous.rects[index]
+            elif "pixels" in value:
+                pixels = np.array(value["pixels"], dtype=np.int32).reshape(-1, 2)
+                if len(pixels) == 0:
+                    raise ValueError(f"LED {index} has no pixels in the map")
+                pixels = _subsample_pixels(pixels, sampling)
+                led_xs, led_ys = pixels[:, 0], pixels[:, 1]
+            else:
+                kernel = normalise_kernel(value.get("kernel"))
+                if "rect" in value:
+                    bbox = rect_bbox(value, displays, index)
+                    left, top, width, height = displays[value["display"]]
+                    window = kernel_window(bbox, kernel, (left, top, left + width, top + height))
+                else:
+                    bbox = value["bbox"]
+                    window = kernel_window(bbox, kernel)
+                if kernel["type"] == "box" and _samples_every_pixel(window, sampling):
+                    # a window sum, read from an integral image without a pixel list
+                    summed[index] = True
+                    rect = window
+                    led_xs = led_ys = np.zeros(0, dtype=np.int32)
+                else:
+                    led_xs, led_ys = _sample_bbox(window, sampling, seed=index)
+                    led_weights = kernel_weights(kernel, bbox, led_xs, led_ys)
+            if rect is None:
+                rect = (led_xs.min(), led_ys.min(), led_xs.max() + 1, led_ys.max() + 1)
+            rects[index] = rect
+            xs.append(led_xs)
+            ys.append(led_ys)
+            weights.append(led_weights)
+
+        starts = np.zeros(length + 1, dtype=np.int64)
+        starts[1:] = np.cumsum([len(led_xs) for led_xs in xs])
+        if any(led_weights is not None for led_weights in weights):
+            weights = np.concatenate([np.ones(len(led_xs), dtype=np.float32) if led_weights is None else led_weights
+                                      for led_xs, led_weights in zip(xs, weights)])
+        else:
+            weights = None
+        return cls(
+            rects,
+            np.concatenate(xs) if xs else np.zeros(0, dtype=np.int32),
+            np.concatenate(ys) if ys else np.zeros(0, dtype=np.int32),
+            starts,
+            weights=weights,
+            summed=summed,
+            displays=None if displays is None else list(displays),
+            source=source
+        )
+
+    @classmethod
+    def load(cls, profile_map, cache_dir=None, sampling=None, displays=None, previous=None):
+        """Compile a profile map, or load it from the cache if it was compiled before for the same displays.
+
+        Args:
+            profile_map (dict): normalised map of the profile
+            cache_dir (str, optional): directory to keep compiled profiles in, no caching if None
+            sampling (dict, optional): sampling density, see `compile`
+            displays (list[Display], optional): display geometry, see `compile`
+            previous (CompiledProfile, optional): compiled for other displays, see `compile`
+
+        Returns:
+            compiled (CompiledProfile): compiled profile
+        """
+        logger = logging.getLogger("CompiledProfile")
+        if cache_dir is None:
+            return cls.compile(profile_map, sampling, displays, previous)
+
+        # only the displays with LEDs on them are part of the key
+        used = [displays[index] if displays is not None and index < len(displays) else None
+                for index in used_displays(profile_map)]
+        cache_path = os.path.join(cache_dir, f"profile-{cls.hash(profile_map, sampling, used)}.npz")
+        if os.path.exists(cache_path):
+            try:
+                with np.load(cache_path) as cached:
+                    if int(cached["version"]) == cls.VERSION:
+                        logger.debug(f"Loaded compiled profile from {cache_path}")
+                        weights = cached["weights"]
+                        return cls(cached["rects"], cached["xs"], cached["ys"], cached["starts"],
+                                   weights=weights if len(weights) else None, summed=cached["summed"],
+                                   displays=None if displays is None else list(displays),
+                                   source=cls.hash(profile_map, sampling))
+            except (OSError, KeyError, ValueError) as e:
+                logger.warning(f"Ignoring broken compiled profile cache {cache_path}: {e}")
+
+        compiled = cls.compile(profile_map, sampling, displays, previous)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            compiled.save(cache_path)
+            logger.debug(f"Saved compiled profile to {cache_path}")
+        except OSError as e:
+            logger.warning(f"Could not cache the compiled profile to {cache_path}: {e}")
+        return compiled
+
+    @classmethod
+    def hash(cls, profile_map, sampling=None, displays=None):
+        """Hash of a profile map, used as the cache key.
+
+        Args:
+            profile_map (dict): normalised map of the profile
+            sampling (dict, optional): sampling density
+            displays (list[Display], optional): geometry of the displays the map uses
+
+        Returns:
+            str: hex digest
+        """
+        key = [cls.VERSION, profile_map, sampling]
+        if displays:
+            key.append(displays)
+        data = json.dumps(key, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def save(self, path):
+        """Save the compiled profile to a .npz file.
+
+        Args:
+            path (str): file path
+        """
+        # write to a temporary file first, so the readers never see a partial cache
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as cache_file:
+            np.savez(cache_file, version=self.VERSION,
+                     rects=self.rects, xs=self.xs, ys=self.ys, starts=self.starts, summed=self.summed,
+                     weights=self.weights if self.weights is not None else np.zeros(0, dtype=np.float32))
+        os.replace(tmp_path, path)
+
+    def pixels(self, index):
+        """Pixel coordinates of an LED.
+
+        Args:
+            index (int): index of the LED
+
+        Returns:
+            coords (list): list of (x, y) pixel coordinates
+
+        Raises:
+            KeyError: index not in the map
+        """
+        if not 0 <= index < self.length:
+            raise KeyError(f"Key {index} does not appear in the map")
+        if self.summed[index]:
+            x1, y1, x2, y2 = self.rects[index].tolist()
+            return [(x, y) for x in range(x1, x2) for y in range(y1, y2)]
+        start, end = self.starts[index], self.starts[index + 1]
+        return list(zip(self.xs[start:end].tolist(), self.ys[start:end].tolist()))
+
+    def sampler(self, indices):
+        """Create a sampler for a subset of the LEDs.
+
+        Args:
+            indices (list): LED indices in the order the sampler should return them
+
+        Returns:
+            sampler (LedSampler): sampler of the LEDs
+        """
+        slices = [slice(self.starts[i], self.starts[i + 1]) for i in indices]
+        counts = np.array([s.stop - s.start for s in slices], dtype=np.int64)
+        summed = self.summed[indices]
+        return LedSampler(
+            np.concatenate([self.xs[s] for s in slices]),
+            np.concatenate([self.ys[s] for s in slices]),
+            np.concatenate(([0], np.cumsum(counts)[:-1])),
+            weights=None if self.weights is None else np.concatenate([self.weights[s] for s in slices]),
+            windows=np.where(summed[:, None], self.rects[indices], -1) if summed.any() else None
+        )
+
+
+def used_displays(profile_map):
+    """Displays a profile map has LEDs on.
+
+    Args:
+        profile_map (dict): normalised map of the profile
+
+    Returns:
+        list[int]: sorted indices of the displays of the `rect` entries, empty if there are none
+    """
+    return sorted({value["display"] for value in profile_map.values() if "rect" in value})
+
+
+def _moved(value, old_displays, new_displays):
+    """Whether an LED has to be compiled again for new displays."""
+    if "rect" not in value:
+        return False
+    index = value["display"]
+    if old_displays is None or new_displays is None or index >= len(old_displays) or index >= len(new_displays):
+        return True
+    return tuple(old_displays[index]) != tuple(new_displays[index])
+
+
+def rect_bbox(value, displays, index):
+    """Pixel bounding box of a `rect` entry on its display.
+
+    Args:
+        value (dict): {"rect": [x1, y1, x2, y2], "display": int}, fractions of the width and height of the display
+        displays (list[Display]): display geometry
+        index (int): index of the LED, for the errors
+
+    Returns:
+        list: bounding box, [x1, y1, x2, y2], at least one pixel
+
+    Raises:
+        ValueError: the display does not exist
+    """
+    display = value["display"]
+    if displays is None or display >= len(displays):
+        raise ValueError(f"LED {index} is on display {display}, " +
+                         f"there are {0 if displays is None else len(displays)} displays")
+    left, top, width, height = displays[display]
+    x1, y1, x2, y2 = value["rect"]
+    bbox = [left + int(round(x1 * width)), top + int(round(y1 * height)),
+            left + int(round(x2 * width)), top + int(round(y2 * height))]
+    bbox[2] = max(bbox[2], bbox[0] + 1)
+    bbox[3] = max(bbox[3], bbox[1] + 1)
+    return bbox
+
+
+def _sample_bbox(bbox, sampling, seed=0):
+    """Pixels to sample from a bounding box.
+
+    Args:
+        bbox (list): bounding box, [x1, y1, x2, y2], exclusive at the end
+        sampling (dict): sampling density, see `CompiledProfile.compile`
+        seed (int): random seed of the jitter
+
+    Returns:
+        tuple: arrays of x and y coordinates
+    """
+    x1, y1, x2, y2 = bbox
+    width, height = x2 - x1, y2 - y1
+    sampling = sampling or {}
+    samples = sampling.get("samples")
+
+    if samples is not None and samples < width * height:
+        # one random pixel in every cell of a grid with roughly `samples` cells
+        columns = int(min(width, max(1, round(np.sqrt(samples * width / height)))))
+        rows = int(min(height, max(1, round(samples / columns))))
+        cell_x = np.linspace(x1, x2, columns + 1)
+        cell_y = np.linspace(y1, y2, rows + 1)
+        rng = np.random.default_rng(seed)
+        led_xs = cell_x[:-1, None] + rng.random((columns, rows)) * np.diff(cell_x)[:, None]
+        led_ys = cell_y[None, :-1] + rng.random((columns, rows)) * np.diff(cell_y)[None, :]
+        return (np.clip(led_xs.astype(np.int32).ravel(), x1, x2 - 1),
+                np.clip(led_ys.astype(np.int32).ravel(), y1, y2 - 1))
+
+    stride = max(1, int(sampling.get("stride") or 1))
+    # centre the grid in the box
+    led_xs, led_ys = np.meshgrid(
+        np.arange(x1 + ((width - 1) % stride) // 2, x2, stride, dtype=np.int32),
+        np.arange(y1 + ((height - 1) % stride) // 2, y2, stride, dtype=np.int32),
+        indexing="ij"
+    )
+    # x-major order, same as the pixel lists used to be expanded
+    return led_xs.ravel(), led_ys.ravel()
+
+
+def _samples_every_pixel(bbox, sampling):
+    """Whether `_sample_bbox` samples every pixel of a bounding box."""
+    sampling = sampling or {}
+    samples = sampling.get("samples")
+    if samples is not None and samples < (bbox[2] - bbox[0]) * (bbox[3] - bbox[1]):
+        return False
+    return max(1, int(sampling.get("stride") or 1)) == 1
+
+
+def _subsample_pixels(pixels, sampling):
+    """Subset of an explicit pixel list to sample.
+
+    Args:
+        pixels (numpy.ndarray): pixel coordinates, shape (N, 2)
+        sampling (dict): sampling density, see `CompiledProfile.compile`
+
+    Returns:
+        numpy.ndarray: pixel coordinates, shape (M, 2)
+    """
+    sampling = sampling or {}
+    samples = sampling.get("samples")
+    if samples is not None and samples < len(pixels):
+        return pixels[np.linspace(0, len(pixels) - 1, max(1, samples)).round().astype(int)]
+    stride = max(1, int(sampling.get("stride") or 1))
+    return pixels[::stride]
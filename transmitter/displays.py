@@ -0,0 +1,113 @@
+import logging
+import threading
+from collections import namedtuple
+from sys import platform
+
+# a display in the coordinates the capture backends use, primary display first
+Display = namedtuple("Display", ["left", "top", "width", "height"])
+
+
+def current_displays():
+    """Query the geometry of the connected displays.
+
+    The backends capture in the same coordinate space: the global display
+    coordinates in points on MacOS (CGDisplayBounds), the virtual screen
+    on Windows (monitor info) and the X root window on Linux (XRandR through mss).
+
+    Returns:
+        list[Display]: connected displays, the primary one first where the platform knows it
+
+    Raises:
+        OSError: the displays cannot be queried, e.g. without a display server
+    """
+    try:
+        if platform == "darwin":
+            displays = _cg_displays()
+        elif platform == "win32":
+            displays = _win32_displays()
+        else:
+            displays = _mss_displays()
+    except ImportError as e:
+        raise OSError(f"Cannot query the displays: {e}")
+    if not displays:
+        raise OSError("No displays connected")
+    return displays
+
+
+def _cg_displays():
+    import Quartz.CoreGraphics as CG
+    error, ids, count = CG.CGGetActiveDisplayList(32, None, None)
+    if error:
+        raise OSError(f"CGGetActiveDisplayList failed with error {error}")
+    main = CG.CGMainDisplayID()
+    displays = []
+    for display_id in sorted(ids[:count], key=lambda display_id: display_id != main):
+        bounds = CG.CGDisplayBounds(display_id)
+        displays.append(Display(int(bounds.origin.x), int(bounds.origin.y),
+                                int(bounds.size.width), int(bounds.size.height)))
+    return displays
+
+
+def _win32_displays():
+    import win32api
+    displays = []
+    for monitor, _, _ in win32api.EnumDisplayMonitors(None, None):
+        info = win32api.GetMonitorInfo(monitor)
+        left, top, right, bottom = info["Monitor"]
+        # MONITORINFOF_PRIMARY
+        primary = info["Flags"] & 1
+        displays.insert(0 if primary else len(displays), Display(left, top, right - left, bottom - top))
+    return displays
+
+
+def _mss_displays():
+    import mss
+    # the first monitor of mss is the union of all of them
+    with mss.mss() as screen:
+        return [Display(monitor["left"], monitor["top"], monitor["width"], monitor["height"])
+                for monitor in screen.monitors[1:]]
+
+
+class DisplayWatcher(threading.Thread):
+    """Thread checking the display geometry every `interval` seconds and calling back when it changed,
+    e.g. after a resolution or scaling change or a display was connected.
+
+    Args:
+        displays (list[Display]): current display geometry
+        callback (callable): called with the new list of displays, from the watcher thread
+        interval (float): seconds between checking the displays
+
+    Attributes:
+        displays (list[Display]): last display geometry seen
+        logger (Logger): logger object used to write logs from this thread
+    """
+    def __init__(self, displays, callback, interval=2.0):
+        super(DisplayWatcher, self).__init__(name="DisplayWatcher")
+        self.daemon = True
+        self.displays = list(displays)
+        self.callback = callback
+        self.interval = interval
+        self.logger = logging.getLogger(self.name)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """Stop watching, the thread finishes right away, or after the callback it is running.
+        """
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                displays = current_displays()
+            except OSError as e:
+                # e.g. while the display server reconfigures
+                self.logger.debug(f"Could not query the displays: {e}")
+                continue
+            if displays == self.displays or self._stop_event.is_set():
+                continue
+            self.logger.info(f"The displays changed from {self.displays} to {displays}")
+            self.displays = displays
+            try:
+                self.callback(displays)
+            except Exception as e:
+                self.logger.error(f"Recompiling the profile for the new displays failed: {e}")
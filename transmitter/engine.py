@@ -0,0 +1,144 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncEngine:
+    """Runs the screen readers and the serial transmitters as tasks of one asyncio event loop.
+
+    The blocking work, capturing the screen and writing to the serial ports, runs in
+    executors with one thread per reader and one per transmitter, so the capture
+    sessions and the ports are always used from the same thread and a slow port does
+    not hold up the others. The readers wake the transmitters through asyncio events
+    as soon as they write a frame, and every reader is paced by its FrameScheduler,
+    so there is no polling.
+
+    Args:
+        readers (list[ScreenReaderAsync]): screen readers to run, not started as threads.
+            Empty if the readers run in separate processes
+        transmitters (list[SerialTransmitterAsync]): serial transmitters, not started as threads
+        frame_buffer (FrameBuffer/SharedFrameBuffer): frame buffer the readers write to
+
+    Attributes:
+        readers (list[ScreenReaderAsync]): screen readers
+        transmitters (list[SerialTransmitterAsync]): serial transmitters
+        frame_buffer (FrameBuffer/SharedFrameBuffer): frame buffer the readers write to
+        logger (Logger): logger object used to write logs from the engine
+    """
+    def __init__(self, readers, transmitters, frame_buffer):
+        self.readers = readers
+        self.transmitters = transmitters
+        self.frame_buffer = frame_buffer
+        self.logger = logging.getLogger("AsyncEngine")
+        self._loop = None
+        self._stopped = None
+        self._frame_ready = []
+
+    async def run(self):
+        """Run all the tasks until stopped or cancelled, then close the capture sessions and the serial port.
+
+        Raises:
+            Exception: any error that ended one of the tasks
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._frame_ready = [asyncio.Event() for _ in self.transmitters]
+        tasks = [asyncio.ensure_future(self._read(reader)) for reader in self.readers]
+        tasks += [
+            asyncio.ensure_future(self._transmit(transmitter, frame_ready))
+            for transmitter, frame_ready in zip(self.transmitters, self._frame_ready)
+        ]
+        stopped = asyncio.ensure_future(self._stopped.wait())
+        self.logger.debug(f"Started the engine with {len(self.readers)} screen readers " +
+                          f"and {len(self.transmitters)} transmitters")
+        try:
+            await asyncio.wait(tasks + [stopped], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks + [stopped]:
+                task.cancel()
+            await asyncio.gather(*tasks, stopped, return_exceptions=True)
+            self.logger.debug("Stopped the engine")
+        for task in tasks:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+    def stop(self):
+        """Stop the engine, can be called from any thread.
+        """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    async def _read(self, reader):
+        """Capture frames with one reader at the fps limit.
+
+        Args:
+            reader (ScreenReaderAsync): screen reader
+        """
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=reader.name)
+        captures = None
+        step = None
+        try:
+            while True:
+                reader.scheduler.start_frame()
+                step = executor.submit(reader.step, captures)
+                captures = await asyncio.wrap_future(step)
+                if captures is None:
+                    await asyncio.sleep(1)
+                    reader.scheduler.reset()
+                    reader.filters.reset()
+                    continue
+                for frame_ready in self._frame_ready:
+                    frame_ready.set()
+                await asyncio.sleep(reader.scheduler.end_frame())
+        finally:
+            # the sessions are closed from the thread that opened them,
+            # after the step that was running when the task was cancelled
+            executor.submit(self._close_captures, reader, step, captures)
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    def _close_captures(reader, step, captures):
+        if step is not None and not step.cancelled():
+            captures = step.result()
+        reader._close_captures(captures)
+
+    async def _transmit(self, transmitter, frame_ready):
+        """Send every new frame to one serial port, skipping the frames written while sending.
+
+        Args:
+            transmitter (SerialTransmitterAsync): serial transmitter
+            frame_ready (asyncio.Event): set by the readers when they write a frame
+        """
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=transmitter.name)
+        sequence = 0
+        try:
+            while True:
+                info = await self._next_frame(transmitter, frame_ready, sequence, executor)
+                if info is None or info.sequence == sequence:
+                    # e.g. a static screen the readers skip
+                    await self._loop.run_in_executor(executor, transmitter.refresh)
+                    continue
+                sequence = info.sequence
+                await self._loop.run_in_executor(executor, transmitter.send_frame, info.updated, info)
+        finally:
+            executor.submit(transmitter.close)
+            executor.shutdown(wait=False)
+
+    async def _next_frame(self, transmitter, frame_ready, sequence, executor):
+        """Wait for a frame newer than `sequence` and copy it to the transmitter snapshot.
+
+        Returns:
+            info (FrameInfo): the new frame, None if there was none before the last one has to be sent again
+        """
+        if self.readers:
+            if not frame_ready.is_set():
+                try:
+                    await asyncio.wait_for(frame_ready.wait(), transmitter.wait_timeout())
+                except asyncio.TimeoutError:
+                    return None
+            frame_ready.clear()
+            return self.frame_buffer.read(transmitter.snapshot, sequence, transmitter.index_range)
+        # reader processes cannot set the event, wait on the shared frame buffer in the executor
+        return await self._loop.run_in_executor(
+            executor, self.frame_buffer.wait, sequence, transmitter.snapshot, transmitter.wait_timeout(),
+            transmitter.index_range)
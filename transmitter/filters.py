@@ -0,0 +1,244 @@
+from sys import platform
+
+import numpy as np
+
+
+# filters used when the `filters` setting is null, they replace the flicker workarounds
+# that used to be hard-coded for these platforms
+PLATFORM_FILTERS = {
+    "darwin": [{"type": "black_gate", "frames": 5}],  # dragging windows flashes black frames
+    "linux": [{"type": "median", "frames": 5}],
+}
+
+
+class MedianFilter:
+    """Median of every channel of every LED over the last `frames` frames.
+
+    The frames are kept in a preallocated ring, so memory and time per frame
+    only depend on the number of LEDs and `frames`.
+
+    Args:
+        length (int): number of LEDs
+        frames (int): number of frames to take the median of
+    """
+    def __init__(self, length, frames=5):
+        if frames < 1:
+            raise ValueError("The median filter needs at least 1 frame")
+        self._ring = np.zeros((frames, length, 3), dtype=np.uint8)
+        self._median = np.zeros((length, 3), dtype=np.float64)
+        self._out = np.zeros((length, 3), dtype=np.uint8)
+        self.reset()
+
+    def reset(self):
+        """Forget the previous frames.
+        """
+        self._filled = 0
+        self._next = 0
+
+    @property
+    def settled(self):
+        """bool: whether filtering the same frame again gives the same output"""
+        return self._filled == len(self._ring) and bool(np.all(self._ring == self._ring[0]))
+
+    def apply(self, colours, mask):
+        """Filter a frame.
+
+        Args:
+            colours (numpy.ndarray): RGB values of the LEDs, shape (LEDs, 3), uint8
+            mask (numpy.ndarray): LEDs to write, shape (LEDs,), bool, cleared for the LEDs to skip
+
+        Returns:
+            numpy.ndarray: filtered RGB values, shape (LEDs, 3), uint8, overwritten by the next frame
+        """
+        self._ring[self._next] = colours
+        self._next = (self._next + 1) % len(self._ring)
+        self._filled = min(self._filled + 1, len(self._ring))
+        np.median(self._ring[:self._filled], axis=0, out=self._median)
+        np.rint(self._median, out=self._median)
+        self._out[:] = self._median
+        return self._out
+
+
+class EmaFilter:
+    """Exponential moving average of every channel of every LED.
+
+    Args:
+        length (int): number of LEDs
+        alpha (float): weight of the newest frame, 1 turns the filter off
+    """
+    def __init__(self, length, alpha=0.5):
+        if not 0 < alpha <= 1:
+            raise ValueError("The EMA alpha must be in (0, 1]")
+        self.alpha = alpha
+        self._average = np.zeros((length, 3), dtype=np.float32)
+        self._input = np.zeros((length, 3), dtype=np.uint8)
+        self._out = np.zeros((length, 3), dtype=np.uint8)
+        self.reset()
+
+    def reset(self):
+        """Forget the average.
+        """
+        self._started = False
+
+    @property
+    def settled(self):
+        """bool: whether filtering the same frame again gives the same output"""
+        return not self._started or np.array_equal(self._out, self._input)
+
+    def apply(self, colours, mask):
+        """Filter a frame, see MedianFilter.apply."""
+        self._input[:] = colours
+        if self._started:
+            self._average += self.alpha * (colours - self._average)
+        else:
+            self._average[:] = colours
+            self._started = True
+        # the average itself is not rounded, otherwise it would stall short of the input
+        np.rint(self._average, out=self._out, casting="unsafe")
+        return self._out
+
+
+class BlackGateFilter:
+    """Skips the LEDs that turn pure black for fewer than `frames` frames in a row.
+
+    Brief black flashes, e.g. while windows are dragged around on MacOS, leave
+    the LEDs on their previous colour, a black that lasts longer goes through.
+
+    Args:
+        length (int): number of LEDs
+        frames (int): number of black frames in a row to skip
+    """
+    def __init__(self, length, frames=5):
+        self.frames = frames
+        self._counts = np.zeros(length, dtype=np.int64)
+        self._skipped = np.zeros(length, dtype=bool)
+
+    def reset(self):
+        """Forget the black frames so far.
+        """
+        self._counts[:] = 0
+
+    @property
+    def settled(self):
+        """bool: whether filtering the same frame again gives the same output"""
+        return not self._skipped.any()
+
+    def apply(self, colours, mask):
+        """Filter a frame, see MedianFilter.apply."""
+        black = ~colours.any(axis=1)
+        np.logical_and(black, self._counts < self.frames, out=self._skipped)
+        self._counts += 1
+        self._counts[~black] = 0
+        mask &= ~self._skipped
+        return colours
+
+
+class SlewFilter:
+    """Limits how much every channel of every LED can change from one frame to the next.
+
+    Args:
+        length (int): number of LEDs
+        limit (int): largest change per frame
+    """
+    def __init__(self, length, limit=32):
+        if limit < 1:
+            raise ValueError("The slew limit must be at least 1")
+        self.limit = limit
+        self._previous = np.zeros((length, 3), dtype=np.int16)
+        self._step = np.zeros((length, 3), dtype=np.int16)
+        self._out = np.zeros((length, 3), dtype=np.uint8)
+        self.reset()
+
+    def reset(self):
+        """Forget the previous frame.
+        """
+        self._started = False
+
+    @property
+    def settled(self):
+        """bool: whether filtering the same frame again gives the same output"""
+        return not self._started or bool(np.all(np.abs(self._step) < self.limit))
+
+    def apply(self, colours, mask):
+        """Filter a frame, see MedianFilter.apply."""
+        if self._started:
+            np.subtract(colours, self._previous, out=self._step, dtype=np.int16)
+            np.clip(self._step, -self.limit, self.limit, out=self._step)
+            self._previous += self._step
+        else:
+            self._previous[:] = colours
+            self._started = True
+        self._out[:] = self._previous
+        return self._out
+
+
+FILTERS = {
+    "median": MedianFilter,
+    "ema": EmaFilter,
+    "black_gate": BlackGateFilter,
+    "slew": SlewFilter,
+}
+
+
+class FilterChain:
+    """Temporal filters applied to the whole LED frame of a screen reader, in order.
+
+    Args:
+        filters (list): filters, see FILTERS
+
+    Attributes:
+        filters (list): filters
+    """
+    def __init__(self, filters):
+        self.filters = filters
+
+    @classmethod
+    def from_settings(cls, specs, length):
+        """Build the filters from the `filters` setting.
+
+        Args:
+            specs (list): list of {"type": name, **options}, None for the defaults of the platform
+            length (int): number of LEDs
+
+        Returns:
+            FilterChain: filter chain
+
+        Raises:
+            ValueError: unknown filter type or invalid options
+        """
+        if specs is None:
+            specs = PLATFORM_FILTERS.get("linux" if platform.startswith("linux") else platform, [])
+        filters = []
+        for spec in specs:
+            options = dict(spec)
+            name = options.pop("type", None)
+            if name not in FILTERS:
+                raise ValueError(f"Unknown filter type: '{name}'")
+            filters.append(FILTERS[name](length, **options))
+        return cls(filters)
+
+    @property
+    def settled(self):
+        """bool: whether filtering the same frame again gives the same output,
+        i.e. whether static frames can be skipped"""
+        return all(f.settled for f in self.filters)
+
+    def reset(self):
+        """Reset all the filters, e.g. after the capture was interrupted.
+        """
+        for f in self.filters:
+            f.reset()
+
+    def apply(self, colours, mask):
+        """Filter a frame.
+
+        Args:
+            colours (numpy.ndarray): RGB values of the LEDs, shape (LEDs, 3), uint8
+            mask (numpy.ndarray): LEDs to write, shape (LEDs,), bool, cleared for the LEDs to skip
+
+        Returns:
+            numpy.ndarray: filtered RGB values, shape (LEDs, 3), uint8, can be overwritten by the next frame
+        """
+        for f in self.filters:
+            colours = f.apply(colours, mask)
+        return colours
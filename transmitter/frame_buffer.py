@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+
+FrameInfo = namedtuple("FrameInfo", ["sequence", "timestamp", "updated", "written"])
+FrameInfo.__doc__ = """Description of a frame read from a FrameBuffer.
+
+Attributes:
+    sequence (int): sequence number of the frame, increases with every write
+    timestamp (float): time.perf_counter() of the capture of the latest write
+    updated (int): number of LEDs written since the frame the reader saw before
+    written (float): time.perf_counter() of the latest write
+"""
+
+
+class FrameBuffer:
+    """Latest-frame exchange between the screen readers and the transmitter.
+
+    The colours of the whole strip live in one preallocated array. Readers
+    write their LEDs in one go, which bumps the sequence number, and the
+    transmitter copies out the newest frame whenever the sequence number
+    changes. Frames nobody picked up are simply overwritten, so there is
+    never a backlog of stale values. The only lock is held for the duration
+    of a single array copy.
+
+    Every LED keeps the sequence number of the frame that last wrote it, so
+    every transmitter counts the LEDs updated since the frame it saw before,
+    however many transmitters read the same buffer.
+
+    Args:
+        length (int): number of LEDs
+
+    Attributes:
+        length (int): number of LEDs
+        sequence (int): sequence number of the latest frame
+        timestamp (float): capture time of the latest frame, time.perf_counter()
+        link_cost (float): seconds it takes to send a frame, set by the transmitter so the readers can adapt
+    """
+    def __init__(self, length):
+        self.length = length
+        self.sequence = 0
+        self.timestamp = None
+        self.link_cost = 0.0
+        self._written = None
+        self._frame = np.zeros((length, 3), dtype=np.uint8)
+        self._stamps = np.zeros(length, dtype=np.uint64)
+        self._condition = threading.Condition()
+
+    def write(self, indices, colours, timestamp=None):
+        """Write the colours of some LEDs and publish a new frame.
+
+        Args:
+            indices (numpy.ndarray/list): LED indices
+            colours (numpy.ndarray): RGB values of the LEDs, shape (len(indices), 3)
+            timestamp (float, optional): capture time, time.perf_counter(), defaults to now
+
+        Returns:
+            int: sequence number of the new frame
+        """
+        with self._condition:
+            self._frame[indices] = colours
+            self.sequence += 1
+            self._stamps[indices] = self.sequence
+            self._written = time.perf_counter()
+            self.timestamp = self._written if timestamp is None else timestamp
+            self._condition.notify_all()
+            return self.sequence
+
+    def read(self, out, sequence=0, index_range=None):
+        """Copy the latest frame.
+
+        Args:
+            out (numpy.ndarray): array to copy the frame to, shape (length, 3)
+            sequence (int): sequence number of the last frame the caller has seen,
+                the LEDs written after it are counted as updated
+            index_range (list, optional): range of LED indices to count the updated LEDs in, all if None
+
+        Returns:
+            info (FrameInfo): sequence number, timestamp and the number of updated LEDs
+        """
+        with self._condition:
+            return self._read(out, sequence, index_range)
+
+    def wait(self, sequence, out, timeout=None, index_range=None):
+        """Wait for a frame newer than `sequence` and copy it.
+
+        Args:
+            sequence (int): sequence number of the last frame the caller has seen
+            out (numpy.ndarray): array to copy the frame to, shape (length, 3)
+            timeout (float, optional): seconds to wait, waits forever if None
+            index_range (list, optional): range of LED indices to count the updated LEDs in, all if None
+
+        Returns:
+            info (FrameInfo): sequence number, timestamp and the number of LEDs updated after `sequence`,
+                None if there was no new frame within the timeout
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.sequence != sequence, timeout):
+                return None
+            return self._read(out, sequence, index_range)
+
+    def _read(self, out, sequence, index_range):
+        np.copyto(out, self._frame)
+        stamps = self._stamps if index_range is None else self._stamps[index_range[0]:index_range[1]]
+        updated = int(np.count_nonzero(stamps > sequence))
+        return FrameInfo(self.sequence, self.timestamp, updated, self._written)
+
+    def close(self):
+        """Nothing to free, the same interface as SharedFrameBuffer.
+        """
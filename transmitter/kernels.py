@@ -0,0 +1,113 @@
+import numpy as np
+
+KERNELS = ("box", "gaussian", "falloff")
+EDGES = ("top", "right", "bottom", "left")
+
+
+def normalise_kernel(kernel):
+    """Validate a `kernel` value of a profile and fill in the defaults.
+
+    Args:
+        kernel (str/dict): "box", "gaussian" or "falloff", or a dict with the "type" and its options:
+            "overlap" (fraction of the size of the LED the window reaches into the neighbours on every side),
+            "sigma" (gaussian, fraction of the size of the LED), "edge" and "length" (falloff, the edge of
+            the LED the weights fall off from and the fraction of the depth they drop to 1/e over)
+
+    Returns:
+        dict: kernel with all its options
+
+    Raises:
+        ValueError: the kernel is not valid
+    """
+    if kernel is None:
+        kernel = "box"
+    if isinstance(kernel, str):
+        kernel = {"type": kernel}
+    kernel = dict(kernel)
+    kernel.setdefault("type", "box")
+    kernel.setdefault("overlap", 0.0)
+    if kernel["type"] not in KERNELS:
+        raise ValueError(f"Unknown kernel: '{kernel['type']}', must be {', '.join(KERNELS)}")
+    if kernel["overlap"] < 0:
+        raise ValueError(f"Kernel overlap must not be negative, not {kernel['overlap']}")
+    if kernel["type"] == "gaussian":
+        kernel.setdefault("sigma", 0.5)
+        if kernel["sigma"] <= 0:
+            raise ValueError(f"Kernel sigma must be positive, not {kernel['sigma']}")
+    elif kernel["type"] == "falloff":
+        kernel.setdefault("length", 0.5)
+        if kernel["length"] <= 0:
+            raise ValueError(f"Kernel length must be positive, not {kernel['length']}")
+        if kernel.get("edge") not in EDGES:
+            raise ValueError(f"Falloff kernel edge must be {', '.join(EDGES)}, not {kernel.get('edge')}")
+    return kernel
+
+
+def nearest_edge(rect):
+    """Edge of the display closest to a rect in fractions of the display.
+
+    Args:
+        rect (list): [x1, y1, x2, y2]
+
+    Returns:
+        str: "top", "right", "bottom" or "left"
+    """
+    x1, y1, x2, y2 = rect
+    distances = {"top": y1, "right": 1 - x2, "bottom": 1 - y2, "left": x1}
+    return min(EDGES, key=lambda edge: distances[edge])
+
+
+def window(bbox, kernel, bounds=None):
+    """Window of the screen an LED samples, its bounding box grown by the overlap of the kernel.
+
+    Args:
+        bbox (list): bounding box of the LED, [x1, y1, x2, y2]
+        kernel (dict): normalised kernel
+        bounds (tuple, optional): (x1, y1, x2, y2) the window is clipped to, e.g. the display
+
+    Returns:
+        list: window, [x1, y1, x2, y2]
+    """
+    x1, y1, x2, y2 = bbox
+    grow_x = int(round(kernel["overlap"] * (x2 - x1)))
+    grow_y = int(round(kernel["overlap"] * (y2 - y1)))
+    x1, y1, x2, y2 = x1 - grow_x, y1 - grow_y, x2 + grow_x, y2 + grow_y
+    left, top, right, bottom = bounds if bounds is not None else (0, 0, x2, y2)
+    return [max(x1, left), max(y1, top), min(x2, right), min(y2, bottom)]
+
+
+def weights(kernel, bbox, xs, ys):
+    """Weights of the sampled pixels of an LED, the product of a weight along x and one along y.
+
+    Args:
+        kernel (dict): normalised kernel
+        bbox (list): bounding box of the LED the kernel is centred on, [x1, y1, x2, y2]
+        xs (numpy.ndarray): x coordinates of the sampled pixels
+        ys (numpy.ndarray): y coordinates of the sampled pixels
+
+    Returns:
+        numpy.ndarray: float32 weight of every pixel, None for a box kernel
+    """
+    if kernel["type"] == "box":
+        return None
+    x1, y1, x2, y2 = bbox
+    width, height = x2 - x1, y2 - y1
+    # pixel centres
+    px, py = xs + 0.5, ys + 0.5
+    if kernel["type"] == "gaussian":
+        sigma = kernel["sigma"]
+        wx = np.exp(-0.5 * ((px - (x1 + x2) / 2) / (sigma * width)) ** 2)
+        wy = np.exp(-0.5 * ((py - (y1 + y2) / 2) / (sigma * height)) ** 2)
+        return (wx * wy).astype(np.float32)
+
+    # falloff: distance from the edge in fractions of the depth of the LED, constant along the edge
+    edge = kernel["edge"]
+    if edge == "top":
+        distance = (py - y1) / height
+    elif edge == "bottom":
+        distance = (y2 - py) / height
+    elif edge == "left":
+        distance = (px - x1) / width
+    else:
+        distance = (x2 - px) / width
+    return np.exp(-np.maximum(distance, 0.0) / kernel["length"]).astype(np.float32)
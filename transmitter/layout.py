@@ -0,0 +1,292 @@
+"""
+Generate profiles for LEDs around the edges of a display from a declarative layout.
+
+Preview a layout or emit it as a profile:
+
+    python -m transmitter.layout --top 40 --right 22 --bottom 40 --left 22 --start bottom-left --preview
+    python -m transmitter.layout settings/profiles/perimeter_124.json --emit bbox --screen 2560 1440
+"""
+
+import argparse
+import json
+import sys
+
+EDGES = ["top", "right", "bottom", "left"]
+# the corner every edge starts at, going clockwise
+CORNERS = ["top-left", "top-right", "bottom-right", "bottom-left"]
+
+
+def layout_rects(layout):
+    """Rects of the LEDs of a layout, in the order of the strip.
+
+    The strip starts at the `start` corner and runs around the display in
+    `direction`, every edge gets its number of LEDs spread evenly over the
+    parts of the edge that are not in a gap, and every LED samples `depth`
+    into the display.
+
+    Args:
+        layout (dict): {"edges": {"top": int, "right": int, "bottom": int, "left": int},
+            "start": "top-left"/"top-right"/"bottom-right"/"bottom-left", "direction": "clockwise"/"counterclockwise",
+            "depth": fraction of the display height for the top and bottom edge, and of the width for the
+            left and right edge, or a dict of them per edge,
+            "gaps": {edge: [[start, end], ...]} parts of the edges without LEDs, in fractions of the edge from
+            the left or the top, e.g. for a stand}
+
+    Returns:
+        list[list[float]]: [x1, y1, x2, y2] of every LED in fractions of the display
+
+    Raises:
+        ValueError: the layout is not valid
+    """
+    return [rect for _, rect in _layout_leds(layout)]
+
+
+def _layout_leds(layout):
+    """Edge and rect of the LEDs of a layout, in the order of the strip, see `layout_rects`."""
+    edges = layout.get("edges", {})
+    unknown = set(edges) - set(EDGES)
+    if unknown:
+        raise ValueError(f"Unknown layout edges: {', '.join(sorted(unknown))}, must be {', '.join(EDGES)}")
+    start = layout.get("start", "top-left")
+    if start not in CORNERS:
+        raise ValueError(f"Unknown layout start corner: '{start}', must be {', '.join(CORNERS)}")
+    direction = layout.get("direction", "clockwise")
+    if direction not in ("clockwise", "counterclockwise"):
+        raise ValueError(f"Unknown layout direction: '{direction}', must be clockwise or counterclockwise")
+    depth = layout.get("depth", 0.05)
+    gaps = layout.get("gaps", {})
+
+    corner = CORNERS.index(start)
+    if direction == "clockwise":
+        # top runs left to right, right top to bottom, bottom right to left and left bottom to top
+        order = [(EDGES[(corner + i) % 4], (corner + i) % 4 >= 2) for i in range(4)]
+    else:
+        order = [(EDGES[(corner - 1 - i) % 4], (corner - 1 - i) % 4 < 2) for i in range(4)]
+
+    leds = []
+    for edge, reverse in order:
+        count = int(edges.get(edge, 0))
+        if count <= 0:
+            continue
+        edge_depth = depth.get(edge, 0.05) if isinstance(depth, dict) else depth
+        if not 0 < edge_depth <= 1:
+            raise ValueError(f"Layout depth of the {edge} edge must be in (0, 1], not {edge_depth}")
+        spans = _spans(count, gaps.get(edge, []), edge)
+        if reverse:
+            spans = spans[::-1]
+        for begin, end in spans:
+            leds.append((edge, _edge_rect(edge, begin, end, edge_depth)))
+    if not leds:
+        raise ValueError("The layout has no LEDs")
+    return leds
+
+
+def layout_map(layout):
+    """Profile map of a layout, with a `rect` entry for every LED.
+
+    Args:
+        layout (dict): layout, see `layout_rects`, with the optional "display" the LEDs are on and
+            the optional "kernel" of the LEDs, a falloff kernel falls off from the edge every LED is on
+
+    Returns:
+        dict: profile map, string LED index -> {"rect": [...], "display": int}
+    """
+    display = layout.get("display", 0)
+    kernel = layout.get("kernel")
+    if isinstance(kernel, str):
+        kernel = {"type": kernel}
+    profile_map = {}
+    for index, (edge, rect) in enumerate(_layout_leds(layout)):
+        value = {"rect": [round(value, 6) for value in rect], "display": display}
+        if kernel is not None:
+            value["kernel"] = dict(kernel, edge=kernel.get("edge", edge)) if kernel.get("type") == "falloff" else dict(kernel)
+        profile_map[str(index)] = value
+    return profile_map
+
+
+def _spans(count, gaps, edge):
+    """Parts of an edge covered by its LEDs, spread evenly over the parts that are not in a gap.
+
+    Args:
+        count (int): number of LEDs
+        gaps (list): [start, end] fractions of the edge without LEDs
+        edge (str): name of the edge, for the errors
+
+    Returns:
+        list[tuple]: (start, end) fractions of the edge of every LED, in increasing order
+    """
+    segments = [(0.0, 1.0)]
+    for gap in sorted(gaps):
+        begin, end = gap
+        if not 0 <= begin < end <= 1:
+            raise ValueError(f"Layout gap {gap} of the {edge} edge must be fractions of the edge, start < end")
+        segments = [part for low, high in segments for part in ((low, min(high, begin)), (max(low, end), high))
+                    if part[1] > part[0]]
+    total = sum(high - low for low, high in segments)
+    if total <= 0:
+        raise ValueError(f"The gaps of the {edge} edge leave no room for the LEDs")
+
+    def position(offset):
+        # position on the edge `offset` along the parts without gaps, and the part it is in
+        for low, high in segments:
+            if offset <= high - low:
+                return low + offset, (low, high)
+            offset -= high - low
+        low, high = segments[-1]
+        return high, (low, high)
+
+    spans = []
+    size = total / count
+    for index in range(count):
+        _, part = position((index + 0.5) * size)
+        begin, begin_part = position(index * size)
+        end, end_part = position((index + 1) * size)
+        # an LED does not reach over a gap, it ends with the part its centre is in
+        spans.append((begin if begin_part == part else part[0], end if end_part == part else part[1]))
+    return spans
+
+
+def _edge_rect(edge, begin, end, depth):
+    """Rect of an LED on an edge, [x1, y1, x2, y2] in fractions of the display."""
+    if edge == "top":
+        return [begin, 0.0, end, depth]
+    if edge == "bottom":
+        return [begin, 1.0 - depth, end, 1.0]
+    if edge == "left":
+        return [0.0, begin, depth, end]
+    return [1.0 - depth, begin, 1.0, end]
+
+
+def bbox_map(profile_map, width, height, left=0, top=0):
+    """Explicit pixel map of a `rect` map for one display size.
+
+    Args:
+        profile_map (dict): map with `rect` entries
+        width (int): display width
+        height (int): display height
+        left (int): left edge of the display
+        top (int): top edge of the display
+
+    Returns:
+        dict: profile map, string LED index -> {"bbox": [x1, y1, x2, y2]}
+    """
+    from .compiled_profile import rect_bbox
+    from .displays import Display
+    displays = [Display(left, top, width, height)]
+    bboxes = {}
+    for key, value in profile_map.items():
+        bboxes[key] = {"bbox": rect_bbox(dict(value, display=0), displays, int(key))}
+        if "kernel" in value:
+            bboxes[key]["kernel"] = value["kernel"]
+    return bboxes
+
+
+def preview(profile_map, columns=96, aspect=16 / 9):
+    """Draw the LEDs of a `rect` map as text, the digit of every LED is its index modulo 10.
+
+    Args:
+        profile_map (dict): map with `rect` entries
+        columns (int): width of the drawing in characters
+        aspect (float): width / height of the display
+
+    Returns:
+        str: drawing
+    """
+    # characters are about twice as high as wide
+    rows = max(4, int(round(columns / aspect / 2)))
+    canvas = [[" "] * columns for _ in range(rows)]
+    for row in (0, rows - 1):
+        canvas[row] = ["-"] * columns
+    for row in range(rows):
+        canvas[row][0] = canvas[row][-1] = "|"
+    for key in sorted(profile_map, key=int):
+        x1, y1, x2, y2 = profile_map[key]["rect"]
+        column_range = range(min(int(x1 * columns), columns - 1), max(int(x1 * columns) + 1, min(int(x2 * columns), columns)))
+        row_range = range(min(int(y1 * rows), rows - 1), max(int(y1 * rows) + 1, min(int(y2 * rows), rows)))
+        for row in row_range:
+            for column in column_range:
+                canvas[row][column] = str(int(key) % 10)
+    return "\n".join("".join(row) for row in canvas)
+
+
+def _dumps(profile):
+    """Profile as json, like the profiles in settings/profiles/ with one LED or layout field per line."""
+    key = "map" if "map" in profile else "layout"
+    entries = ",\n".join(f'        "{name}": {json.dumps(value)}' for name, value in profile[key].items())
+    header = json.dumps({name: value for name, value in profile.items() if name != key}, indent=4)[:-2]
+    return f'{header},\n\n    "{key}": {{\n{entries}\n    }}\n}}'
+
+
+def _arguments():
+    parser = argparse.ArgumentParser(prog="python -m transmitter.layout", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", nargs="?", help="profile or layout json file, instead of the options below")
+    for edge in EDGES:
+        parser.add_argument(f"--{edge}", type=int, default=0, help=f"number of LEDs on the {edge} edge")
+    parser.add_argument("--start", default="top-left", choices=CORNERS, help="corner the strip starts at (default: top-left)")
+    parser.add_argument("--direction", default="clockwise", choices=["clockwise", "counterclockwise"],
+                        help="direction the strip runs around the display in (default: clockwise)")
+    parser.add_argument("--depth", type=float, default=0.05,
+                        help="how far into the display the LEDs sample, fraction of its height or width (default: 0.05)")
+    parser.add_argument("--gap", action="append", default=[], metavar="EDGE:START:END",
+                        help="part of an edge without LEDs in fractions of the edge, e.g. bottom:0.45:0.55")
+    parser.add_argument("--kernel", default=None, choices=["box", "gaussian", "falloff"],
+                        help="how the pixels of every LED are weighted (default: box, the plain average)")
+    parser.add_argument("--display", type=int, default=0, help="display the LEDs are on (default: 0, the primary one)")
+    parser.add_argument("--description", default=None, help="description of the emitted profile")
+    parser.add_argument("--emit", choices=["layout", "map", "bbox"], default=None,
+                        help="print a profile with the layout, an explicit `rect` map, or a pixel `bbox` map for --screen")
+    parser.add_argument("--preview", action="store_true", help="draw the LEDs, the default without --emit")
+    parser.add_argument("--screen", nargs=2, type=int, default=[2560, 1440], metavar=("WIDTH", "HEIGHT"),
+                        help="display size for --emit bbox and the preview (default: 2560 1440)")
+    parser.add_argument("--output", "-o", default=None, help="file to write the profile to (default: stdout)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _arguments()
+    if args.path is not None:
+        with open(args.path) as layout_file:
+            data = json.load(layout_file)
+        layout = data.get("layout", data)
+        description = args.description or data.get("description")
+    else:
+        gaps = {}
+        for gap in args.gap:
+            edge, begin, end = gap.split(":")
+            gaps.setdefault(edge, []).append([float(begin), float(end)])
+        layout = {
+            "edges": {edge: getattr(args, edge) for edge in EDGES if getattr(args, edge)},
+            "start": args.start,
+            "direction": args.direction,
+            "depth": args.depth,
+            "gaps": gaps,
+            "display": args.display,
+        }
+        if args.kernel is not None:
+            layout["kernel"] = args.kernel
+        description = args.description
+    try:
+        profile_map = layout_map(layout)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    description = description or f"{len(profile_map)} LEDs around the display, from the {layout.get('start', 'top-left')} corner"
+
+    if args.emit is None or args.preview:
+        print(preview(profile_map, aspect=args.screen[0] / args.screen[1]))
+        counts = ", ".join(f"{edge} {count}" for edge, count in layout.get("edges", {}).items())
+        print(f"{len(profile_map)} LEDs ({counts}), LED 0 at the {layout.get('start', 'top-left')} corner, " +
+              f"{layout.get('direction', 'clockwise')}")
+    if args.emit is not None:
+        if args.emit == "layout":
+            profile = {"description": description, "layout": layout}
+        elif args.emit == "map":
+            profile = {"description": description, "map": profile_map}
+        else:
+            profile = {"description": f"{description}, {args.screen[0]}x{args.screen[1]}",
+                       "map": bbox_map(profile_map, args.screen[0], args.screen[1])}
+        text = _dumps(profile)
+        if args.output is None:
+            sys.stdout.write(text + "\n")
+        else:
+            with open(args.output, "w") as profile_file:
+                profile_file.write(text + "\n")
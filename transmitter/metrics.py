@@ -0,0 +1,402 @@
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+
+
+# upper bounds of the histogram buckets in seconds, 0.1ms to 10s
+BUCKETS = tuple(round(10 ** (exponent / 4), 7) for exponent in range(-16, 5))
+
+
+class Histogram:
+    """Distribution of a measurement in fixed buckets.
+
+    Recording a value is a binary search and a few additions, cheap enough to do
+    for every frame. Percentiles are estimated from the buckets.
+
+    Args:
+        name (str): metric name
+        labels (dict, optional): labels of this series, e.g. {"reader": "ScreenReader_0_50"}
+        buckets (tuple): upper bounds of the buckets, ascending
+
+    Attributes:
+        name (str): metric name
+        labels (dict): labels of this series
+        count (int): number of values recorded
+        sum (float): sum of the values recorded
+    """
+    def __init__(self, name, labels=None, buckets=BUCKETS):
+        self.name = name
+        self.labels = labels or {}
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Record a value.
+
+        Args:
+            value (float): value to record, in seconds for durations
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, q):
+        """Estimate a percentile by interpolating within its bucket.
+
+        Args:
+            q (float): percentile, 0..100
+
+        Returns:
+            float: estimated value, nan if nothing was recorded
+        """
+        if self.count == 0:
+            return math.nan
+        rank = q / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def summary(self):
+        """Summary of the recorded values.
+
+        Returns:
+            dict: count, mean, p50, p95 and p99
+        """
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else math.nan,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class Counter:
+    """Monotonically increasing count.
+
+    Args:
+        name (str): metric name
+        labels (dict, optional): labels of this series
+
+    Attributes:
+        name (str): metric name
+        labels (dict): labels of this series
+        value (int): current count
+    """
+    def __init__(self, name, labels=None):
+        self.name = name
+        self.labels = labels or {}
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Increase the count.
+
+        Args:
+            amount (int): how much to add
+        """
+        self.value += amount
+
+
+class Gauge:
+    """Value read from a function whenever the metrics are exported.
+
+    Args:
+        name (str): metric name
+        function (callable): returns the current value
+        labels (dict, optional): labels of this series
+        kind (str): "gauge", or "counter" if the function returns a count that only goes up
+
+    Attributes:
+        name (str): metric name
+        labels (dict): labels of this series
+        kind (str): "gauge" or "counter"
+    """
+    def __init__(self, name, function, labels=None, kind="gauge"):
+        self.name = name
+        self.labels = labels or {}
+        self.function = function
+        self.kind = kind
+
+    @property
+    def value(self):
+        """int/float: current value, nan if it cannot be read"""
+        try:
+            value = self.function()
+            return value if isinstance(value, int) else float(value)
+        except Exception:
+            return math.nan
+
+
+class Metrics:
+    """Registry of the metrics of the app.
+
+    The components look up their metrics once when they are set up and record
+    into them directly, the registry is only involved when exporting.
+    Each process has its own registry.
+
+    Attributes:
+        histograms (dict): (name, labels) -> Histogram
+        counters (dict): (name, labels) -> Counter
+        gauges (dict): (name, labels) -> Gauge
+    """
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def _get(self, series, cls, name, labels, *args):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            if key not in series:
+                series[key] = cls(name, *args, labels=labels)
+            return series[key]
+
+    def histogram(self, name, labels=None):
+        """Get or create a histogram.
+
+        Args:
+            name (str): metric name, e.g. "capture_seconds"
+            labels (dict, optional): labels of the series
+
+        Returns:
+            Histogram: histogram
+        """
+        return self._get(self.histograms, Histogram, name, labels)
+
+    def counter(self, name, labels=None):
+        """Get or create a counter.
+
+        Args:
+            name (str): metric name, e.g. "bytes_sent_total"
+            labels (dict, optional): labels of the series
+
+        Returns:
+            Counter: counter
+        """
+        return self._get(self.counters, Counter, name, labels)
+
+    def gauge(self, name, function, labels=None, kind="gauge"):
+        """Register a gauge, replacing the previous one with the same name and labels.
+
+        Args:
+            name (str): metric name, e.g. "achieved_fps"
+            function (callable): returns the current value
+            labels (dict, optional): labels of the series
+            kind (str): "gauge", or "counter" for a count the component keeps itself
+
+        Returns:
+            Gauge: gauge
+        """
+        gauge = Gauge(name, function, labels=labels, kind=kind)
+        with self._lock:
+            self.gauges[(name, tuple(sorted((labels or {}).items())))] = gauge
+        return gauge
+
+    def clear(self):
+        """Forget all the metrics, e.g. between benchmark runs.
+        """
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def _series(self, series):
+        with self._lock:
+            return list(series.values())
+
+    def snapshot(self):
+        """Current values of all the metrics.
+
+        Returns:
+            dict: histograms summaries, counter and gauge values, as lists of series with their labels
+        """
+        return {
+            "histograms": [dict(name=h.name, labels=h.labels, **h.summary()) for h in self._series(self.histograms)],
+            "counters": [dict(name=c.name, labels=c.labels, value=c.value) for c in self._series(self.counters)],
+            "gauges": [dict(name=g.name, labels=g.labels, value=g.value) for g in self._series(self.gauges)],
+        }
+
+    def to_json(self):
+        """All the metrics as JSON, NaNs are written as null.
+
+        Returns:
+            str: JSON document
+        """
+        def clean(value):
+            if isinstance(value, float) and math.isnan(value):
+                return None
+            if isinstance(value, dict):
+                return {k: clean(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [clean(v) for v in value]
+            return value
+        return json.dumps(clean(self.snapshot()), indent=2)
+
+    def to_prometheus(self, prefix="flashy_"):
+        """All the metrics in the Prometheus text exposition format.
+
+        Args:
+            prefix (str): prefix of the metric names
+
+        Returns:
+            str: metrics text
+        """
+        def labels(series, extra=None):
+            items = dict(series.labels, **(extra or {}))
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items.items()) + "}"
+
+        lines = []
+        series = self._series(self.counters) + self._series(self.gauges)
+        for name in sorted({s.name for s in series}):
+            lines.append(f"# TYPE {prefix}{name} {_kind(series, name)}")
+            lines += [f"{prefix}{s.name}{labels(s)} {s.value}" for s in series if s.name == name]
+        histograms = self._series(self.histograms)
+        for name in sorted({h.name for h in histograms}):
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            for h in (h for h in histograms if h.name == name):
+                cumulative = 0
+                for bound, count in zip(h.buckets + ("+Inf",), h.counts):
+                    cumulative += count
+                    lines.append(f"{prefix}{name}_bucket{labels(h, {'le': bound})} {cumulative}")
+                lines.append(f"{prefix}{name}_sum{labels(h)} {h.sum}")
+                lines.append(f"{prefix}{name}_count{labels(h)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+# registry of this process
+registry = Metrics()
+
+
+def _kind(series, name):
+    kinds = {getattr(s, "kind", "counter") for s in series if s.name == name}
+    return kinds.pop() if len(kinds) == 1 else "untyped"
+
+
+def _label(series):
+    values = ",".join(str(value) for value in series["labels"].values())
+    return f"{series['name']}[{values}]" if values else series["name"]
+
+
+class MetricsReporter(threading.Thread):
+    """Thread logging a summary of the metrics and dumping them to a JSON file periodically,
+    and optionally serving them over HTTP on localhost.
+
+    The endpoint serves /metrics in the Prometheus text format and /metrics.json.
+
+    Args:
+        metrics (Metrics): registry to report
+        interval (float): seconds between the summaries, 0 to never log them
+        path (str, optional): JSON file to overwrite with all the metrics every interval
+        port (int, optional): port of the HTTP endpoint, no endpoint if None
+
+    Attributes:
+        metrics (Metrics): registry to report
+        server (ThreadingHTTPServer): HTTP server, None if there is no endpoint
+        logger (Logger): logger object used to write the summaries
+    """
+    def __init__(self, metrics, interval=60.0, path=None, port=None):
+        super(MetricsReporter, self).__init__(name="MetricsReporter")
+        self.daemon = True
+        self.metrics = metrics
+        self.interval = interval
+        self.path = path
+        self.port = port
+        self.server = None
+        self.logger = logging.getLogger(self.name)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        """Serve the endpoint and report every interval until stopped.
+        """
+        if self.port is not None:
+            self._serve()
+        while not self._stop_event.wait(self.interval or 1.0):
+            if self.interval:
+                self.logger.info(self.summary())
+            if self.path is not None:
+                self.dump(self.path)
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def stop(self):
+        """Stop reporting and close the endpoint.
+        """
+        self._stop_event.set()
+
+    def summary(self):
+        """One line summary of the most useful metrics.
+
+        Returns:
+            str: summary
+        """
+        snapshot = self.metrics.snapshot()
+        parts = []
+        for h in snapshot["histograms"]:
+            if h["count"]:
+                parts.append(f"{_label(h)}={h['p50']*1000:.1f}/{h['p95']*1000:.1f}ms".replace("_seconds", ""))
+        for s in snapshot["counters"] + snapshot["gauges"]:
+            value = s["value"]
+            if value and not math.isnan(value):
+                parts.append(f"{_label(s)}={value:.1f}" if isinstance(value, float) else f"{_label(s)}={value}")
+        return "Metrics (p50/p95): " + ", ".join(parts)
+
+    def dump(self, path):
+        """Write all the metrics to a JSON file.
+
+        Args:
+            path (str): file path
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as metrics_file:
+                metrics_file.write(self.metrics.to_json())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.warning(f"Could not write the metrics to {path}: {e}")
+
+    def _serve(self):
+        # only loaded with an endpoint, it takes a while to import
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = metrics.to_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = metrics.to_json(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        except OSError as e:
+            self.logger.error(f"Could not serve the metrics on port {self.port}: {e}")
+            return
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="MetricsServer", daemon=True).start()
+        self.logger.info(f"Serving the metrics on http://127.0.0.1:{self.server.server_address[1]}/metrics")
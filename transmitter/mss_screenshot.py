@@ -1,40 +1,66 @@
 import mss
 import logging
+import numpy as np
 
 
 class MSSScreenshot(object):
-    """Captures the screen using Python MSS,
+    """Capture session using Python MSS,
     which is cross platform but intended for linux here.
 
+    The MSS instance (and its X connection) is opened once and reused for every frame.
+
     Docs: https://python-mss.readthedocs.io/index.html
     """
     def __init__(self, bbox):
         self.bbox = (bbox[0], bbox[1], bbox[2], bbox[3])
-        self.logger = logging.getLogger("CGScreenshot")
+        self.logger = logging.getLogger("MSSScreenshot")
         self.size = (self.bbox[2]-self.bbox[0], self.bbox[3]-self.bbox[1])
         self.position = (self.bbox[0], self.bbox[1])
-        self._mss_instance = mss.mss()
-        self._grab(bbox)
-
-    def _grab(self, bbox):
-        bbox_dict = dict(
-            top=bbox[1],
-            left=bbox[0],
-            width=bbox[2] - bbox[0],
-            height=bbox[3] - bbox[1]
+        self._monitor = dict(
+            top=self.position[1],
+            left=self.position[0],
+            width=self.size[0],
+            height=self.size[1]
         )
-        self._data = self._mss_instance.grab(bbox_dict)
+        self._mss_instance = None
+        self._array = None
+
+    def open(self):
+        """Open the MSS instance.
 
-        self.width = self._data.width
-        self.height = self._data.height
+        Returns:
+            self
+        """
+        self._mss_instance = mss.mss()
+        return self
 
-    def getpixel(self, x, y):
-        return self._data.pixel(x, y)
+    def grab(self):
+        """Capture the region.
+
+        Returns:
+            numpy.ndarray: raw BGRA pixel buffer with the shape (height, width, 4)
+        """
+        data = self._mss_instance.grab(self._monitor)
+        # the buffer belongs to the screenshot object, wrapping it does not copy it
+        self._array = np.frombuffer(data.raw, dtype=np.uint8).reshape(data.height, data.width, 4)
+        return self._array
+
+    @property
+    def array(self):
+        """numpy.ndarray: raw BGRA pixel buffer of the last grab with the shape (height, width, 4)"""
+        return self._array
+
+    def close(self):
+        """Close the MSS instance.
+        """
+        if self._mss_instance is not None:
+            self._mss_instance.close()
+            self._mss_instance = None
 
     def __enter__(self):
-        return self
+        return self.open()
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self._mss_instance.close()
+        self.close()
         self.logger.debug(f"exit called with exc_type={exc_type}, " +
                           f"exc_value={exc_value}, exc_traceback={exc_traceback}")
@@ -0,0 +1,196 @@
+import socket
+import struct
+import uuid
+
+import numpy as np
+
+
+class _DatagramProtocol:
+    """Encodes whole frames into preallocated datagrams.
+
+    Every datagram has a fixed header and carries the RGB bytes of a range of
+    LEDs. The datagrams are allocated once, encoding a frame only copies the
+    RGB bytes into them and updates the sequence numbers.
+
+    The controllers leave realtime mode when no datagram arrives for a while,
+    2.5 s for E1.31 and for DDP in WLED, and show their own effects again,
+    so the frame is sent again well before that even if it did not change.
+
+    Args:
+        length (int): number of LEDs
+        host (str): address of the controller
+        port (int, optional): UDP port, the default port of the protocol if None
+
+    Attributes:
+        packets (list[tuple]): (datagram, address) of every datagram of a frame
+        size (int): number of bytes of all the datagrams of a frame
+        refresh_interval (float): seconds after which the frame is sent again if nothing changed
+    """
+    name = None
+    port = None
+    leds_per_packet = None
+    refresh_interval = 1.0
+
+    def __init__(self, length, host, port=None):
+        self.host = host
+        self.packets = []
+        self._data = []
+        self._sequence = 0
+        for index, start in enumerate(range(0, length, self.leds_per_packet)):
+            count = min(self.leds_per_packet, length - start)
+            header = self._header(index, start, count, start + count == length)
+            datagram = bytearray(len(header) + 3 * count)
+            datagram[:len(header)] = header
+            self.packets.append((datagram, self._address(index, host, port or self.port)))
+            view = np.frombuffer(datagram, dtype=np.uint8)[len(header):]
+            self._data.append((view, 3 * start, 3 * (start + count)))
+        self.size = sum(len(datagram) for datagram, _ in self.packets)
+
+    def encode(self, frame):
+        """Copy the colours of a frame into the datagrams.
+
+        Args:
+            frame (numpy.ndarray): RGB values of the whole strip, shape (LEDs, 3)
+
+        Returns:
+            list[tuple]: (datagram, address) to send, overwritten by the next frame
+        """
+        data = np.ascontiguousarray(frame).reshape(-1)
+        self._sequence += 1
+        for (datagram, _), (view, start, end) in zip(self.packets, self._data):
+            np.copyto(view, data[start:end])
+            self._set_sequence(datagram)
+        return self.packets
+
+    def _header(self, index, start, count, last):
+        raise NotImplementedError
+
+    def _address(self, index, host, port):
+        return (host, port)
+
+    def _set_sequence(self, datagram):
+        pass
+
+
+class DdpProtocol(_DatagramProtocol):
+    """Distributed Display Protocol, spoken by WLED, ESPixelStick and most pixel controllers.
+
+    Every datagram has a 10 byte header with the byte offset of its data in
+    the frame, the last one of a frame has the push flag set, so the
+    controller shows the frame once it has all of it.
+    """
+    name = "ddp"
+    port = 4048
+    leds_per_packet = 480  # 1440 bytes of data, fits an ethernet frame
+
+    VERSION = 0x40
+    PUSH = 0x01
+    RGB8 = 0x0B  # RGB, 8 bits per channel
+    DISPLAY = 0x01  # default output device
+
+    def _header(self, index, start, count, last):
+        flags = self.VERSION | (self.PUSH if last else 0)
+        return struct.pack(">BBBBIH", flags, 0, self.RGB8, self.DISPLAY, 3 * start, 3 * count)
+
+    def _set_sequence(self, datagram):
+        # 4 bit sequence number, 0 means not used
+        datagram[1] = self._sequence % 15 + 1
+
+
+class E131Protocol(_DatagramProtocol):
+    """E1.31 (streaming ACN / sACN), a DMX universe of 170 LEDs per datagram.
+
+    The universes are numbered from `first_universe`. With the host
+    "multicast", every universe is sent to its own multicast group
+    239.255.<universe high byte>.<universe low byte>.
+
+    Args:
+        length (int): number of LEDs
+        host (str): address of the controller, "multicast" for the multicast groups of the universes
+        port (int, optional): UDP port, 5568 if None
+        first_universe (int): universe of the first 170 LEDs
+        priority (int): priority of the source, 0-200
+    """
+    name = "e131"
+    port = 5568
+    leds_per_packet = 170  # 510 of the 512 DMX channels
+
+    HEADER_SIZE = 126
+    ACN_IDENTIFIER = b"ASC-E1.17\x00\x00\x00"
+    SOURCE_NAME = b"flashy"
+
+    def __init__(self, length, host, port=None, first_universe=1, priority=100):
+        self.first_universe = first_universe
+        self.priority = priority
+        self._cid = uuid.uuid4().bytes
+        super(E131Protocol, self).__init__(length, host, port)
+
+    def _header(self, index, start, count, last):
+        size = self.HEADER_SIZE + 3 * count
+        return b"".join((
+            # root layer
+            struct.pack(">HH12sHI", 0x0010, 0x0000, self.ACN_IDENTIFIER, 0x7000 | (size - 16), 0x00000004),
+            self._cid,
+            # framing layer: source name, priority, sync address, sequence, options, universe
+            struct.pack(">HI64sBHBBH", 0x7000 | (size - 38), 0x00000002, self.SOURCE_NAME, self.priority,
+                        0, 0, 0, self.first_universe + index),
+            # DMP layer: address and data type, first address, increment, count with the start code, start code
+            struct.pack(">HBBHHHB", 0x7000 | (size - 115), 0x02, 0xA1, 0x0000, 0x0001, 1 + 3 * count, 0x00),
+        ))
+
+    def _address(self, index, host, port):
+        if host == "multicast":
+            universe = self.first_universe + index
+            return (f"239.255.{universe >> 8}.{universe & 0xFF}", port)
+        return (host, port)
+
+    def _set_sequence(self, datagram):
+        datagram[111] = self._sequence % 256
+
+
+class WledProtocol(_DatagramProtocol):
+    """WLED realtime UDP in the DNRGB format: the index of the first LED and up to 489 RGB values.
+
+    Args:
+        length (int): number of LEDs
+        host (str): address of the WLED controller
+        port (int, optional): UDP port, 21324 if None
+        timeout (int): seconds WLED stays in realtime mode after the last datagram, 255 to stay until rebooted
+    """
+    name = "wled"
+    port = 21324
+    leds_per_packet = 489
+
+    DNRGB = 4
+
+    def __init__(self, length, host, port=None, timeout=2):
+        self.timeout = timeout
+        if timeout < 255:
+            # 255 stays in realtime mode
+            self.refresh_interval = min(self.refresh_interval, timeout / 2)
+        super(WledProtocol, self).__init__(length, host, port)
+
+    def _header(self, index, start, count, last):
+        return struct.pack(">BBH", self.DNRGB, self.timeout, start)
+
+
+PROTOCOLS = {
+    "ddp": DdpProtocol,
+    "e131": E131Protocol,
+    "wled": WledProtocol,
+}
+
+
+def is_multicast(address):
+    """Check whether an IPv4 address is a multicast group.
+
+    Args:
+        address (str): IPv4 address or host name
+
+    Returns:
+        bool: True for 224.0.0.0/4
+    """
+    try:
+        return 224 <= socket.inet_aton(address)[0] <= 239
+    except OSError:
+        return False
@@ -0,0 +1,73 @@
+import logging
+import time
+
+from .protocol import HANDSHAKE_QUERY, HANDSHAKE_REPLY
+
+
+class NullSerial(object):
+    """Serial port stand-in that discards everything written to it,
+    used as the port "null" to run the app without a board.
+
+    It answers the protocol handshake like the receiver does, and can
+    hold every write for as long as it would take on a real link.
+
+    Args:
+        baud (int): baud rate to emulate
+        throttle (bool): hold the writes for the time they would take at `baud`
+        handshake (bool): answer the handshake, otherwise behave like an old ascii-only receiver
+
+    Attributes:
+        timeout (float): read timeout in seconds
+        bytes_written (int): number of bytes written
+        writes (int): number of writes
+    """
+    def __init__(self, baud=9600, throttle=True, handshake=True, timeout=1):
+        self.baud = baud
+        self.throttle = throttle
+        self.handshake = handshake
+        self.timeout = timeout
+        self.bytes_written = 0
+        self.writes = 0
+        self.logger = logging.getLogger("NullSerial")
+        self._input = b""
+        self._busy_until = 0.0
+
+    def write(self, data):
+        """Discard the data, waiting for the time it would take to send it if throttled.
+
+        Args:
+            data (bytes): data to send
+
+        Returns:
+            int: number of bytes written
+        """
+        if self.handshake and data == HANDSHAKE_QUERY:
+            self._input += HANDSHAKE_REPLY + b"1\n"
+        if self.throttle:
+            # 10 bits per byte with the start and stop bits
+            now = time.perf_counter()
+            self._busy_until = max(self._busy_until, now) + len(data) * 10 / self.baud
+            time.sleep(max(0.0, self._busy_until - now))
+        self.bytes_written += len(data)
+        self.writes += 1
+        return len(data)
+
+    def read(self, size=1):
+        """Read the handshake reply, if any.
+
+        Args:
+            size (int): maximum number of bytes
+
+        Returns:
+            bytes: data received
+        """
+        data, self._input = self._input[:size], self._input[size:]
+        if not data and self.timeout:
+            time.sleep(self.timeout)
+        return data
+
+    def reset_input_buffer(self):
+        self._input = b""
+
+    def close(self):
+        pass
@@ -0,0 +1,92 @@
+import numpy as np
+
+
+class PowerLimiter:
+    """Estimates the current the strip draws for a frame and scales the frame down to a budget.
+
+    The estimate is the sum of every channel of every LED times the current that
+    channel draws at full brightness, plus the idle current of the LEDs. When a
+    frame goes over the budget it is scaled down right away, so the power supply
+    is never overloaded, and when the frames get darker again the scale comes
+    back up gradually, so the brightness does not jump or pump.
+
+    Args:
+        length (int): number of LEDs
+        budget_ma (float, optional): maximum current of the strip in mA, only estimate it if None
+        ma_per_channel (list): mA drawn by the r, g and b channel of an LED at 255
+        idle_ma (float): mA drawn by an LED that is off
+
+    Attributes:
+        budget_ma (float): maximum current of the strip in mA, None if not limited
+        estimated_ma (float): estimated current of the last frame after scaling, mA
+        requested_ma (float): estimated current of the last frame before scaling, mA
+        scale (float): factor the last frame was scaled by
+        limited (int): number of frames scaled down
+    """
+    # how much the scale goes back up every frame, from the lowest to full brightness in 20 frames
+    RELEASE = 0.05
+
+    def __init__(self, length, budget_ma=None, ma_per_channel=(20.0, 20.0, 20.0), idle_ma=1.0):
+        self.budget_ma = budget_ma
+        self._coefficients = np.asarray(ma_per_channel, dtype=np.float64) / 255
+        self._idle_ma = idle_ma * length
+        if budget_ma is not None and budget_ma <= self._idle_ma:
+            raise ValueError(f"The power budget of {budget_ma} mA does not cover the idle current of {self._idle_ma} mA")
+        self._sums = np.zeros(3, dtype=np.uint64)
+        self._scaled = np.zeros((length, 3), dtype=np.uint16)
+        self._out = np.zeros((length, 3), dtype=np.uint8)
+        self.estimated_ma = self._idle_ma
+        self.requested_ma = self._idle_ma
+        self.scale = 1.0
+        self.limited = 0
+
+    @classmethod
+    def from_settings(cls, power_limit, length):
+        """Build the limiter from the `power_limit` setting.
+
+        Args:
+            power_limit (dict): {"budget_ma": ..., "ma_per_channel": [...], "idle_ma": ...}, None to only estimate
+            length (int): number of LEDs
+
+        Returns:
+            PowerLimiter: power limiter
+        """
+        power_limit = power_limit or {}
+        return cls(
+            length,
+            budget_ma=power_limit.get("budget_ma"),
+            ma_per_channel=power_limit.get("ma_per_channel", (20.0, 20.0, 20.0)),
+            idle_ma=power_limit.get("idle_ma", 1.0)
+        )
+
+    def apply(self, frame):
+        """Estimate the current of a frame and scale it down if it goes over the budget.
+
+        Args:
+            frame (numpy.ndarray): RGB values of the whole strip, shape (LEDs, 3), uint8
+
+        Returns:
+            numpy.ndarray: frame to send, either `frame` or a scaled copy overwritten by the next call
+        """
+        frame.sum(axis=0, dtype=np.uint64, out=self._sums)
+        self.requested_ma = float(self._sums @ self._coefficients) + self._idle_ma
+        if self.budget_ma is None:
+            self.estimated_ma = self.requested_ma
+            return frame
+
+        target = min(1.0, (self.budget_ma - self._idle_ma) / max(self.requested_ma - self._idle_ma, 1e-9))
+        if target < self.scale:
+            self.scale = target
+        else:
+            self.scale = min(target, self.scale + self.RELEASE)
+        if self.scale >= 1.0:
+            self.estimated_ma = self.requested_ma
+            return frame
+
+        # 8 fractional bits, rounded down so the scaled frame stays within the budget
+        np.multiply(frame, int(self.scale * 256), out=self._scaled, dtype=np.uint16)
+        np.right_shift(self._scaled, 8, out=self._scaled)
+        self._out[:] = self._scaled
+        self.limited += 1
+        self.estimated_ma = (self.requested_ma - self._idle_ma) * self.scale + self._idle_ma
+        return self._out
@@ -0,0 +1,180 @@
+import struct
+import time
+
+import numpy as np
+
+
+# sent by the transmitter to ask the receiver which protocol it speaks
+HANDSHAKE_QUERY = b"?"
+# the receiver answers with this prefix followed by the protocol version and a newline
+HANDSHAKE_REPLY = b"flashy:"
+# first two bytes of every binary packet
+MAGIC = b"\xf1\xa5"
+# binary packet types
+PACKET_FRAME = 0x01
+PACKET_DELTA = 0x02
+# set in the packet type if a checksum byte follows the payload
+FLAG_CHECKSUM = 0x80
+# first protocol version of the receiver that shows delta packets
+DELTA_VERSION = 2
+
+
+class AsciiProtocol:
+    """The original text protocol: one packet per LED, `>` followed by
+    the LED index and the RGB values as zero-padded 3 digit numbers.
+
+    The receiver refreshes the strip after a number of packets, not once per
+    frame, so it is always sent the whole strip.
+
+    Attributes:
+        deltas (bool): False, the receiver is only sent whole frames
+        refresh_interval (float): seconds after which the whole strip is sent again if nothing changed
+    """
+    name = "ascii"
+    packet_size = 13
+    deltas = False
+    # the original receivers time out after a number of loop iterations without data,
+    # so the strip is sent back to back like the original transmitter did
+    refresh_interval = 0.0
+
+    def encode(self, frame, changed, keyframe=False):
+        """Encode the changed LEDs of a frame.
+
+        Args:
+            frame (numpy.ndarray): RGB values of the whole strip, shape (LEDs, 3)
+            changed (list): indices of the LEDs to send
+            keyframe (bool): send all the LEDs, not only the changed ones
+
+        Returns:
+            bytes: data to write to the serial port
+        """
+        if keyframe:
+            changed = range(len(frame))
+        return "".join(
+            ">" + "".join(str(x).zfill(3) for x in (i, *frame[i].tolist()))
+            for i in changed
+        ).encode("ascii")
+
+    def full_size(self, length, updated):
+        """Number of bytes needed to send the updated LEDs without any change suppression.
+
+        Args:
+            length (int): number of LEDs in the strip
+            updated (int): number of LEDs with a new value
+
+        Returns:
+            int: number of bytes
+        """
+        return self.packet_size * updated
+
+
+class BinaryProtocol:
+    """Binary protocol sending the whole strip in one packet:
+    magic (2 bytes), packet type (1 byte), LED count (2 bytes, big-endian),
+    raw RGB bytes and an optional 8-bit checksum of the count and the payload.
+
+    If only a few LEDs changed, a delta packet is sent instead: the RGB bytes
+    are preceded by a bitmask of the changed LEDs (bit i%8 of byte i//8)
+    and contain only the values of those LEDs.
+
+    The receiver refreshes the strip exactly once per packet.
+
+    Args:
+        checksum (bool): append a checksum to every packet
+        deltas (bool): send delta packets, the receiver reports a protocol version of at least DELTA_VERSION
+
+    Attributes:
+        checksum (bool): append a checksum to every packet
+        deltas (bool): the receiver shows delta packets, whole frames are sent if False
+        refresh_interval (float): seconds after which the whole strip is sent again if nothing changed
+    """
+    name = "binary"
+    # well below the TIMEOUT of the receiver, after which it blanks the strip
+    refresh_interval = 1.0
+
+    def __init__(self, checksum=True, deltas=True):
+        self.checksum = checksum
+        self.deltas = deltas
+
+    def encode(self, frame, changed, keyframe=False):
+        """Encode a frame as a delta packet, or as a whole frame if that is not larger.
+
+        Args:
+            frame (numpy.ndarray): RGB values of the whole strip, shape (LEDs, 3)
+            changed (list): indices of the LEDs that changed
+            keyframe (bool): always send the whole frame
+
+        Returns:
+            bytes: data to write to the serial port
+        """
+        length = len(frame)
+        count = struct.pack(">H", length)
+        if keyframe or not self.deltas or (length + 7) // 8 + 3 * len(changed) >= 3 * length:
+            return self._packet(PACKET_FRAME, count + frame.tobytes())
+
+        mask = np.zeros(length, dtype=bool)
+        mask[changed] = True
+        bitmask = np.packbits(mask, bitorder="little").tobytes()
+        return self._packet(PACKET_DELTA, count + bitmask + frame[mask].tobytes())
+
+    def full_size(self, length, updated):
+        """Number of bytes needed to send the whole frame.
+
+        Args:
+            length (int): number of LEDs in the strip
+            updated (int): number of LEDs with a new value, ignored
+
+        Returns:
+            int: number of bytes
+        """
+        return len(MAGIC) + 3 + 3 * length + (1 if self.checksum else 0)
+
+    def _packet(self, packet_type, body):
+        if not self.checksum:
+            return MAGIC + bytes((packet_type,)) + body
+        return MAGIC + bytes((packet_type | FLAG_CHECKSUM,)) + body + bytes((checksum(body),))
+
+
+def checksum(data):
+    """8-bit additive checksum, same as computed by the receiver.
+
+    Args:
+        data (bytes): data to sum
+
+    Returns:
+        int: sum of all the bytes modulo 256
+    """
+    return sum(data) & 0xFF
+
+
+def negotiate(serial, timeout=3.0):
+    """Ask the receiver for the protocol version it supports.
+
+    The boards usually reset when the port is opened, so the query is
+    repeated until the receiver answers or the time runs out.
+    Receivers that only speak the ASCII protocol ignore the query.
+
+    Args:
+        serial (serial.Serial): open serial port
+        timeout (float): how long to wait for the answer in seconds
+
+    Returns:
+        int: protocol version reported by the receiver, None if there was no answer
+    """
+    original_timeout = serial.timeout
+    serial.timeout = 0.25
+    reply = b""
+    try:
+        serial.reset_input_buffer()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            serial.write(HANDSHAKE_QUERY)
+            reply += serial.read(64)
+            start = reply.find(HANDSHAKE_REPLY)
+            end = reply.find(b"\n", start)
+            if start >= 0 and end >= 0:
+                version = reply[start + len(HANDSHAKE_REPLY):end].strip()
+                return int(version) if version.isdigit() else None
+    finally:
+        serial.timeout = original_timeout
+    return None
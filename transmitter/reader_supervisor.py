@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+
+
+class ReaderSupervisor(threading.Thread):
+    """Thread starting the screen reader processes and restarting the ones that died.
+
+    A worker that keeps crashing is restarted with a delay that doubles with every crash,
+    from `interval` up to `max_delay` seconds. The delay only goes back down once the worker
+    ran for `min_uptime` seconds. Every worker has its own restart time, so waiting to restart
+    one does not hold up watching the others.
+
+    Args:
+        processes (list[ScreenReaderProcess]): worker processes, not started yet
+        interval (float): seconds between checking the workers, and the delay of the first restart
+        max_delay (float): longest wait before restarting a worker
+        min_uptime (float): seconds a worker has to run before its crashes are forgotten
+
+    Attributes:
+        processes (list[ScreenReaderProcess]): current worker processes
+        restarts (int): number of times a worker was restarted
+        logger (Logger): logger object used to write logs from this thread
+    """
+    def __init__(self, processes, interval=1.0, max_delay=30.0, min_uptime=30.0):
+        super(ReaderSupervisor, self).__init__(name="ReaderSupervisor")
+        self.processes = list(processes)
+        self.interval = interval
+        self.max_delay = max_delay
+        self.min_uptime = min_uptime
+        self.restarts = 0
+        self.daemon = True
+        self.logger = logging.getLogger(self.name)
+        self._failures = [0] * len(self.processes)
+        self._start_times = [None] * len(self.processes)
+        self._restart_at = [None] * len(self.processes)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        """Start the workers and watch them until stopped.
+        """
+        for i, process in enumerate(self.processes):
+            process.start()
+            self._start_times[i] = time.monotonic()
+        self.logger.debug(f"Started {len(self.processes)} screen reader processes")
+
+        while not self._stop_event.wait(self.interval):
+            now = time.monotonic()
+            for i, process in enumerate(self.processes):
+                if process.is_alive():
+                    if now - self._start_times[i] >= self.min_uptime:
+                        self._failures[i] = 0
+                elif self._restart_at[i] is None:
+                    self._schedule(i, now)
+                elif now >= self._restart_at[i]:
+                    self._restart(i)
+
+        self._terminate()
+
+    def _schedule(self, i, now):
+        process = self.processes[i]
+        self._failures[i] += 1
+        delay = min(self.max_delay, self.interval * 2 ** (self._failures[i] - 1))
+        self._restart_at[i] = now + delay
+        self.logger.error(f"Screen reader {process.name} exited with code {process.exitcode}, " +
+                          f"restarting it in {delay:.0f}s")
+
+    def _restart(self, i):
+        self.processes[i].close()
+        self.processes[i] = self.processes[i].copy()
+        self.processes[i].start()
+        self._start_times[i] = time.monotonic()
+        self._restart_at[i] = None
+        self.restarts += 1
+
+    def _terminate(self):
+        # a process killed while writing would leave the frame buffer locked, let them finish the frame
+        for process in self.processes:
+            process.stop()
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                self.logger.warning(f"Screen reader {process.name} did not stop, terminating it")
+                process.terminate()
+        self.logger.debug("Stopped the screen reader processes")
+
+    def stop(self):
+        """Stop watching the workers and stop them.
+        """
+        self._stop_event.set()
@@ -0,0 +1,232 @@
+import glob
+import json
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+
+MAGIC = b"FLASHYRC"
+VERSION = 1
+# magic, version, header size, number of records written, metadata length
+HEADER = struct.Struct("<8sIIQQ")
+PAGE = 4096
+# capture time (time.perf_counter()), wall time (time.time()), frame number
+RECORD_HEADER = np.dtype([("timestamp", "<f8"), ("wall_time", "<f8"), ("frame", "<u8")])
+
+
+def _layout(regions, shapes, count):
+    """Offsets of the parts of a record.
+
+    Returns:
+        tuple: list of (offset, shape) of the region buffers, offset of the LED colours,
+            offset of the LED mask and the size of a record
+    """
+    offset = RECORD_HEADER.itemsize
+    buffers = []
+    for shape in shapes:
+        buffers.append((offset, tuple(shape)))
+        offset += int(np.prod(shape))
+    leds = offset
+    mask = leds + 3 * count
+    return buffers, leds, mask, mask + count
+
+
+class Recorder:
+    """Appends the frames of a screen reader to a memory-mapped ring file.
+
+    Every record holds the capture time, the captured region buffers exactly as
+    the capture backend returned them and the LED colours written to the frame
+    buffer. The records have a fixed size, so the file is preallocated once to
+    `max_bytes` and the oldest records are overwritten when it is full. Appending
+    copies the arrays straight into the mapped file, there is no serialisation.
+
+    Args:
+        path (str): file path
+        regions (list[tuple]): bboxes of the captured regions
+        shapes (list[tuple]): shapes of the region buffers, (height, row_pitch, 4)
+        leds (list): strip indices of the LEDs of the reader, in the order of the recorded colours
+        max_bytes (int): size limit of the file
+        name (str, optional): name of the reader
+
+    Attributes:
+        path (str): file path
+        capacity (int): number of records the file holds
+        written (int): number of records appended so far
+    """
+    def __init__(self, path, regions, shapes, leds, max_bytes, name=None):
+        self.path = path
+        self.shapes = [tuple(shape) for shape in shapes]
+        self._buffers, self._leds, self._mask, self.record_size = _layout(regions, self.shapes, len(leds))
+        metadata = json.dumps({
+            "name": name,
+            "regions": [list(region) for region in regions],
+            "shapes": [list(shape) for shape in self.shapes],
+            "leds": [int(i) for i in leds],
+            "record_size": self.record_size,
+        }).encode("utf-8")
+        self.header_size = -(-(HEADER.size + len(metadata)) // PAGE) * PAGE
+        self.capacity = max(1, (max_bytes - self.header_size) // self.record_size)
+        self.written = 0
+        self._frame = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        size = self.header_size + self.capacity * self.record_size
+        with open(path, "w+b") as record_file:
+            record_file.truncate(size)
+            self._mmap = mmap.mmap(record_file.fileno(), size)
+        self._mmap[:HEADER.size + len(metadata)] = HEADER.pack(MAGIC, VERSION, self.header_size, 0, len(metadata)) + metadata
+        self._records = np.ndarray((self.capacity, self.record_size), dtype=np.uint8,
+                                   buffer=self._mmap, offset=self.header_size)
+
+    def matches(self, shapes):
+        """Check whether the region buffers still have the shapes the file was made for.
+
+        Args:
+            shapes (list[tuple]): shapes of the region buffers
+
+        Returns:
+            bool: True if the buffers can be appended
+        """
+        return [tuple(shape) for shape in shapes] == self.shapes
+
+    def append(self, timestamp, buffers, colours, mask):
+        """Append a frame, overwriting the oldest one if the file is full.
+
+        Args:
+            timestamp (float): capture time, time.perf_counter()
+            buffers (list[numpy.ndarray]): captured region buffers
+            colours (numpy.ndarray): RGB values of the LEDs, shape (LEDs, 3)
+            mask (numpy.ndarray): which LEDs were written to the frame buffer, shape (LEDs,)
+        """
+        record = self._records[self.written % self.capacity]
+        record[:RECORD_HEADER.itemsize].view(RECORD_HEADER)[0] = (timestamp, time.time(), self._frame)
+        for (offset, shape), buffer in zip(self._buffers, buffers):
+            np.copyto(record[offset:offset + buffer.size].reshape(shape), buffer)
+        np.copyto(record[self._leds:self._mask].reshape(-1, 3), colours)
+        np.copyto(record[self._mask:].view(bool), mask)
+        self._frame += 1
+        # publish the record only once it is complete
+        self.written += 1
+        struct.pack_into("<Q", self._mmap, 16, self.written)
+
+    def close(self):
+        """Flush and unmap the file.
+        """
+        if self._mmap is not None:
+            self._records = None
+            self._mmap.flush()
+            self._mmap.close()
+            self._mmap = None
+
+
+class Recording:
+    """Read-only view of a file written by a Recorder.
+
+    Args:
+        path (str): file path
+
+    Attributes:
+        path (str): file path
+        name (str): name of the reader that recorded it
+        regions (list[tuple]): bboxes of the captured regions
+        leds (list): strip indices of the recorded LEDs
+        capacity (int): number of records the file holds
+
+    Raises:
+        ValueError: not a recording
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as record_file:
+            self._mmap = mmap.mmap(record_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.header_size, _, length = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a flashy recording")
+        metadata = json.loads(self._mmap[HEADER.size:HEADER.size + length].decode("utf-8"))
+        self.name = metadata["name"]
+        self.regions = [tuple(region) for region in metadata["regions"]]
+        self.leds = metadata["leds"]
+        self.record_size = metadata["record_size"]
+        self._buffers, self._leds, self._mask, _ = _layout(self.regions, metadata["shapes"], len(self.leds))
+        self.capacity = (len(self._mmap) - self.header_size) // self.record_size
+        self._records = np.ndarray((self.capacity, self.record_size), dtype=np.uint8,
+                                   buffer=self._mmap, offset=self.header_size)
+
+    @classmethod
+    def find(cls, path):
+        """Open all the recordings of a session, one per reader.
+
+        Args:
+            path (str): `record` path the session was recorded with
+
+        Returns:
+            list[Recording]: recordings
+        """
+        return [cls(file_path) for file_path in sorted(glob.glob(f"{glob.escape(path)}.*.rec"))]
+
+    @property
+    def written(self):
+        """int: number of records appended so far, including the overwritten ones"""
+        return struct.unpack_from("<Q", self._mmap, 16)[0]
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def _record(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(f"Record {index} is not in {self.path}")
+        # index 0 is the oldest record still in the ring
+        return self._records[(self.written - len(self) + index) % self.capacity]
+
+    def header(self, index):
+        """Capture time, wall time and frame number of a record.
+
+        Args:
+            index (int): record index, 0 is the oldest
+
+        Returns:
+            numpy.void: record header with the fields timestamp, wall_time and frame
+        """
+        return self._record(index)[:RECORD_HEADER.itemsize].view(RECORD_HEADER)[0]
+
+    def buffer(self, index, region):
+        """Captured buffer of a region, without copying it.
+
+        Args:
+            index (int): record index, 0 is the oldest
+            region (int): region index
+
+        Returns:
+            numpy.ndarray: BGRA buffer, shape (height, row_pitch, 4)
+        """
+        offset, shape = self._buffers[region]
+        return self._record(index)[offset:offset + int(np.prod(shape))].reshape(shape)
+
+    def colours(self, index):
+        """LED colours written to the frame buffer.
+
+        Args:
+            index (int): record index, 0 is the oldest
+
+        Returns:
+            tuple: RGB values, shape (LEDs, 3), and the mask of the LEDs that were written, shape (LEDs,)
+        """
+        record = self._record(index)
+        return record[self._leds:self._mask].reshape(-1, 3), record[self._mask:].view(bool)
+
+    def close(self):
+        """Unmap the file, or leave it to the garbage collector if some buffers are still in use.
+        """
+        if self._mmap is not None:
+            self._records = None
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+            self._mmap = None
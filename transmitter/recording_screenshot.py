@@ -0,0 +1,101 @@
+import logging
+import time
+
+from .recorder import Recording
+
+
+class RecordingScreenshot(object):
+    """Capture session replaying the region buffers of a recording made with the `record` setting.
+
+    The region has to be one of the recorded regions, which is the case when the
+    recording is replayed with the same profile, sampling and number of readers.
+    The buffers are returned straight from the mapped file, without a copy.
+
+    Args:
+        bbox (tuple): region of the screen, (x1, y1, x2, y2)
+        path (str): `record` path the session was recorded with
+        speed (str): "original" to replay with the recorded timing, "max" to replay as fast as the readers go
+        loop (bool): start over after the last record, otherwise grabbing fails at the end
+    """
+    def __init__(self, bbox, path, speed="original", loop=True):
+        self.bbox = (bbox[0], bbox[1], bbox[2], bbox[3])
+        self.logger = logging.getLogger("RecordingScreenshot")
+        self.size = (self.bbox[2]-self.bbox[0], self.bbox[3]-self.bbox[1])
+        self.position = (self.bbox[0], self.bbox[1])
+        if speed not in ("original", "max"):
+            raise ValueError(f"Unknown replay speed: '{speed}'")
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self._recording = None
+        self._array = None
+
+    def open(self):
+        """Find the region in the recordings.
+
+        Returns:
+            self
+
+        Raises:
+            ValueError: the region was not recorded, or the recording is empty
+        """
+        for recording in Recording.find(self.path):
+            if self.bbox in recording.regions and len(recording) > 0:
+                self._recording = recording
+                self._region = recording.regions.index(self.bbox)
+            else:
+                recording.close()
+        if self._recording is None:
+            raise ValueError(f"The region {self.bbox} is not in the recordings {self.path}.*.rec")
+        self._index = 0
+        self._start = None
+        return self
+
+    def grab(self):
+        """Return the region buffer of the next record, waiting until it is due at the original speed.
+
+        Returns:
+            numpy.ndarray: BGRA pixel buffer with the shape (height, row_pitch, 4), a view of the file
+
+        Raises:
+            EOFError: the last record was replayed and `loop` is off
+        """
+        if self._index >= len(self._recording):
+            if not self.loop:
+                raise EOFError(f"No more frames in {self._recording.path}")
+            self._index = 0
+            self._start = None
+
+        if self.speed == "original":
+            timestamp = float(self._recording.header(self._index)["timestamp"])
+            now = time.perf_counter()
+            if self._start is None:
+                self._start = (now, timestamp)
+            delay = self._start[0] + timestamp - self._start[1] - now
+            if delay > 0:
+                time.sleep(delay)
+
+        self._array = self._recording.buffer(self._index, self._region)
+        self._index += 1
+        return self._array
+
+    @property
+    def array(self):
+        """numpy.ndarray: BGRA pixel buffer of the last grab with the shape (height, row_pitch, 4)"""
+        return self._array
+
+    def close(self):
+        """Close the recording.
+        """
+        self._array = None
+        if self._recording is not None:
+            self._recording.close()
+            self._recording = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        self.logger.debug(f"exit called with exc_type={exc_type}, " +
+                          f"exc_value={exc_value}, exc_traceback={exc_traceback}")
@@ -0,0 +1,85 @@
+import logging
+
+import numpy as np
+
+
+class ReplayScreenshot(object):
+    """Capture session replaying recorded frames from a .npy file instead of the screen.
+
+    The file holds BGRA frames with the shape (frames, height, width, 4) and
+    is memory mapped, so only the captured regions are ever read from disk.
+
+    Args:
+        bbox (tuple): region of the screen, (x1, y1, x2, y2)
+        path (str): path of the .npy file
+        origin (tuple): screen coordinates of the top left pixel of the recorded frames
+        loop (bool): start over after the last frame, otherwise grabbing fails at the end
+    """
+    def __init__(self, bbox, path, origin=(0, 0), loop=True):
+        self.bbox = (bbox[0], bbox[1], bbox[2], bbox[3])
+        self.logger = logging.getLogger("ReplayScreenshot")
+        self.size = (self.bbox[2]-self.bbox[0], self.bbox[3]-self.bbox[1])
+        self.position = (self.bbox[0], self.bbox[1])
+        self.path = path
+        self.origin = (origin[0], origin[1])
+        self.loop = loop
+        self._frames = None
+        self._array = None
+        self._index = 0
+
+    def open(self):
+        """Map the file.
+
+        Returns:
+            self
+
+        Raises:
+            OSError: the file cannot be read
+            ValueError: the file does not have BGRA frames, or they do not cover the region
+        """
+        frames = np.load(self.path, mmap_mode="r")
+        if frames.ndim != 4 or frames.shape[3] != 4 or frames.dtype != np.uint8:
+            raise ValueError(f"{self.path} does not have BGRA frames, shape {frames.shape}, {frames.dtype}")
+        x1, y1 = self.position[0] - self.origin[0], self.position[1] - self.origin[1]
+        if x1 < 0 or y1 < 0 or y1 + self.size[1] > frames.shape[1] or x1 + self.size[0] > frames.shape[2]:
+            raise ValueError(f"The frames in {self.path} do not cover the region {self.bbox}")
+        self._frames = frames
+        self._slice = (slice(y1, y1 + self.size[1]), slice(x1, x1 + self.size[0]))
+        self._array = np.zeros((self.size[1], self.size[0], 4), dtype=np.uint8)
+        return self
+
+    def grab(self):
+        """Copy the region out of the next recorded frame.
+
+        Returns:
+            numpy.ndarray: BGRA pixel buffer with the shape (height, width, 4),
+                overwritten by the next grab
+
+        Raises:
+            EOFError: the last frame was replayed and `loop` is off
+        """
+        if self._index >= len(self._frames):
+            if not self.loop:
+                raise EOFError(f"No more frames in {self.path}")
+            self._index = 0
+        np.copyto(self._array, self._frames[self._index][self._slice])
+        self._index += 1
+        return self._array
+
+    @property
+    def array(self):
+        """numpy.ndarray: BGRA pixel buffer of the last grab with the shape (height, width, 4)"""
+        return self._array
+
+    def close(self):
+        """Unmap the file.
+        """
+        self._frames = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        self.logger.debug(f"exit called with exc_type={exc_type}, " +
+                          f"exc_value={exc_value}, exc_traceback={exc_traceback}")
@@ -0,0 +1,238 @@
+import numpy as np
+
+
+class LedSampler:
+    """Computes the mean colour of every LED from a raw BGRA capture buffer
+    in one batched operation.
+
+    The sampler keeps a segment table: a flat array of pixel coordinates for
+    all LEDs concatenated together, and the offsets where each LED's pixels
+    start. Every frame the pixels are gathered from the buffer with a single
+    fancy-indexing operation and summed per LED with `np.add.reduceat`, or
+    with a weighted sum for the LEDs with a gaussian or falloff kernel.
+
+    LEDs averaging every pixel of a rectangular window are not gathered and
+    need no pixels in the table: an integral image (summed-area table) is
+    built over every group of neighbouring windows, and the sum of every
+    window is read from its four corners. The rows are summed in order instead
+    of gathering pixels one by one, and every pixel is read once however many
+    windows overlap it.
+
+    Args:
+        xs (numpy.ndarray): x screen coordinates of all sampled pixels
+        ys (numpy.ndarray): y screen coordinates of all sampled pixels
+        starts (numpy.ndarray): index of the first pixel of every LED in xs/ys
+        weights (numpy.ndarray, optional): weight of every sampled pixel, None to average them
+        windows (numpy.ndarray, optional): (x1, y1, x2, y2) window of every LED averaging all its pixels,
+            x1 is -1 for the other LEDs. These LEDs are summed from an integral image instead of
+            gathering their pixels, their pixels in xs/ys and their weights are not used
+
+    Attributes:
+        xs (numpy.ndarray): x screen coordinates of all sampled pixels
+        ys (numpy.ndarray): y screen coordinates of all sampled pixels
+        starts (numpy.ndarray): index of the first pixel of every LED in xs/ys
+        counts (numpy.ndarray): number of pixels sampled for every LED
+        weights (numpy.ndarray): weight of every sampled pixel, None if they are averaged
+        windows (numpy.ndarray): windows of the LEDs averaged with a summed-area table, None if there are none
+    """
+    def __init__(self, xs, ys, starts, weights=None, windows=None):
+        self.xs = np.asarray(xs, dtype=np.int64)
+        self.ys = np.asarray(ys, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.counts = np.diff(np.append(self.starts, len(self.xs)))
+        windowed = np.zeros(len(self.starts), dtype=bool)
+        if windows is not None:
+            windows = np.asarray(windows, dtype=np.int64).reshape(-1, 4)
+            windowed = windows[:, 0] >= 0
+        if np.any((self.counts <= 0) & ~windowed):
+            raise ValueError("Every LED must have at least one pixel to sample")
+        self.weights = None if weights is None else np.asarray(weights, dtype=np.float32)
+        self.windows = None
+        self._table = None
+        self._table_key = None
+
+        summed = []
+        self._groups = []
+        if windows is not None:
+            candidates = np.flatnonzero(windowed)
+            for members, bbox in _window_groups(windows[candidates]):
+                leds = candidates[members]
+                x1, y1, x2, y2 = bbox
+                areas = (windows[leds, 2] - windows[leds, 0]) * (windows[leds, 3] - windows[leds, 1])
+                relative = windows[leds] - np.array([x1, y1, x1, y1])
+                # the summed-area table is only needed at the edges of the windows
+                rows = np.unique(relative[:, [1, 3]])
+                columns = np.unique(relative[:, [0, 2]])
+                corners = (np.searchsorted(rows, relative[:, 1]), np.searchsorted(columns, relative[:, 0]),
+                           np.searchsorted(rows, relative[:, 3]), np.searchsorted(columns, relative[:, 2]))
+                positions = np.arange(len(summed), len(summed) + len(leds))
+                self._groups.append((positions, bbox, rows, columns, corners, areas))
+                summed.extend(leds.tolist())
+        self._summed = np.array(summed, dtype=np.int64)
+        self._gathered = np.setdiff1d(np.arange(len(self.starts)), self._summed)
+        if len(self._summed):
+            self.windows = windows[self._summed]
+
+        # segment table of the gathered LEDs, the whole table when no LED is summed
+        if len(self._summed) == 0:
+            self._pixels = None
+            self._gather_starts = self.starts
+            self._gather_counts = self.counts
+        else:
+            ends = self.starts + self.counts
+            self._pixels = np.concatenate(
+                [np.arange(self.starts[i], ends[i]) for i in self._gathered] or [np.zeros(0, dtype=np.int64)])
+            self._gather_counts = self.counts[self._gathered]
+            self._gather_starts = np.concatenate(([0], np.cumsum(self._gather_counts)[:-1])).astype(np.int64)
+        self._weights = None
+        if self.weights is not None and len(self._gathered):
+            self._weights = self.weights if self._pixels is None else self.weights[self._pixels]
+            self._weight_sums = np.add.reduceat(self._weights, self._gather_starts).astype(np.float32)
+
+    @classmethod
+    def from_pixel_lists(cls, pixel_lists):
+        """Build a sampler from a list of pixel coordinate lists, one per LED.
+
+        Args:
+            pixel_lists (list): list of lists of (x, y) screen coordinates
+
+        Returns:
+            sampler (LedSampler): sampler for the given LEDs
+        """
+        counts = [len(pixel_list) for pixel_list in pixel_lists]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+        coords = np.array(
+            [pixel for pixel_list in pixel_lists for pixel in pixel_list],
+            dtype=np.int64
+        ).reshape(-1, 2)
+        return cls(coords[:, 0], coords[:, 1], starts)
+
+    @property
+    def bbox(self):
+        """tuple: bounding box of all sampled pixels, (x1, y1, x2, y2), exclusive at the end"""
+        boxes = []
+        if len(self._pixels if self._pixels is not None else self.xs):
+            xs, ys = (self.xs, self.ys) if self._pixels is None else (self.xs[self._pixels], self.ys[self._pixels])
+            boxes.append((xs.min(), ys.min(), xs.max() + 1, ys.max() + 1))
+        if self.windows is not None:
+            boxes.append((self.windows[:, 0].min(), self.windows[:, 1].min(),
+                          self.windows[:, 2].max(), self.windows[:, 3].max()))
+        return (
+            int(min(box[0] for box in boxes)),
+            int(min(box[1] for box in boxes)),
+            int(max(box[2] for box in boxes)),
+            int(max(box[3] for box in boxes))
+        )
+
+    @property
+    def pixels(self):
+        """int: number of pixels averaged for all LEDs, in the pixel lists and in the windows"""
+        gathered = len(self.xs) if self._pixels is None else len(self._pixels)
+        if self.windows is None:
+            return gathered
+        return gathered + int(((self.windows[:, 2] - self.windows[:, 0]) * (self.windows[:, 3] - self.windows[:, 1])).sum())
+
+    def offsets(self, origin, row_pitch):
+        """Flat pixel offsets into a capture buffer.
+
+        Args:
+            origin (tuple): screen coordinates of the top left pixel of the buffer
+            row_pitch (int): number of pixels in one row of the buffer, including padding
+
+        Returns:
+            offsets (numpy.ndarray): flat pixel index of every gathered pixel
+        """
+        key = (origin[0], origin[1], row_pitch)
+        if self._table_key != key:
+            xs, ys = (self.xs, self.ys) if self._pixels is None else (self.xs[self._pixels], self.ys[self._pixels])
+            self._table = (ys - origin[1]) * row_pitch + (xs - origin[0])
+            self._table_key = key
+        return self._table
+
+    def sample(self, frame, origin):
+        """Compute the mean colour of every LED.
+
+        Args:
+            frame (numpy.ndarray): BGRA/BGRX buffer with the shape (height, row_pitch, 4)
+            origin (tuple): screen coordinates of the top left pixel of the buffer
+
+        Returns:
+            rgb (numpy.ndarray): array of uint8 RGB values with the shape (LEDs, 3)
+        """
+        if len(self._summed) == 0:
+            return self._gather(frame, origin)
+        rgb = np.empty((len(self.starts), 3), dtype=np.uint8)
+        if len(self._gathered):
+            rgb[self._gathered] = self._gather(frame, origin)
+        rgb[self._summed] = self._sum_windows(frame, origin)
+        return rgb
+
+    def _gather(self, frame, origin):
+        """Mean colour of the gathered LEDs, weighted if the sampler has weights."""
+        offsets = self.offsets(origin, frame.shape[1])
+        pixels = frame.reshape(-1, 4)[offsets, :3]
+        if self._weights is None:
+            sums = np.add.reduceat(pixels, self._gather_starts, axis=0, dtype=np.uint32)
+            means = sums // self._gather_counts[:, None].astype(np.uint32)
+        else:
+            sums = np.add.reduceat(pixels * self._weights[:, None], self._gather_starts, axis=0)
+            means = np.clip(np.rint(sums / self._weight_sums[:, None]), 0, 255)
+        # BGR -> RGB
+        return means[:, ::-1].astype(np.uint8)
+
+    def _sum_windows(self, frame, origin):
+        """Mean colour of the summed LEDs, from a summed-area table over every group of windows.
+
+        The table is only built at the edges of the windows: the rows between two
+        edges are summed into a band, reading the buffer once and in order, the bands
+        are summed between the column edges into cells, and the cumulative sum of the
+        cells is the summed-area table at the corners of the windows.
+        """
+        means = np.empty((len(self._summed), 3), dtype=np.int64)
+        for members, bbox, rows, columns, corners, areas in self._groups:
+            x1, y1, x2, y2 = bbox
+            region = frame[y1 - origin[1]:y2 - origin[1], x1 - origin[0]:x2 - origin[0]]
+            bands = np.stack([region[start:end].sum(axis=0, dtype=np.uint32) for start, end in zip(rows[:-1], rows[1:])])
+            cells = np.add.reduceat(bands, columns[:-1], axis=1)[:, :, :3]
+            table = np.zeros((len(rows), len(columns), 3), dtype=np.int64)
+            table[1:, 1:] = cells.cumsum(axis=0).cumsum(axis=1)
+            top, left, bottom, right = corners
+            sums = table[bottom, right] - table[top, right] - table[bottom, left] + table[top, left]
+            means[members] = sums // areas[:, None]
+        # BGR -> RGB
+        return means[:, ::-1].astype(np.uint8)
+
+
+def _window_groups(windows):
+    """Group neighbouring windows, so the summed-area tables do not span the gaps between them.
+
+    The windows are taken top to bottom and left to right, whatever order the LEDs are in,
+    e.g. the random order of the screen readers. Every window is added to the group whose
+    bounding box grows the least, as long as it grows by at most twice the area of the window,
+    or starts a new group, e.g. an LED strip going around the display gets a group per edge
+    instead of one table over the whole display.
+
+    Args:
+        windows (numpy.ndarray): (x1, y1, x2, y2) of every window, shape (N, 4)
+
+    Returns:
+        list[tuple]: (indices of the windows, (x1, y1, x2, y2) bounding box of the windows) for every group
+    """
+    areas = ((windows[:, 2] - windows[:, 0]) * (windows[:, 3] - windows[:, 1])).tolist()
+    members, boxes = [], []
+    for index in np.lexsort((windows[:, 0], windows[:, 1])).tolist():
+        window = windows[index].tolist()
+        best, best_growth = None, 2 * areas[index]
+        for group, bbox in enumerate(boxes):
+            merged = (min(bbox[0], window[0]), min(bbox[1], window[1]), max(bbox[2], window[2]), max(bbox[3], window[3]))
+            grown = (merged[2] - merged[0]) * (merged[3] - merged[1]) - (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+            if grown <= best_growth:
+                best, best_growth = group, grown
+        if best is None:
+            members.append([index])
+            boxes.append(tuple(window))
+        else:
+            bbox = boxes[best]
+            members[best].append(index)
+            boxes[best] = (min(bbox[0], window[0]), min(bbox[1], window[1]), max(bbox[2], window[2]), max(bbox[3], window[3]))
+    return [(np.array(group, dtype=np.int64), bbox) for group, bbox in zip(members, boxes)]
@@ -0,0 +1,129 @@
+import time
+
+
+class FrameScheduler:
+    """Paces a frame loop against absolute deadlines on the monotonic clock.
+
+    Every frame is due one period after the previous deadline, not one period
+    after the previous frame ended, so the time spent on the frames and the
+    inaccuracy of sleeping do not add up into drift. When a frame overruns its
+    deadlines the missed ones are dropped instead of running a burst of frames
+    to catch up. With `adaptive` the period grows to the measured cost of a
+    frame and to the cost reported by `cost_source`, e.g. the time it takes to
+    send a frame over the serial link, so the loop never produces frames faster
+    than they can be handled.
+
+    Args:
+        fps_limit (float): target frames per second
+        adaptive (bool): lower the frame rate when the frames cost more than the target period
+        cost_source (callable, optional): returns the cost of a frame further down the pipeline in seconds
+        headroom (float): how much longer than the measured cost the adapted period is
+
+    Attributes:
+        target_fps (float): target frames per second
+        period (int): current period between the deadlines, nanoseconds
+        cost (float): average duration of a frame, seconds
+        frames (int): number of frames finished
+        dropped (int): number of deadlines missed because a frame took too long
+        achieved_fps (float): frames per second finished over the last second
+        dropped_fps (float): deadlines per second missed over the last second
+    """
+    SMOOTHING = 0.1  # weight of the newest frame in the average cost
+    WINDOW = 1_000_000_000  # nanoseconds to measure the achieved fps over
+
+    def __init__(self, fps_limit, adaptive=True, cost_source=None, headroom=1.1):
+        self.target_fps = fps_limit
+        self.adaptive = adaptive
+        self.headroom = headroom
+        self._cost_source = cost_source
+        self._target_period = int(1e9 / fps_limit)
+        self.period = self._target_period
+        self.cost = None
+        self.frames = 0
+        self.dropped = 0
+        self.achieved_fps = 0.0
+        self.dropped_fps = 0.0
+        self._deadline = None
+        self._frame_start = None
+        self._window_start = time.perf_counter_ns()
+        self._window_frames = 0
+        self._window_dropped = 0
+
+    @property
+    def effective_fps(self):
+        """float: frames per second the scheduler currently aims for, lower than the target if adapted"""
+        return 1e9 / self.period
+
+    def start_frame(self):
+        """Mark the start of a frame.
+        """
+        self._frame_start = time.perf_counter_ns()
+        if self._deadline is None:
+            self._deadline = self._frame_start
+
+    def end_frame(self):
+        """Mark the end of a frame and schedule the next one.
+
+        Returns:
+            float: seconds to wait until the next frame is due, 0 if it is already due
+        """
+        now = time.perf_counter_ns()
+        duration = (now - self._frame_start) / 1e9
+        self.cost = duration if self.cost is None else \
+            self.cost + self.SMOOTHING * (duration - self.cost)
+        self.frames += 1
+        self._window_frames += 1
+
+        if self.adaptive:
+            cost = self.cost
+            if self._cost_source is not None:
+                cost = max(cost, self._cost_source() or 0.0)
+            self.period = max(self._target_period, int(cost * self.headroom * 1e9))
+
+        self._deadline += self.period
+        if self._deadline < now:
+            # skip the deadlines that already passed instead of catching up with a burst of frames
+            missed = (now - self._deadline) // self.period + 1
+            self._deadline += missed * self.period
+            self.dropped += missed
+            self._window_dropped += missed
+
+        if now - self._window_start >= self.WINDOW:
+            elapsed = (now - self._window_start) / 1e9
+            self.achieved_fps = self._window_frames / elapsed
+            self.dropped_fps = self._window_dropped / elapsed
+            self._window_start, self._window_frames, self._window_dropped = now, 0, 0
+
+        return (self._deadline - now) / 1e9
+
+    def set_target(self, fps_limit, adaptive=None):
+        """Change the target frame rate, from the next frame on.
+
+        Args:
+            fps_limit (float): target frames per second
+            adaptive (bool, optional): lower the frame rate when the frames cost more, unchanged if None
+        """
+        self.target_fps = fps_limit
+        self._target_period = int(1e9 / fps_limit)
+        self.period = self._target_period
+        if adaptive is not None:
+            self.adaptive = adaptive
+
+    def reset(self):
+        """Start over from the next frame, e.g. after a pause, without counting the pause as dropped frames.
+        """
+        self._deadline = None
+
+    def stats(self):
+        """Current frame rates.
+
+        Returns:
+            dict: target, effective, achieved and dropped fps, and the total number of dropped frames
+        """
+        return {
+            "target_fps": self.target_fps,
+            "effective_fps": self.effective_fps,
+            "achieved_fps": self.achieved_fps,
+            "dropped_fps": self.dropped_fps,
+            "dropped": self.dropped,
+        }
@@ -1,16 +1,78 @@
+import functools
 import threading
 import logging
 import random
 import time
-from datetime import datetime
+import zlib
+from collections import namedtuple
 from sys import platform
 
-if platform == "darwin":
-    from .cg_screenshot import CGScreenshot as Screenshot
-elif platform == "win32":
-    from .bitblt_screenshot import BitBltScreenshot as Screenshot
-elif platform == "linux" or platform == "linux2":
-    from .mss_screenshot import MSSScreenshot as Screenshot
+import numpy as np
+
+from . import metrics
+from .capture_plan import plan_capture, bounding_box, capture_size
+from .colour import ColourPipeline
+from .filters import FilterChain
+from .recorder import Recorder
+from .scheduler import FrameScheduler
+
+# everything a frame is processed with that can be rebuilt from reloaded settings
+ReaderState = namedtuple("ReaderState", ["settings", "regions", "samplers", "filters", "colour"])
+
+# settings the colour pipeline is built from
+COLOUR_SETTINGS = ("colour_correction", "gamma", "white_balance", "brightness", "dithering")
+
+
+def capture_backend(name="auto", options=None):
+    """Import a screen capture backend.
+
+    All the backends are capture sessions with the same interface: constructed
+    with the bbox of a region, `open()` returns the session, `grab()` captures the
+    region into a BGRA array and `close()` frees everything. Besides the screen
+    capture backends, there are frame sources that do not need a display.
+
+    Args:
+        name (str): "auto" to pick the best one for the platform, "mss", "xshm", "bitblt" or "cg",
+            or one of the frame sources: "synthetic" for generated frames, "replay" for frames
+            recorded into a .npy file, "video" for a video file and "recording" for a session
+            recorded with the `record` setting
+        options (dict, optional): keyword arguments of the backend besides the bbox,
+            e.g. {"path": "frames.npy"} for "replay"
+
+    Returns:
+        callable: capture session class, or a factory, constructed with a bbox
+
+    Raises:
+        ValueError: unknown backend name
+    """
+    if name == "auto":
+        if platform == "darwin":
+            name = "cg"
+        elif platform == "win32":
+            name = "bitblt"
+        else:
+            from .xshm_screenshot import XShmScreenshot
+            name = "xshm" if XShmScreenshot.available() else "mss"
+
+    if name == "cg":
+        from .cg_screenshot import CGScreenshot as screenshot_class
+    elif name == "bitblt":
+        from .bitblt_screenshot import BitBltScreenshot as screenshot_class
+    elif name == "xshm":
+        from .xshm_screenshot import XShmScreenshot as screenshot_class
+    elif name == "mss":
+        from .mss_screenshot import MSSScreenshot as screenshot_class
+    elif name == "synthetic":
+        from .synthetic_screenshot import SyntheticScreenshot as screenshot_class
+    elif name == "replay":
+        from .replay_screenshot import ReplayScreenshot as screenshot_class
+    elif name == "video":
+        from .video_screenshot import VideoScreenshot as screenshot_class
+    elif name == "recording":
+        from .recording_screenshot import RecordingScreenshot as screenshot_class
+    else:
+        raise ValueError(f"Unknown capture backend: '{name}'")
+    return functools.partial(screenshot_class, **options) if options else screenshot_class
 
 
 class ScreenReaderAsync(threading.Thread):
@@ -20,164 +82,285 @@ class ScreenReaderAsync(threading.Thread):
         settings (settings.Settings): flashy settings object
         name (str): name of the thread
         index_range (list): range of LED indices to read data from
-        queue (queue.Queue): queue to add the values to
+        frame_buffer (FrameBuffer): frame buffer to write the values to
+        stop_event (threading.Event/multiprocessing.Event, optional): event that stops the loop when set
 
     Attributes:
         settings (settings.Settings): flashy settings object
         name (str): name of the thread
         index_range (list): range of LED indices to read data from
-        queue (queue.Queue): queue to add the values to
+        frame_buffer (FrameBuffer): frame buffer to write the values to
         index_order (list): list of indices in the index_range in a random order
+        regions (list[CaptureRegion]): regions of the screen captured every frame
+        reconnects (int): number of times the capture session was reopened after an error
+        scheduler (FrameScheduler): paces the frames and keeps the target, achieved and dropped fps
+        frames_skipped (int): number of frames skipped because the captured region did not change
+        filters (FilterChain): temporal filters applied to the colours before they are written
+        colour (ColourPipeline): maps the filtered colours to the values sent to the LEDs
+        recorder (Recorder): records the frames if the `record` setting is on, created with the first frame
+        reloads (int): number of times reloaded settings were swapped in
         logger (Logger): logger object used to write logs from this thread
     """
-    def __init__(self, settings, name=None, index_range=[], queue=None):
+    def __init__(self, settings, name=None, index_range=[], frame_buffer=None, stop_event=None):
         super(ScreenReaderAsync, self).__init__()
         self.name = name
         self.index_range = index_range
-        self.queue = queue
+        self.frame_buffer = frame_buffer
         self.settings = settings
         self.logger = logging.getLogger(self.name)
+        self._stop_event = threading.Event() if stop_event is None else stop_event
         self.setup()
 
     def setup(self):
         """Set up variables for the run.
         """
-        self._frame_min_duration = 1.0 / self.settings.fps_limit  # seconds
+        self.scheduler = FrameScheduler(
+            self.settings.fps_limit,
+            adaptive=self.settings.adaptive_fps,
+            cost_source=lambda: self.frame_buffer.link_cost
+        )
+        self._screenshot_class = capture_backend(self.settings.capture_backend, self.settings.capture_options)
+        self.logger.debug(f"Capturing the screen with the {self.settings.capture_backend} backend")
         self.index_order = list(range(self.index_range[0], self.index_range[1]))
         random.shuffle(self.index_order)
+        self._indices = np.array(self.index_order, dtype=np.int64)
+        self._colours = np.zeros((len(self.index_order), 3), dtype=np.uint8)
+        self._written = np.zeros(len(self.index_order), dtype=bool)
+        self.filters = None
+        self.colour = None
+        self._apply(self._prepare(self.settings))
+        self._pending = None
+        self._pending_lock = threading.Lock()
+        self.recorder = None
+        self._last_digest = None
+        self.frames_skipped = 0
+        self.reconnects = 0
+        self.reloads = 0
+        self._register_metrics()
 
-        # get a bbox
-        pixel_lists = [self.settings.get_pixel_list(i) for i in self.index_order]
-        self._bbox = (
-            min(pixel[0] for pixel_list in pixel_lists for pixel in pixel_list),
-            min(pixel[1] for pixel_list in pixel_lists for pixel in pixel_list),
-            1 + max(pixel[0] for pixel_list in pixel_lists for pixel in pixel_list),
-            1 + max(pixel[1] for pixel_list in pixel_lists for pixel in pixel_list)
-        )
+    def _prepare(self, settings):
+        """Plan which regions of the screen to capture, build a sampling table for each one and the colour stages.
 
-        # this is a hack to reduce flickering in macos caused by dragging windows
-        # the code will skip pure black frames up to a *limit* in a row
-        if platform == "darwin":
-            self._black_pixel_counts = [0] * self.settings.strip_size
-            self._black_pixel_limit = 5
-        # similar in linux, at least arch linux, in this case just median
-        if platform == "linux" or platform == "linux2":
-            self._previous = [[]] * self.settings.strip_size
-            self._previous_count = 5
+        The filters and the colour pipeline in use are kept if their settings did not change,
+        so reloading a profile does not restart the smoothing.
 
-    def run(self):
-        """Run the loop of reading the pixel values and adding them to the queue.
+        Args:
+            settings (settings.Settings): settings to build everything from
+
+        Returns:
+            ReaderState: everything needed to process a frame
         """
-        self.logger.debug("Started screen reader")
+        compiled = settings.profile.compiled
+        rects = compiled.rects[self.index_order]
+        regions = plan_capture(rects)
+        samplers = [
+            compiled.sampler([self.index_order[position] for position in region.leds])
+            for region in regions
+        ]
+        filters, colour = self.filters, self.colour
+        if filters is None or settings.filters != self.settings.filters:
+            filters = FilterChain.from_settings(settings.filters, len(self.index_order))
+        if colour is None or any(getattr(settings, key) != getattr(self.settings, key) for key in COLOUR_SETTINGS):
+            colour = ColourPipeline.from_settings(settings, len(self.index_order))
+        union = bounding_box(rects)
+        self.logger.debug(f"Capturing {len(regions)} regions, {capture_size(regions)} pixels " +
+                          f"instead of {(union[2]-union[0])*(union[3]-union[1])} in the bounding box")
+        return ReaderState(settings, regions, samplers, filters, colour)
 
-        while True:
-            if self.queue.full():
-                # if the queue is full, wait this one out
-                time.sleep(1.0/self.settings.fps_limit)
-                continue
+    def _apply(self, state):
+        self.settings = state.settings
+        self.regions = state.regions
+        self._samplers = state.samplers
+        self.filters = state.filters
+        self.colour = state.colour
 
-            # start a frame
-            frame_start = datetime.utcnow()
+    def reload(self, settings):
+        """Rebuild the capture plan, the sampling tables and the colour stages for new settings
+        in the calling thread, and swap them in before the next frame. Can be called from any thread.
 
-            # get the screenshot and add it to the queue
-            self._process_frame()
+        The settings that need a restart, see `Settings.RESTART_SETTINGS`, must not change.
 
-            # how long was this frame in milliseconds
-            frame_duration = (datetime.utcnow() - frame_start).total_seconds()
-            time_left_in_frame = self._frame_min_duration - frame_duration
+        Args:
+            settings (settings.Settings): reloaded settings
+        """
+        state = self._prepare(settings)
+        with self._pending_lock:
+            self._pending = state
 
-            # make sure it waits for at least a millisecond
-            # (this miraculously saves some CPU usage)
-            if time_left_in_frame <= 0:
-                time_left_in_frame = 1e-3
+    def _swap(self, captures):
+        """Swap in the state built by `reload`, between two frames.
 
-            # wait until the next frame
-            self.logger.debug(f"Frame ended, duration={frame_duration*1000:1f}ms, " +
-                              f"capped_at={self.settings.fps_limit}fps/{1000/self.settings.fps_limit:1f}ms, " +
-                              f"wait={time_left_in_frame*1000:.1f}ms")
-            time.sleep(time_left_in_frame)
+        Args:
+            captures (list): open capture sessions, can be None
 
-    def _process_frame(self):
-        """Get the screen pixel values and send them to the queues if not full.
+        Returns:
+            list: capture sessions to keep, None if the regions changed and they were closed
         """
-        # if the queues are full, do not waste the CPU
-        if all(self.queue.full(i) for i in self.index_order):
-            return
-
-        with Screenshot(bbox=self._bbox) as screenshot:
-            # add the pixel values to a queue
-            for i in self.index_order:
-                item = self._mean_rgb([
-                    screenshot.getpixel(
-                        x=coords[0]-self._bbox[0],
-                        y=coords[1]-self._bbox[1]
-                    ) for coords in self.settings.get_pixel_list(i)
-                ])
-
-                if platform == "darwin":
-                    if item == (0, 0, 0) and self._black_pixel_counts[i] <= self._black_pixel_limit:
-                        item = None  # skip this frame for this pixel, might a flicker
-                        self._black_pixel_counts[i] += 1
-                    elif item != (0, 0, 0):
-                        self._black_pixel_counts[i] = 0
-
-                if platform == "linux" or platform == "linux2":
-                    self._previous[i].append(item)
-                    if len(self._previous[i]) >= 5:
-                        item = [
-                            self._median([x[i] for x in self._previous[i]])
-                            for i in range(3)
-                        ]
-                        self._previous[i].pop(0)
-
-
-                if item is not None:
-                    self.queue.put(i,
-                        self._colour_correct(item, self.settings.colour_correction)
-                    )
-
-    def _mean_rgb(self, rgb_values):
-        """Calculate a mean value of an array of RGB values.
+        with self._pending_lock:
+            state, self._pending = self._pending, None
+        if [region.bbox for region in state.regions] != [region.bbox for region in self.regions]:
+            # new regions need new capture sessions and a new recording
+            self._close_captures(captures)
+            captures = None
+            self.close_recorder()
+        elif state.settings.record != self.settings.record:
+            # stopped recording, or recording to another file or with another size
+            self.close_recorder()
+        self._apply(state)
+        self.scheduler.set_target(self.settings.fps_limit, self.settings.adaptive_fps)
+        self._last_digest = None
+        self.reloads += 1
+        self.logger.info(f"Reloaded the settings, capturing {len(self.regions)} regions")
+        return captures
+
+    def _register_metrics(self):
+        """Set up the histograms recorded every frame and export the counters and the frame rates.
+        """
+        registry = metrics.registry
+        labels = {"reader": self.name}
+        self._capture_time = registry.histogram("capture_seconds", labels)
+        self._reduce_time = registry.histogram("reduce_seconds", labels)
+        registry.gauge("frames_skipped_total", lambda: self.frames_skipped, labels, kind="counter")
+        registry.gauge("capture_reconnects_total", lambda: self.reconnects, labels, kind="counter")
+        registry.gauge("settings_reloads_total", lambda: self.reloads, labels, kind="counter")
+        registry.gauge("frames_dropped_total", lambda: self.scheduler.dropped, labels, kind="counter")
+        registry.gauge("target_fps", lambda: self.scheduler.target_fps, labels)
+        registry.gauge("effective_fps", lambda: self.scheduler.effective_fps, labels)
+        registry.gauge("achieved_fps", lambda: self.scheduler.achieved_fps, labels)
+
+    def run(self):
+        """Run the loop of reading the pixel values and writing them to the frame buffer.
+        """
+        self.logger.debug("Started screen reader")
+
+        # the capture sessions live as long as the thread, unless they fail
+        captures = None
+        while not self._stop_event.is_set():
+            # start a frame
+            self.scheduler.start_frame()
+
+            # get the screenshot and write it to the frame buffer
+            captures = self.step(captures)
+            if captures is None:
+                self._stop_event.wait(1)
+                self.scheduler.reset()
+                self.filters.reset()
+                continue
+
+            # wait until the next frame is due
+            self._stop_event.wait(self.scheduler.end_frame())
+
+        self._close_captures(captures)
+        self.close_recorder()
+        self.logger.debug("Stopped screen reader")
+
+    def step(self, captures=None):
+        """Capture one frame and write it to the frame buffer, opening the capture sessions if needed.
 
         Args:
-            rgb_values (list): list of RGB tuples (0..255)
+            captures (list, optional): capture sessions returned by the previous step, None to open new ones
 
         Returns:
-            tuple: 3 RGB values
+            list: open capture sessions to pass to the next step,
+                None if the capture failed and the sessions were closed
         """
-        N = len(rgb_values)
-        if N == 1:
-            return rgb_values[0]
-        return (
-            sum(value[0] for value in rgb_values) // N,
-            sum(value[1] for value in rgb_values) // N,
-            sum(value[2] for value in rgb_values) // N,
-        )
+        if self._pending is not None:
+            captures = self._swap(captures)
+        try:
+            if captures is None:
+                captures = []
+                for region in self.regions:
+                    captures.append(self._screenshot_class(bbox=region.bbox).open())
+            self._process_frame(captures)
+            return captures
+        except Exception as e:
+            self._close_captures(captures)
+            self.reconnects += 1
+            if self.settings.capture_backend == "auto" and platform.startswith("linux"):
+                from .xshm_screenshot import XShmAttachError
+                if isinstance(e, XShmAttachError):
+                    self.logger.warning(f"Cannot capture with shared memory, capturing with mss instead: {e}")
+                    self._screenshot_class = capture_backend("mss", self.settings.capture_options)
+                    return None
+            self.logger.error(f"Screen capture failed, reopening the capture sessions: {e}")
+            return None
 
-    def _colour_correct(self, rgb, correction):
-        """Apply a colour correction to an RGB value.
+    def stop(self):
+        """Ask the loop to stop after the current frame.
+        """
+        self._stop_event.set()
+
+    def _process_frame(self, captures):
+        """Get the screen pixel values and write them to the frame buffer.
 
         Args:
-            rgb (tuple/list): 3 RGB values
-            correction (tuple/list): 3 RGB correction values
+            captures (list): open capture sessions, one per region
+        """
+        capture_time = time.perf_counter()
+        frames = [capture.grab() for capture in captures]
+        reduce_time = time.perf_counter()
+        self._capture_time.observe(reduce_time - capture_time)
+        if self.settings.skip_static_frames:
+            # nothing to do if the captured regions are exactly the same as last time,
+            # unless the filters or the dithering are still moving towards them
+            digest = 0
+            for frame in frames:
+                digest = zlib.crc32(frame, digest)
+            if digest == self._last_digest and self.filters.settled and self.colour.settled:
+                self.frames_skipped += 1
+                return
+            self._last_digest = digest
 
-        Returns:
-            tuple: 3 RGB values
+        colours = self._colours
+        for region, sampler, frame in zip(self.regions, self._samplers, frames):
+            colours[region.leds] = sampler.sample(frame, region.bbox[:2])
+
+        # filter and map the whole frame and publish the LEDs the filters did not skip
+        self._written[:] = True
+        colours = self.colour.apply(self.filters.apply(colours, self._written))
+        indices = self._indices[self._written]
+        if len(indices) > 0:
+            self.frame_buffer.write(indices, colours[self._written], timestamp=capture_time)
+        self._reduce_time.observe(time.perf_counter() - reduce_time)
+        if self.settings.record is not None:
+            self._record(capture_time, frames, colours)
+
+    def _record(self, capture_time, frames, colours):
+        """Append the captured regions and the output colours to the recording.
+
+        Args:
+            capture_time (float): time.perf_counter() when the frame was captured
+            frames (list[numpy.ndarray]): captured region buffers
+            colours (numpy.ndarray): output RGB values of the LEDs in index_order
         """
-        if all(value == 1 or value < 0 for value in correction):
-            return rgb
+        shapes = [frame.shape for frame in frames]
+        if self.recorder is not None and not self.recorder.matches(shapes):
+            # the capture sessions were reopened with different buffers, start over
+            self.close_recorder()
+        if self.recorder is None:
+            path = f"{self.settings.record['path']}.{self.name}.rec"
+            self.recorder = Recorder(
+                path, [region.bbox for region in self.regions], shapes, self.index_order,
+                int(self.settings.record.get("max_mb", 256) * 2**20), name=self.name
+            )
+            self.logger.info(f"Recording {self.recorder.capacity} frames to {path}")
+        self.recorder.append(capture_time, frames, colours, self._written)
 
-        return tuple(
-            int(value*factor) if value*factor <= 255 else 255
-            for value, factor in zip(rgb, correction)
-        )
+    def close_recorder(self):
+        """Close the recording, if there is one.
+        """
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
 
-    def _median(self, lst):
-        sortedLst = sorted(lst)
-        lstLen = len(lst)
-        index = (lstLen - 1) // 2
+    def _close_captures(self, captures):
+        """Close the capture sessions, ignoring any errors from the broken sessions.
 
-        if (lstLen % 2):
-            return sortedLst[index]
-        else:
-            return (sortedLst[index] + sortedLst[index + 1])/2.0
\ No newline at end of file
+        Args:
+            captures (list): capture sessions, can be None
+        """
+        for capture in captures or []:
+            try:
+                capture.close()
+            except Exception as e:
+                self.logger.debug(f"Error closing a capture session: {e}")
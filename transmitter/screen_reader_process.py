@@ -0,0 +1,114 @@
+import logging
+import multiprocessing
+import signal
+import sys
+import threading
+
+from . import metrics
+from .screen_reader_async import ScreenReaderAsync
+from .displays import DisplayWatcher
+from .watcher import FileWatcher
+
+
+class ScreenReaderProcess(multiprocessing.Process):
+    """Screen reader running in a separate process, so the readers do not share the GIL.
+
+    The process runs the same loop as ScreenReaderAsync, writing to a SharedFrameBuffer.
+
+    Args:
+        settings (settings.Settings): flashy settings object
+        name (str): name of the process
+        index_range (list): range of LED indices to read data from
+        frame_buffer (SharedFrameBuffer): shared frame buffer to write the values to
+
+    Attributes:
+        settings (settings.Settings): flashy settings object
+        name (str): name of the process
+        index_range (list): range of LED indices to read data from
+        frame_buffer (SharedFrameBuffer): shared frame buffer to write the values to
+    """
+    def __init__(self, settings, name=None, index_range=[], frame_buffer=None):
+        super(ScreenReaderProcess, self).__init__(name=name)
+        self.settings = settings
+        self.index_range = index_range
+        self.frame_buffer = frame_buffer
+        self.daemon = True
+        self._stop_event = multiprocessing.Event()
+
+    def copy(self):
+        """Create a new, not started process with the same arguments, a process can only be started once.
+
+        Returns:
+            ScreenReaderProcess: new process
+        """
+        return type(self)(self.settings, self.name, self.index_range, self.frame_buffer)
+
+    def stop(self):
+        """Ask the process to stop after the current frame.
+        """
+        self._stop_event.set()
+
+    def run(self):
+        """Run the screen reader loop until the process is stopped.
+        """
+        # the main process handles Ctrl+C and stops the workers
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        if not logging.getLogger().handlers:
+            # spawned processes do not inherit the logging setup
+            logging.basicConfig(
+                level=self.settings.log_level,
+                format="%(asctime)s %(levelname)s: %(message)s",
+                handlers=[logging.StreamHandler(sys.stdout)]
+            )
+
+        reader = ScreenReaderAsync(
+            name=self.name,
+            index_range=self.index_range,
+            frame_buffer=self.frame_buffer,
+            settings=self.settings,
+            stop_event=self._stop_event
+        )
+        # the metrics of a process are in its own registry, only the summary is logged from here
+        if self.settings.metrics_interval:
+            metrics.MetricsReporter(metrics.registry, interval=self.settings.metrics_interval).start()
+        # the main process cannot reach the reader in here, the process watches the settings and the displays itself
+        self._reload_lock = threading.Lock()
+        watcher = None
+        if self.settings.hot_reload:
+            watcher = FileWatcher(self.settings.files, lambda paths: self._reload(reader, watcher))
+            watcher.start()
+        display_watcher = None
+        if self.settings.display_geometry is not None and self.settings.displays is None:
+            display_watcher = DisplayWatcher(self.settings.display_geometry, lambda displays: self._update_displays(reader, displays))
+            display_watcher.start()
+        reader.run()
+        for thread in (watcher, display_watcher):
+            if thread is not None:
+                thread.stop()
+        for thread in (watcher, display_watcher):
+            if thread is not None:
+                thread.join()
+
+    def _reload(self, reader, watcher):
+        """Reload the settings in the process and swap them into the reader.
+
+        Args:
+            reader (ScreenReaderAsync): reader running in this process
+            watcher (FileWatcher): watcher of the settings files
+        """
+        with self._reload_lock:
+            self.settings, changes = self.settings.reload()
+            watcher.watch(self.settings.files)
+            if changes:
+                reader.reload(self.settings)
+
+    def _update_displays(self, reader, display_geometry):
+        """Compile the profile for new displays in the process and swap it into the reader.
+
+        Args:
+            reader (ScreenReaderAsync): reader running in this process
+            display_geometry (list[Display]): displays
+        """
+        with self._reload_lock:
+            self.settings = self.settings.with_displays(display_geometry)
+            reader.reload(self.settings)
@@ -1,75 +1,248 @@
-import random
 import threading
 import logging
-from serial import Serial
 import time
 
+import numpy as np
+
+from . import metrics
+from .power import PowerLimiter
+from .sinks import output_sink
+
 
 class SerialTransmitterAsync(threading.Thread):
-    """Class getting values from the queue and sending them to serial port in a separate thread.
+    """Class getting frames from the frame buffer and sending them to serial port in a separate thread.
+
+    The frames go to an output sink picked by the port: a receiver board on a
+    serial port, or a network LED controller for the "ddp://", "e131://" and
+    "wled://" URLs, see sinks.output_sink.
 
     Args:
         name (str): name of the thread
-        queue (queue.Queue): queue to add the values to
-        led_map (list): LED index to pixel coordinates mapping from the profile
-        port (str): serial port name
+        frame_buffer (FrameBuffer): frame buffer to read the values from
+        port (str): serial port name, "null" to discard the data like a board at the given baud rate would,
+            or the URL of a network controller
         baud (int): baud rate of the serial communication
-    
+        protocol (str): "auto" to negotiate with the receiver, "binary" or "ascii"
+        checksum (bool): append a checksum to the binary packets
+        delta_threshold (int): only send the LEDs with a channel that changed by more than this
+        power_limit (dict, optional): current budget and model of the strip, see PowerLimiter.from_settings
+        index_range (list, optional): range of LED indices in the frame buffer this strip shows, all of them if None
+        link_costs (dict, optional): frame costs of all the transmitters sharing the frame buffer by name,
+            the readers adapt to the fastest one and the slower ones skip frames
+
     Attributes:
         name (str): name of the thread
-        serial (serial.Serial): serial communication object
-        queue (queue.Queue): queue to add the values to
-        led_map (list): LED index to pixel coordinates mapping from the profile
-        index_order (list): list of indices in the index_range in a random order
+        sink (OutputSink): where the frames are sent
+        frame_buffer (FrameBuffer): frame buffer to read the values from
+        index_range (list): range of LED indices in the frame buffer this strip shows
+        snapshot (numpy.ndarray): last frame copied from the frame buffer, shape (frame buffer length, 3)
+        frame (numpy.ndarray): last known RGB values of this strip, a view of the snapshot, shape (LEDs, 3)
+        last_sent (numpy.ndarray): RGB values the strip is showing, None if unknown
+        power (PowerLimiter): estimates the current of every frame and scales it down to the budget
+        bytes_sent (int): number of bytes written to the serial port
+        bytes_suppressed (int): number of bytes saved by not sending unchanged LEDs
+        frames_sent (int): number of frames written to the serial port
+        frames_suppressed (int): number of frames not sent because nothing changed
+        frames_refreshed (int): number of frames sent again because nothing changed for the refresh interval of the sink
+        frame_cost (float): average time it takes to send a frame, seconds
         logger (Logger): logger object used to write logs from this thread
     """
-    def __init__(self, name=None, queue=None, port=None, baud=9600, frame_delay=1):
+    # seconds between sending the whole strip, in case the receiver dropped a delta packet
+    KEYFRAME_INTERVAL = 5.0
+    # weight of the newest frame in the average frame cost
+    SMOOTHING = 0.1
+
+    def __init__(self, name=None, frame_buffer=None, port=None, baud=9600,
+                 protocol="auto", checksum=True, delta_threshold=0, power_limit=None,
+                 index_range=None, link_costs=None):
         super(SerialTransmitterAsync,self).__init__()
         self.name = name
-        self.queue = queue
+        self.frame_buffer = frame_buffer
         self.port = port
-        self.baud = baud
-        self.frame_delay = frame_delay
-        self.serial = None
-        self.index_order = list(range(self.queue.length))
+        self.sink = output_sink(port, baud, protocol=protocol, checksum=checksum)
+        self._connected = False
+        self.delta_threshold = delta_threshold
+        self.index_range = [0, self.frame_buffer.length] if index_range is None else list(index_range)
+        self.snapshot = np.zeros((self.frame_buffer.length, 3), dtype=np.uint8)
+        self.frame = self.snapshot[self.index_range[0]:self.index_range[1]]
+        self.last_sent = None
+        self.power = PowerLimiter.from_settings(power_limit, len(self.frame))
+        self._power_limit = power_limit
+        self._link_costs = {} if link_costs is None else link_costs
+        self._last_keyframe = 0
+        self._last_send = 0
+        self.bytes_sent = 0
+        self.bytes_suppressed = 0
+        self.frames_sent = 0
+        self.frames_suppressed = 0
+        self.frames_refreshed = 0
+        self.frame_cost = 0.0
         self.error_logged = False  # to not flood the console with errors if disconnected
-        random.shuffle(self.index_order)
         self.logger = logging.getLogger(self.name)
+        self._stop_event = threading.Event()
+        self._register_metrics()
 
-    def _connect(self):
-        self.serial = Serial(self.port, self.baud)
+    def _register_metrics(self):
+        """Set up the histograms recorded every frame and export the counters.
+        """
+        registry = metrics.registry
+        labels = {"output": self.name}
+        self._queue_wait = registry.histogram("queue_wait_seconds", labels)
+        self._write_time = registry.histogram("serial_write_seconds", labels)
+        self._latency = registry.histogram("latency_seconds", labels)
+        self._errors = registry.counter("serial_errors_total", labels)
+        registry.gauge("bytes_sent_total", lambda: self.bytes_sent, labels, kind="counter")
+        registry.gauge("bytes_suppressed_total", lambda: self.bytes_suppressed, labels, kind="counter")
+        registry.gauge("frames_sent_total", lambda: self.frames_sent, labels, kind="counter")
+        registry.gauge("frames_suppressed_total", lambda: self.frames_suppressed, labels, kind="counter")
+        registry.gauge("frames_refreshed_total", lambda: self.frames_refreshed, labels, kind="counter")
+        registry.gauge("power_estimated_ma", lambda: self.power.estimated_ma, labels)
+        registry.gauge("power_scale", lambda: self.power.scale, labels)
+        registry.gauge("frames_power_limited_total", lambda: self.power.limited, labels, kind="counter")
 
     def run(self):
-        """Run the loop of getting values form the queue and sending them to the serial port.
+        """Run the loop of waiting for new frames and sending them to the serial port.
         """
         self.logger.debug("Started serial transmitter")
-        while True:
-            time.sleep(self.frame_delay/1000)
-            for i in self.index_order:
-                if not self.queue.empty(i):
-                    item = self.queue.get(i)
-                    self.send_value((i,) + item)
+        sequence = 0
+        while not self._stop_event.is_set():
+            info = self.frame_buffer.wait(
+                sequence, out=self.snapshot, timeout=self.wait_timeout(), index_range=self.index_range)
+            if info is None:
+                # e.g. a static screen the readers skip
+                self.refresh()
+                continue
+            sequence = info.sequence
+            self.send_frame(info.updated, info)
+        self.close()
+        self.logger.debug("Stopped serial transmitter")
+
+    def stop(self):
+        """Ask the loop to stop, it finishes within a second.
+        """
+        self._stop_event.set()
 
-    def send_value(self, value):
-        """Format and send the rgb value to the serial port.
+    def configure(self, delta_threshold, power_limit):
+        """Change the settings that do not need a reconnect, from the next frame on. Can be called from any thread.
 
         Args:
-            value (tuple/list): list of values to send in the single package
+            delta_threshold (int): only send the LEDs with a channel that changed by more than this
+            power_limit (dict): power budget, see `PowerLimiter.from_settings`
+        """
+        self.delta_threshold = delta_threshold
+        if power_limit != self._power_limit:
+            self.power = PowerLimiter.from_settings(power_limit, len(self.frame))
+            self._power_limit = power_limit
+
+    def close(self):
+        """Close the serial port or the socket.
+        """
+        self.sink.close()
+        self._connected = False
+
+    def wait_timeout(self):
+        """Seconds to wait for a new frame before the last one has to be sent again.
+
+        Returns:
+            float: seconds, at most 1
+        """
+        if self.last_sent is None:
+            return 1.0
+        return min(max(self._last_send + self.sink.refresh_interval - time.monotonic(), 0.0), 1.0)
+
+    def refresh(self):
+        """Send the last frame again if nothing was sent for the refresh interval of the sink,
+        before the receiver or the controller times out and blanks the LEDs.
 
         Returns:
-            formatted string that was sent to the serial
+            int: number of bytes sent, None if nothing was sent
         """
-        string_data = ">" + "".join([str(x).zfill(3) for x in value])
+        if self.last_sent is None or time.monotonic() - self._last_send < self.sink.refresh_interval:
+            return None
+        return self.send_frame()
+
+    def _changed(self, frame):
+        """Indices of the LEDs that differ from what the strip shows by more than the threshold.
 
+        Args:
+            frame (numpy.ndarray): RGB values to send, shape (LEDs, 3)
+
+        Returns:
+            numpy.ndarray: LED indices
+        """
+        difference = np.abs(frame.astype(np.int16) - self.last_sent).max(axis=1)
+        return np.flatnonzero(difference > self.delta_threshold)
+
+    def _update_cost(self, duration, size):
+        """Update the average cost of sending a frame and share the cost of the fastest transmitter with the readers.
+
+        Args:
+            duration (float): seconds it took to encode and write the frame
+            size (int): number of bytes written
+        """
+        # the write returns once the data is in the OS buffer, the link itself may still be slower
+        cost = max(duration, self.sink.link_time(size))
+        self.frame_cost += self.SMOOTHING * (cost - self.frame_cost)
+        self._link_costs[self.name] = self.frame_cost
+        self.frame_buffer.link_cost = min(self._link_costs.values())
+
+    def send_frame(self, updated=None, info=None):
+        """Encode the LEDs of the current frame that changed and send them to the sink.
+
+        Args:
+            updated (int, optional): number of LEDs of this strip with a new value since the frame sent before, for the counters
+            info (FrameInfo, optional): the frame read from the frame buffer, for the latency metrics
+
+        Returns:
+            int: number of bytes sent, None if nothing was sent
+        """
+        if info is not None and info.written is not None:
+            self._queue_wait.observe(time.perf_counter() - info.written)
         try:
-            if self.serial is None:
-                self._connect()
-                self.logger.info(f"Connected to {self.port}")
-            self.serial.write(bytes(string_data, "utf-8"))
+            if not self._connected:
+                self.sink.open()
+                self._connected = True
+                self.last_sent = None
+                self.logger.info(f"Connected to {self.port} using the {self.sink.name} protocol")
+
+            frame = self.power.apply(self.frame)
+            now = time.monotonic()
+            keyframe = self.last_sent is None or now - self._last_keyframe >= self.KEYFRAME_INTERVAL
+            changed = np.arange(len(frame)) if keyframe else self._changed(frame)
+            full_size = self.sink.full_size(len(frame), len(frame) if updated is None else min(updated, len(frame)))
+            if len(changed) == 0 and now - self._last_send < self.sink.refresh_interval:
+                self.frames_suppressed += 1
+                self.bytes_suppressed += full_size
+                return None
+            if not keyframe and (len(changed) == 0 or not self.sink.deltas):
+                # nothing changed for the refresh interval, or the receiver only shows whole frames
+                if len(changed) == 0:
+                    self.frames_refreshed += 1
+                keyframe = True
+                changed = np.arange(len(frame))
+
+            write_start = time.perf_counter()
+            size = self.sink.send(frame, changed, keyframe=keyframe)
+            write_end = time.perf_counter()
+            self._write_time.observe(write_end - write_start)
+            self._update_cost(write_end - write_start, size)
+            if info is not None and info.timestamp is not None:
+                self._latency.observe(write_end - info.timestamp)
+            self._last_send = now
+            if keyframe:
+                self.last_sent = frame.copy()
+                self._last_keyframe = now
+            else:
+                self.last_sent[changed] = frame[changed]
+            self.frames_sent += 1
+            self.bytes_sent += size
+            self.bytes_suppressed += max(full_size - size, 0)
             self.error_logged = False
+            return size
         except IOError as e:
+            self._errors.inc()
             if not self.error_logged:
                 self.logger.error(f"Can't connect to the receiver: {e}")
                 self.error_logged = True
-            self.serial = None
-            time.sleep(1)
+            self.close()
+            self._stop_event.wait(1)
@@ -1,25 +1,52 @@
+import copy
+import hashlib
 import json
 import os
 import logging
 
+from .compiled_profile import CompiledProfile, used_displays
+from .displays import Display, current_displays
+from .kernels import nearest_edge, normalise_kernel
+from .layout import layout_map
+
 
 class Settings:
     """Class handling the settings of the app and the profile.
     Contains all the top level settings values as class attributes
 
+    The merged and normalised settings are cached in a json file next to the
+    settings, and the compiled profile in a .npz file, see `CompiledProfile.load`.
+    They are used as long as the settings files and the profile file have the
+    same modification times and sizes, or the same contents, so a restart does
+    not parse and compile anything. The cache only holds plain data, nothing in
+    it is executed when it is loaded.
+
     Attributes:
         logger (logging.Logger): settings logger object
         path (string): path to the settings.json
+        display_geometry (list[Display]): displays the profile was compiled for, None if it has no `rect` entries
         + All the settings fields
 
     Args:
         path (str, optional): path to settings.json, defaults to 'settings/settings.json'
+        cache (bool): load the settings from the cache if they did not change, and cache them
     """
-    def __init__(self, path=None):
+    # bump when the attributes of Settings, Profile or CompiledProfile change
+    CACHE_VERSION = 4
+    # settings that only take effect after a restart, everything else can be reloaded while running
+    RESTART_SETTINGS = (
+        "port", "baud", "outputs", "protocol", "checksum", "strip_size", "threads", "reader_mode", "engine",
+        "capture_backend", "capture_options", "logfile", "log_level", "metrics_interval", "metrics_file",
+        "metrics_port", "hot_reload",
+    )
+
+    def __init__(self, path=None, cache=True):
         self.default_settings_path = "settings/default.json"
         self.settings_path = path if path is not None \
             else self.default_settings_path
         self.settings_dir = os.path.dirname(self.settings_path)
+        self.cache_dir = os.path.join(self.settings_dir, ".cache")
+        self.cache = cache
         self.logger = logging.getLogger("Settings")
         self.logger.info(f"Reading settings from {path}")
         self.load(path)
@@ -34,8 +61,13 @@ class Settings:
             settings (Settings): this object with the attributed loaded
         """
         settings_path = self.settings_path if path is None else path
+        cache_path = self._cache_path(settings_path)
+        if self.cache and self._load_cache(cache_path):
+            return self
+
         # set all the default settings as class attributes and
         # then update the values with the custom settings
+        self._dependencies = [self.default_settings_path, settings_path]
         for path in [self.default_settings_path, settings_path]:
             with open(path, "r") as settings_file:
                 for key, value in json.load(settings_file).items():
@@ -43,12 +75,135 @@ class Settings:
                     setattr(self, key, value)
 
         self._normalise_settings()
+        if self.cache:
+            self._save_cache(cache_path)
         return self
 
+    @property
+    def files(self):
+        """list[str]: settings files and profile file the settings were loaded from"""
+        return list(self._dependencies)
+
+    def reload(self):
+        """Load the same settings files again, to apply them while running.
+
+        The settings in RESTART_SETTINGS keep their current values, with a warning if they changed.
+
+        Returns:
+            tuple: the reloaded Settings and the names of the settings that changed
+
+        Raises:
+            ValueError: the number of LEDs changed, which needs a restart
+        """
+        settings = Settings(self.settings_path, cache=self.cache)
+        changes = self.changes(settings)
+        if "strip_size" in changes:
+            raise ValueError(f"The number of LEDs changed from {self.strip_size} to {settings.strip_size}, restart to apply it")
+        restart = [key for key in changes if key in self.RESTART_SETTINGS]
+        if restart:
+            self.logger.warning(f"Restart to apply the changes of {', '.join(restart)}")
+        for key in restart:
+            setattr(settings, key, getattr(self, key))
+        return settings, [key for key in changes if key not in restart]
+
+    def changes(self, other):
+        """Compare with other settings, e.g. the same file loaded again.
+
+        Args:
+            other (Settings): settings to compare with
+
+        Returns:
+            list[str]: names of the settings with a different value, "profile" if the profile changed
+        """
+        def value(settings, key):
+            value = getattr(settings, key, None)
+            if isinstance(value, Profile):
+                return value.fields
+            return value
+
+        keys = (set(vars(self)) | set(vars(other))) - {"logger", "cache", "_dependencies"}
+        return sorted(key for key in keys if value(self, key) != value(other, key))
+
+    def _cache_path(self, settings_path):
+        key = f"{os.path.abspath(self.default_settings_path)}|{os.path.abspath(settings_path)}"
+        return os.path.join(self.cache_dir, f"settings-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.json")
+
+    def _load_cache(self, cache_path):
+        """Load the settings from the cache if the files they were loaded from did not change.
+
+        Args:
+            cache_path (str): cache file path
+
+        Returns:
+            bool: True if the settings were loaded
+        """
+        try:
+            with open(cache_path, "r") as cache_file:
+                cached = json.load(cache_file)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            # a corrupted cache is rebuilt
+            self.logger.warning(f"Ignoring broken settings cache {cache_path}: {e}")
+            return False
+        try:
+            if cached["version"] != self.CACHE_VERSION or \
+                    not all(_unchanged(*dependency) for dependency in cached["dependencies"]):
+                return False
+            state = dict(cached["settings"])
+            profile = Profile.from_fields(state.pop("profile"))
+            display_geometry = state.pop("display_geometry")
+        except (KeyError, TypeError, ValueError) as e:
+            self.logger.warning(f"Ignoring broken settings cache {cache_path}: {e}")
+            return False
+        self.__dict__.update(state)
+        self.profile = profile
+        self.display_geometry = None if display_geometry is None else [Display(*display) for display in display_geometry]
+        self._dependencies = [dependency[0] for dependency in cached["dependencies"]]
+        self.logger.debug(f"Loaded the settings from {cache_path}")
+        # the compiled profile comes from its own cache
+        self._compile_profile()
+        if self.display_geometry is not None and self.displays is None:
+            # the files did not change but the displays might have
+            display_geometry = self._display_geometry()
+            if display_geometry != self.display_geometry:
+                self.logger.info(f"The displays changed since the settings were cached: {display_geometry}")
+                self.display_geometry = display_geometry
+                self._compile_profile(previous=self.profile.compiled)
+                self._save_cache(cache_path)
+        return True
+
+    def _save_cache(self, cache_path):
+        """Cache the loaded settings with the stamps of the files they were loaded from.
+
+        Args:
+            cache_path (str): cache file path
+        """
+        state = {key: value for key, value in vars(self).items() if key not in ("logger", "cache", "_dependencies")}
+        # the compiled profile is cached on its own
+        state["profile"] = self.profile.fields
+        try:
+            dependencies = [_stamp(path) for path in self._dependencies]
+            data = json.dumps({"version": self.CACHE_VERSION, "dependencies": dependencies, "settings": state})
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # write to a temporary file first, so a concurrent start never reads a partial cache
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as cache_file:
+                cache_file.write(data)
+            os.replace(tmp_path, cache_path)
+        except (OSError, TypeError, ValueError) as e:
+            self.logger.warning(f"Could not cache the settings to {cache_path}: {e}")
+
     def _normalise_settings(self):
         """Normalise settings values.
         """
         self.logfile = None if self.logfile is None else os.path.join(self.settings_dir, self.logfile)
+        if self.capture_options and "path" in self.capture_options:
+            self.capture_options = dict(self.capture_options,
+                                        path=os.path.join(self.settings_dir, self.capture_options["path"]))
+        self.metrics_file = None if self.metrics_file is None else os.path.join(self.settings_dir, self.metrics_file)
+        if self.record is not None:
+            self.record = dict(self.record, path=os.path.join(self.settings_dir, self.record["path"]))
 
         profile_map_length = len(self.profile.map.keys())
         if self.strip_size != profile_map_length:
@@ -59,6 +214,73 @@ class Settings:
             self.threads = self.strip_size
             self.logger.warn(f"Number of threads is greater than the strip size, not both is {self.threads}")
 
+        for output in self.outputs or []:
+            start, end = output.get("leds", [0, self.strip_size])
+            if not 0 <= start < end <= self.strip_size:
+                fixed_start = min(max(start, 0), self.strip_size - 1)
+                output["leds"] = [fixed_start, min(max(end, fixed_start + 1), self.strip_size)]
+                self.logger.warn(f"The LEDs [{start}, {end}] of the output on {output.get('port')} are not in the strip, " +
+                                 f"using {output['leds']}")
+
+        if self.reader_mode not in ("threads", "processes"):
+            self.logger.warn(f"Unknown reader_mode '{self.reader_mode}', using 'threads'")
+            self.reader_mode = "threads"
+
+        if self.engine not in ("threads", "asyncio"):
+            self.logger.warn(f"Unknown engine '{self.engine}', using 'threads'")
+            self.engine = "threads"
+
+        self.display_geometry = self._display_geometry()
+        self._compile_profile()
+
+    def _display_geometry(self):
+        """Geometry of the displays the profile is compiled for, the `displays` setting or the connected displays.
+
+        Returns:
+            list[Display]: displays, None if the profile does not have LEDs on a display
+
+        Raises:
+            ValueError: the connected displays cannot be queried
+        """
+        if not used_displays(self.profile.map):
+            return None
+        if self.displays is not None:
+            return [Display(*display) for display in self.displays]
+        try:
+            return current_displays()
+        except OSError as e:
+            raise ValueError(f"The profile is relative to the displays, but they cannot be queried ({e}), " +
+                             "set their geometry in `displays`")
+
+    def _compile_profile(self, previous=None):
+        """Compile the profile for the sampling and the displays.
+
+        Args:
+            previous (CompiledProfile, optional): compiled profile to reuse the LEDs of that did not move
+        """
+        self.profile.compile(
+            self.cache_dir,
+            sampling=self.sampling or getattr(self.profile, "sampling", None),
+            displays=self.display_geometry,
+            previous=previous
+        )
+
+    def with_displays(self, display_geometry):
+        """Copy of the settings with the profile compiled for other displays.
+        Only the LEDs on the displays that changed are compiled again.
+
+        Args:
+            display_geometry (list[Display]): displays
+
+        Returns:
+            Settings: new settings, this object is not changed
+        """
+        settings = copy.copy(self)
+        settings.profile = copy.copy(self.profile)
+        settings.display_geometry = list(display_geometry)
+        settings._compile_profile(previous=self.profile.compiled)
+        return settings
+
     def _normalise_profile(self, settings_profile_value):
         """Make sure the 'profile' value in the settings is valid.
 
@@ -75,6 +297,7 @@ class Settings:
         if isinstance(settings_profile_value, str):  # must be a path relative to the settings file
             settings_dir = os.path.dirname(self.settings_path)
             profile_path = os.path.join(settings_dir, settings_profile_value)
+            self._dependencies.append(profile_path)
             with open(profile_path, "r") as profile_file:
                 return Profile(json.load(profile_file))
         elif isinstance(settings_profile_value, dict):
@@ -97,24 +320,103 @@ class Settings:
             KeyError: index not in the map
 
         """
-        coords = self.profile.map.get(str(index), [])
-        if coords is None:
-            raise KeyError(f"Key {index} does not appear in the map")
-        return coords["pixels"]
+        return self.profile.compiled.pixels(index)
+
+
+def _stamp(path):
+    """Modification time, size and content hash of a file.
+
+    Returns:
+        tuple: path, mtime in nanoseconds, size and sha1 hex digest
+    """
+    with open(path, "rb") as stamped_file:
+        digest = hashlib.sha1(stamped_file.read()).hexdigest()
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size, digest
+
+
+def _unchanged(path, mtime, size, digest):
+    """Check whether a file is the same as when it was stamped, by the modification time
+    and size, or by the content if they changed, e.g. after a checkout.
+
+    Returns:
+        bool: True if the file did not change
+    """
+    try:
+        stat = os.stat(path)
+        if stat.st_mtime_ns == mtime and stat.st_size == size:
+            return True
+        with open(path, "rb") as stamped_file:
+            return hashlib.sha1(stamped_file.read()).hexdigest() == digest
+    except OSError:
+        return False
 
 
 class Profile:
     """Class containing the profile json data.
 
+    Instead of a map, a profile can have a `layout` of LEDs around the edges
+    of a display, see `layout.layout_rects`. The map is generated from it,
+    with a `rect` entry for every LED.
+
+    The `kernel` of the profile is the default of the `bbox` and `rect` entries
+    without one, see `kernels.normalise_kernel`.
+
     Args:
         json_data (dict): contents of the profile json file
+
+    Attributes:
+        compiled (CompiledProfile): array-backed map, None until `compile` is called
+        + All the profile fields
     """
     def __init__(self, json_data):
+        if "layout" in json_data and "map" not in json_data:
+            layout = json_data["layout"]
+            if "kernel" in json_data:
+                layout = dict(layout, kernel=layout.get("kernel", json_data["kernel"]))
+            json_data = dict(json_data, map=layout_map(layout))
         self._validate(json_data)
         json_data = self._normalise(json_data)
         for key, value in json_data.items():
             setattr(self, key, value)
-    
+        self.compiled = None
+
+    @classmethod
+    def from_fields(cls, fields):
+        """Profile from the fields of a profile that was validated and normalised before, e.g. cached.
+
+        Args:
+            fields (dict): profile fields, see `fields`
+
+        Returns:
+            profile (Profile): profile, not compiled
+        """
+        profile = cls.__new__(cls)
+        for key, value in fields.items():
+            setattr(profile, key, value)
+        profile.compiled = None
+        return profile
+
+    @property
+    def fields(self):
+        """dict: the normalised profile fields, without the compiled map"""
+        return {name: field for name, field in vars(self).items() if name != "compiled"}
+
+    def compile(self, cache_dir=None, sampling=None, displays=None, previous=None):
+        """Compile the map into pixel index arrays, or load them from the cache.
+
+        Args:
+            cache_dir (str, optional): directory to cache compiled profiles in
+            sampling (dict, optional): sampling density, see `CompiledProfile.compile`
+            displays (list[Display], optional): display geometry for the `rect` entries
+            previous (CompiledProfile, optional): compiled for other displays, see `CompiledProfile.compile`
+
+        Returns:
+            compiled (CompiledProfile): compiled map
+        """
+        self.compiled = CompiledProfile.load(self.map, cache_dir, sampling, displays, previous)
+        return self.compiled
+
     def _validate(self, json_data):
         """Validate the profile json.
 
@@ -124,6 +426,7 @@ class Profile:
         Raises:
             KeyError: missing key in the input data
             TypeError: value has a wrong type
+            ValueError: a rect is not inside the display, or a kernel is set for a pixel list
         """
         for required_key in ["description", "map"]:
             if required_key not in json_data:
@@ -134,6 +437,14 @@ class Profile:
                 raise KeyError(f"Illegal map key: '{key}'. Must be an integer.")
             if not isinstance(value, (dict, list)):
                 raise TypeError(f"Illegal map value: '{value}'.")
+            if isinstance(value, dict) and "bbox" not in value and "pixels" not in value and "rect" not in value:
+                raise KeyError(f"Map value '{key}' must have either 'bbox', 'pixels' or 'rect'.")
+            if isinstance(value, dict) and "rect" in value:
+                x1, y1, x2, y2 = value["rect"]
+                if not (0 <= x1 < x2 <= 1 and 0 <= y1 < y2 <= 1):
+                    raise ValueError(f"Illegal map rect: '{value['rect']}'. Must be fractions of the display, x1 < x2 and y1 < y2.")
+            if isinstance(value, dict) and "pixels" in value and "kernel" in value:
+                raise ValueError(f"Map value '{key}' has a kernel, kernels are only supported for 'bbox' and 'rect'.")
         
     def _normalise(self, json_data):
         """Normalise the values.
@@ -144,21 +455,34 @@ class Profile:
         Returns:
             json_data (dict): better, improved contents of the profile json file
         """
+        # entries are replaced in a copy of the map, the json data stays as it was
+        json_data = dict(json_data, map=dict(json_data.get("map")))
         for map_index, map_value in json_data.get("map").items():
             if isinstance(map_value, list):
                 json_data["map"][map_index] = {"pixels": map_value}
+                continue
             elif "pixels" in map_value:
                 continue
+            # defaults are filled in a copy, the dict of the caller stays as it was
+            map_value = dict(map_value)
+            if "rect" in map_value:
+                # on the display of the profile, the primary one by default
+                map_value.setdefault("display", json_data.get("display", 0))
             elif "bbox" in map_value:
-
+                # bboxes stay as they are, CompiledProfile expands them into arrays
+                map_value["bbox"] = list(map_value["bbox"])
                 if map_value["bbox"][0] >= map_value["bbox"][2]:
                      map_value["bbox"][2] = map_value["bbox"][0] + 1
                 if map_value["bbox"][1] >= map_value["bbox"][3]:
                      map_value["bbox"][3] = map_value["bbox"][1] + 1
-                json_data["map"][map_index]["pixels"] = [
-                        (x, y)
-                        for x in range(map_value["bbox"][0], map_value["bbox"][2])
-                        for y in range(map_value["bbox"][1], map_value["bbox"][3])
-                    ]
+            # the kernel of the profile by default, the map stays as it was without any
+            kernel = map_value.get("kernel", json_data.get("kernel"))
+            if kernel is not None:
+                kernel = {"type": kernel} if isinstance(kernel, str) else dict(kernel)
+                if kernel.get("type") == "falloff" and "rect" in map_value:
+                    # from the edge of the display the LED is closest to
+                    kernel.setdefault("edge", nearest_edge(map_value["rect"]))
+                map_value["kernel"] = normalise_kernel(kernel)
+            json_data["map"][map_index] = map_value
 
         return json_data
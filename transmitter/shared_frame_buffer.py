@@ -0,0 +1,160 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .frame_buffer import FrameInfo
+
+
+class SharedFrameBuffer:
+    """FrameBuffer living in shared memory, so screen readers in other processes can write to it.
+
+    It has the same interface as FrameBuffer. The sequence number, the timestamp,
+    the sequence number of the last write of every LED and the colours are numpy views of one shared memory block,
+    guarded by a multiprocessing condition. Pass the object to the worker processes
+    as an argument when starting them, they attach to the same memory block.
+
+    Args:
+        length (int): number of LEDs
+        context (multiprocessing.context.BaseContext, optional): multiprocessing context
+            the workers are started with, the default one if None
+
+    Attributes:
+        length (int): number of LEDs
+        name (str): name of the shared memory block
+        sequence (int): sequence number of the latest frame
+        timestamp (float): capture time of the latest frame, time.perf_counter()
+        link_cost (float): seconds it takes to send a frame, set by the transmitter so the readers can adapt
+    """
+    _HEADER_SIZE = 32  # uint64 sequence number, float64 timestamp, link cost and write time
+
+    def __init__(self, length, context=None):
+        context = context or multiprocessing.get_context()
+        self.length = length
+        self._condition = context.Condition()
+        self._shm = shared_memory.SharedMemory(create=True, size=self._HEADER_SIZE + 11 * length)
+        self._owner = True
+        self._attach()
+        self._header[:] = 0
+        self._timestamp[0] = np.nan
+        self._link_cost[0] = 0.0
+        self._written[0] = np.nan
+        self._stamps[:] = 0
+        self._frame[:] = 0
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def sequence(self):
+        """int: sequence number of the latest frame"""
+        return int(self._header[0])
+
+    @property
+    def timestamp(self):
+        """float: capture time of the latest frame, time.perf_counter(), None before the first write"""
+        timestamp = float(self._timestamp[0])
+        return None if np.isnan(timestamp) else timestamp
+
+    @property
+    def link_cost(self):
+        """float: seconds it takes to send a frame, set by the transmitter so the readers can adapt"""
+        return float(self._link_cost[0])
+
+    @link_cost.setter
+    def link_cost(self, value):
+        self._link_cost[0] = value
+
+    def _attach(self):
+        buffer = self._shm.buf
+        self._header = np.ndarray((1,), dtype=np.uint64, buffer=buffer, offset=0)
+        self._timestamp = np.ndarray((1,), dtype=np.float64, buffer=buffer, offset=8)
+        self._link_cost = np.ndarray((1,), dtype=np.float64, buffer=buffer, offset=16)
+        self._written = np.ndarray((1,), dtype=np.float64, buffer=buffer, offset=24)
+        self._stamps = np.ndarray((self.length,), dtype=np.uint64, buffer=buffer, offset=self._HEADER_SIZE)
+        self._frame = np.ndarray((self.length, 3), dtype=np.uint8, buffer=buffer,
+                                 offset=self._HEADER_SIZE + 8 * self.length)
+
+    def __getstate__(self):
+        # the condition can only be pickled while a process is being started
+        return {"name": self._shm.name, "length": self.length, "condition": self._condition}
+
+    def __setstate__(self, state):
+        self.length = state["length"]
+        self._condition = state["condition"]
+        self._shm = shared_memory.SharedMemory(name=state["name"])
+        self._owner = False
+        self._attach()
+
+    def write(self, indices, colours, timestamp=None):
+        """Write the colours of some LEDs and publish a new frame.
+
+        Args:
+            indices (numpy.ndarray/list): LED indices
+            colours (numpy.ndarray): RGB values of the LEDs, shape (len(indices), 3)
+            timestamp (float, optional): capture time, time.perf_counter(), defaults to now
+
+        Returns:
+            int: sequence number of the new frame
+        """
+        with self._condition:
+            self._frame[indices] = colours
+            self._header[0] += 1
+            self._stamps[indices] = self._header[0]
+            self._written[0] = time.perf_counter()
+            self._timestamp[0] = self._written[0] if timestamp is None else timestamp
+            self._condition.notify_all()
+            return int(self._header[0])
+
+    def read(self, out, sequence=0, index_range=None):
+        """Copy the latest frame.
+
+        Args:
+            out (numpy.ndarray): array to copy the frame to, shape (length, 3)
+            sequence (int): sequence number of the last frame the caller has seen,
+                the LEDs written after it are counted as updated
+            index_range (list, optional): range of LED indices to count the updated LEDs in, all if None
+
+        Returns:
+            info (FrameInfo): sequence number, timestamp and the number of updated LEDs
+        """
+        with self._condition:
+            return self._read(out, sequence, index_range)
+
+    def wait(self, sequence, out, timeout=None, index_range=None):
+        """Wait for a frame newer than `sequence` and copy it.
+
+        Args:
+            sequence (int): sequence number of the last frame the caller has seen
+            out (numpy.ndarray): array to copy the frame to, shape (length, 3)
+            timeout (float, optional): seconds to wait, waits forever if None
+            index_range (list, optional): range of LED indices to count the updated LEDs in, all if None
+
+        Returns:
+            info (FrameInfo): sequence number, timestamp and the number of LEDs updated after `sequence`,
+                None if there was no new frame within the timeout
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: int(self._header[0]) != sequence, timeout):
+                return None
+            return self._read(out, sequence, index_range)
+
+    def _read(self, out, sequence, index_range):
+        np.copyto(out, self._frame)
+        stamps = self._stamps if index_range is None else self._stamps[index_range[0]:index_range[1]]
+        updated = int(np.count_nonzero(stamps > sequence))
+        return FrameInfo(self.sequence, self.timestamp, updated, float(self._written[0]))
+
+    def close(self):
+        """Detach from the shared memory, and free it if this is the process that created it.
+        """
+        if self._shm is None:
+            return
+        # the views must go before the memory can be closed
+        self._header = self._timestamp = self._link_cost = self._written = self._stamps = self._frame = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
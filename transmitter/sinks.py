@@ -0,0 +1,273 @@
+import logging
+import socket
+from urllib.parse import urlsplit, parse_qs
+
+from .network_protocol import PROTOCOLS, is_multicast
+from .null_serial import NullSerial
+from .protocol import DELTA_VERSION, AsciiProtocol, BinaryProtocol, negotiate
+
+
+def output_sink(port, baud=9600, protocol="auto", checksum=True):
+    """Create the output sink for a `port` setting.
+
+    Args:
+        port (str): serial port name, None for the first serial device found when the sink is opened,
+            "null" to discard the data like a board at the given baud rate would, or a URL of a network controller: "ddp://host[:port]", "wled://host[:port][?timeout=2]"
+            or "e131://host[:port][?universe=1]", where the host "multicast" sends every universe to its
+            multicast group
+        baud (int): baud rate of the serial communication
+        protocol (str): serial protocol, "auto" to negotiate with the receiver, "binary" or "ascii"
+        checksum (bool): append a checksum to the binary serial packets
+
+    Returns:
+        OutputSink: sink, not open yet
+
+    Raises:
+        ValueError: unknown network protocol
+    """
+    if port is not None and "://" in port:
+        url = urlsplit(port)
+        if url.scheme not in PROTOCOLS:
+            raise ValueError(f"Unknown network protocol: '{url.scheme}'")
+        options = {key: int(values[-1]) for key, values in parse_qs(url.query).items()}
+        if "universe" in options:
+            options["first_universe"] = options.pop("universe")
+        return UdpSink(url.hostname, url.port, url.scheme, options)
+    return SerialSink(port, baud, protocol=protocol, checksum=checksum)
+
+
+def discover_port():
+    """Find the first serial port a receiver board could be on, without waiting for one.
+
+    Returns:
+        str: serial port name
+
+    Raises:
+        OSError: no serial devices are connected
+    """
+    from serial.tools import list_ports
+    ports = [port.device for port in list_ports.comports() if "Bluetooth" not in port.device]
+    if not ports:
+        raise OSError("No serial devices connected")
+    return ports[0]
+
+
+class OutputSink:
+    """Where the transmitter sends the frames to.
+
+    A sink is opened when the first frame is sent and reopened after an
+    OSError. The transmitter decides which LEDs changed, the sink encodes
+    them for the controller and writes them.
+
+    Attributes:
+        name (str): protocol the sink speaks, known once it is open
+        deltas (bool): the controller shows frames of only the changed LEDs, whole frames are sent if False
+        refresh_interval (float): seconds after which the whole frame is sent again if nothing changed,
+            so the controller does not time out and blank the LEDs
+    """
+    name = None
+    deltas = False
+    refresh_interval = 1.0
+
+    def open(self):
+        """Connect to the controller.
+
+        Returns:
+            self
+
+        Raises:
+            OSError: the controller cannot be reached
+        """
+        return self
+
+    def send(self, frame, changed, keyframe=False):
+        """Encode and write a frame.
+
+        Args:
+            frame (numpy.ndarray): RGB values of the whole strip, shape (LEDs, 3)
+            changed (numpy.ndarray): indices of the LEDs that changed
+            keyframe (bool): send all the LEDs
+
+        Returns:
+            int: number of bytes written
+
+        Raises:
+            OSError: the write failed
+        """
+        raise NotImplementedError
+
+    def full_size(self, length, updated):
+        """Number of bytes needed to send the updated LEDs without any change suppression.
+
+        Args:
+            length (int): number of LEDs in the strip
+            updated (int): number of LEDs with a new value
+
+        Returns:
+            int: number of bytes
+        """
+        raise NotImplementedError
+
+    def link_time(self, size):
+        """Shortest time the link takes to carry the data, even if the write returned sooner.
+
+        Args:
+            size (int): number of bytes written
+
+        Returns:
+            float: seconds
+        """
+        return 0.0
+
+    def close(self):
+        """Disconnect, the sink can be opened again.
+        """
+
+
+class SerialSink(OutputSink):
+    """Sends the frames to a receiver board on a serial port with the flashy protocols.
+
+    Args:
+        port (str): serial port name, "null" to discard the data like a board at the given baud rate would,
+            None for the first serial device connected when the sink is opened
+        baud (int): baud rate of the serial communication
+        protocol (str): "auto" to negotiate with the receiver, "binary" or "ascii"
+        checksum (bool): append a checksum to the binary packets
+
+    Attributes:
+        serial (serial.Serial): serial port, None if not open
+        encoder (AsciiProtocol/BinaryProtocol): protocol used by the receiver, None until open
+    """
+
+    def __init__(self, port, baud=9600, protocol="auto", checksum=True):
+        self.port = port
+        self.baud = baud
+        self.protocol = protocol
+        self.checksum = checksum
+        self.serial = None
+        self.encoder = None
+        self.logger = logging.getLogger(f"SerialSink_{port}")
+
+    @property
+    def name(self):
+        return None if self.encoder is None else self.encoder.name
+
+    @property
+    def deltas(self):
+        return self.encoder is not None and self.encoder.deltas
+
+    @property
+    def refresh_interval(self):
+        return OutputSink.refresh_interval if self.encoder is None else self.encoder.refresh_interval
+
+    def open(self):
+        if self.port == "null":
+            self.serial = NullSerial(self.baud, timeout=1)
+        else:
+            # pyserial is only loaded for a real port
+            from serial import Serial
+            port = self.port
+            if port is None:
+                port = discover_port()
+                self.logger.info(f"Found a serial device on {port}")
+            self.serial = Serial(port, self.baud, timeout=1)
+        self.encoder = self._negotiate()
+        return self
+
+    def _negotiate(self):
+        """Pick the protocol to talk to the receiver with.
+
+        Returns:
+            encoder (AsciiProtocol/BinaryProtocol): protocol encoder
+        """
+        if self.protocol == "ascii":
+            return AsciiProtocol()
+        if self.protocol == "binary":
+            return BinaryProtocol(checksum=self.checksum)
+
+        version = negotiate(self.serial)
+        if version is None:
+            self.logger.info("The receiver did not answer the handshake, falling back to the ascii protocol")
+            return AsciiProtocol()
+        deltas = version >= DELTA_VERSION
+        self.logger.info(f"The receiver speaks protocol version {version}, using the binary protocol" +
+                         ("" if deltas else " without delta packets"))
+        return BinaryProtocol(checksum=self.checksum, deltas=deltas)
+
+    def send(self, frame, changed, keyframe=False):
+        data = self.encoder.encode(frame, changed, keyframe=keyframe)
+        self.serial.write(data)
+        return len(data)
+
+    def full_size(self, length, updated):
+        return self.encoder.full_size(length, updated)
+
+    def link_time(self, size):
+        # 10 bits per byte with the start and stop bits
+        return size * 10 / self.baud
+
+    def close(self):
+        if self.serial is not None:
+            self.serial.close()
+            self.serial = None
+
+
+class UdpSink(OutputSink):
+    """Sends whole frames to a network LED controller over UDP.
+
+    The controllers have no delta mode, a frame with any change is sent whole,
+    and an unchanged frame is sent again at the refresh interval of the protocol,
+    before the controller leaves realtime mode.
+
+    The datagrams of a frame are preallocated by the protocol and sent back
+    to back, a frame costs one copy of the colours and one sendto per
+    datagram. Multicast destinations are sent with a TTL of 1, so they stay
+    on the local network.
+
+    Args:
+        host (str): address of the controller
+        port (int, optional): UDP port, the default port of the protocol if None
+        protocol (str): "ddp", "e131" or "wled"
+        options (dict, optional): keyword arguments of the protocol, e.g. {"first_universe": 1} for "e131"
+
+    Attributes:
+        encoder (DdpProtocol/E131Protocol/WledProtocol): protocol encoder, None until the first frame
+    """
+    def __init__(self, host, port=None, protocol="ddp", options=None):
+        self.host = host
+        self.port = port
+        self.name = protocol
+        self.options = options or {}
+        self.encoder = None
+        self._length = None
+        self._socket = None
+
+    def open(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        return self
+
+    @property
+    def refresh_interval(self):
+        return OutputSink.refresh_interval if self.encoder is None else self.encoder.refresh_interval
+
+    def _encoder(self, length):
+        if self.encoder is None or self._length != length:
+            self.encoder = PROTOCOLS[self.name](length, self.host, self.port, **self.options)
+            self._length = length
+            if any(is_multicast(address[0]) for _, address in self.encoder.packets):
+                self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        return self.encoder
+
+    def send(self, frame, changed, keyframe=False):
+        size = 0
+        for datagram, address in self._encoder(len(frame)).encode(frame):
+            size += self._socket.sendto(datagram, address)
+        return size
+
+    def full_size(self, length, updated):
+        return self._encoder(length).size
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
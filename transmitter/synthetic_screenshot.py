@@ -0,0 +1,86 @@
+import logging
+
+import numpy as np
+
+
+class SyntheticScreenshot(object):
+    """Capture session returning generated frames instead of the screen,
+    for benchmarks and for running without a display.
+
+    A few frames are generated when the session is opened and returned in turn.
+    The patterns are computed from the screen coordinates, so the regions of
+    one reader fit together like on a real screen:
+
+    - "noise": random pixels, no two consecutive grabs are the same
+    - "gradient": smooth colour waves moving across the screen, like videos
+    - "static": the same frame every time, like a desktop nobody touches
+
+    Args:
+        bbox (tuple): region of the screen, (x1, y1, x2, y2)
+        pattern (str): "noise", "gradient" or "static"
+        frames (int): number of frames to generate and cycle through
+        seed (int): random seed
+    """
+    def __init__(self, bbox, pattern="noise", frames=4, seed=0):
+        self.bbox = (bbox[0], bbox[1], bbox[2], bbox[3])
+        self.logger = logging.getLogger("SyntheticScreenshot")
+        self.size = (self.bbox[2]-self.bbox[0], self.bbox[3]-self.bbox[1])
+        self.position = (self.bbox[0], self.bbox[1])
+        if pattern not in ("noise", "gradient", "static"):
+            raise ValueError(f"Unknown synthetic pattern: '{pattern}'")
+        self.pattern = pattern
+        self.count = 1 if pattern == "static" else frames
+        self.seed = seed
+        self._frames = None
+        self._array = None
+        self._index = 0
+
+    def open(self):
+        """Generate the frames.
+
+        Returns:
+            self
+        """
+        if self.pattern == "noise":
+            rng = np.random.default_rng((self.seed, *self.bbox))
+            self._frames = [
+                rng.integers(0, 256, size=(self.size[1], self.size[0], 4), dtype=np.uint8)
+                for _ in range(self.count)
+            ]
+        else:
+            x = np.arange(self.bbox[0], self.bbox[2])[None, :, None] / 1000
+            y = np.arange(self.bbox[1], self.bbox[3])[:, None, None] / 1000
+            phase = np.random.default_rng(self.seed).random(4)[None, None, :] * 2 * np.pi
+            self._frames = [
+                (127.5 * (1 + np.sin(2 * np.pi * (x + 0.5 * y + i / self.count) + phase))).astype(np.uint8)
+                for i in range(self.count)
+            ]
+        return self
+
+    def grab(self):
+        """Return the next frame.
+
+        Returns:
+            numpy.ndarray: BGRA pixel buffer with the shape (height, width, 4)
+        """
+        self._array = self._frames[self._index % len(self._frames)]
+        self._index += 1
+        return self._array
+
+    @property
+    def array(self):
+        """numpy.ndarray: BGRA pixel buffer of the last grab with the shape (height, width, 4)"""
+        return self._array
+
+    def close(self):
+        """Drop the frames.
+        """
+        self._frames = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        self.logger.debug(f"exit called with exc_type={exc_type}, " +
+                          f"exc_value={exc_value}, exc_traceback={exc_traceback}")
@@ -0,0 +1,101 @@
+import logging
+
+import numpy as np
+
+
+class VideoScreenshot(object):
+    """Capture session decoding a video file instead of capturing the screen.
+
+    Needs OpenCV (`pip install opencv-python`), which is only imported when the
+    session is opened. Every grab decodes the next frame, the video is scaled
+    to `size` and placed at `origin` on the screen.
+
+    Args:
+        bbox (tuple): region of the screen, (x1, y1, x2, y2)
+        path (str): path of the video file
+        size (tuple, optional): (width, height) to scale the video to, the size of the video if None
+        origin (tuple): screen coordinates of the top left pixel of the video
+        loop (bool): start over at the end of the video, otherwise grabbing fails at the end
+    """
+    def __init__(self, bbox, path, size=None, origin=(0, 0), loop=True):
+        self.bbox = (bbox[0], bbox[1], bbox[2], bbox[3])
+        self.logger = logging.getLogger("VideoScreenshot")
+        self.size = (self.bbox[2]-self.bbox[0], self.bbox[3]-self.bbox[1])
+        self.position = (self.bbox[0], self.bbox[1])
+        self.path = path
+        self.video_size = None if size is None else (size[0], size[1])
+        self.origin = (origin[0], origin[1])
+        self.loop = loop
+        self._cv2 = None
+        self._video = None
+        self._array = None
+
+    def open(self):
+        """Open the video.
+
+        Returns:
+            self
+
+        Raises:
+            ImportError: OpenCV is not installed
+            OSError: the video cannot be opened
+        """
+        try:
+            import cv2
+        except ImportError as e:
+            raise ImportError("The video capture backend needs OpenCV: pip install opencv-python") from e
+        self._cv2 = cv2
+        self._video = cv2.VideoCapture(self.path)
+        if not self._video.isOpened():
+            raise OSError(f"Cannot open the video {self.path}")
+        if self.video_size is None:
+            self.video_size = (int(self._video.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                               int(self._video.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self._x1, self._y1 = self.position[0] - self.origin[0], self.position[1] - self.origin[1]
+        if self._x1 < 0 or self._y1 < 0 or self._x1 + self.size[0] > self.video_size[0] \
+                or self._y1 + self.size[1] > self.video_size[1]:
+            raise ValueError(f"The video {self.path} does not cover the region {self.bbox}")
+        self._array = np.zeros((self.size[1], self.size[0], 4), dtype=np.uint8)
+        return self
+
+    def grab(self):
+        """Decode the next frame and copy the region out of it.
+
+        Returns:
+            numpy.ndarray: BGRA pixel buffer with the shape (height, width, 4),
+                overwritten by the next grab
+
+        Raises:
+            EOFError: the video ended and `loop` is off
+        """
+        ok, frame = self._video.read()
+        if not ok and self.loop:
+            self._video.set(self._cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._video.read()
+        if not ok:
+            raise EOFError(f"No more frames in {self.path}")
+        if (frame.shape[1], frame.shape[0]) != self.video_size:
+            frame = self._cv2.resize(frame, self.video_size, interpolation=self._cv2.INTER_AREA)
+        # OpenCV decodes to BGR, the alpha channel stays 0
+        self._array[:, :, :3] = frame[self._y1:self._y1 + self.size[1], self._x1:self._x1 + self.size[0]]
+        return self._array
+
+    @property
+    def array(self):
+        """numpy.ndarray: BGRA pixel buffer of the last grab with the shape (height, width, 4)"""
+        return self._array
+
+    def close(self):
+        """Close the video.
+        """
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        self.logger.debug(f"exit called with exc_type={exc_type}, " +
+                          f"exc_value={exc_value}, exc_traceback={exc_traceback}")
@@ -0,0 +1,196 @@
+import ctypes
+import logging
+import os
+import select
+import struct
+import threading
+from sys import platform
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC if hasattr(os, "O_CLOEXEC") else 0
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class Inotify:
+    """Minimal inotify binding through ctypes, waking up when a file in a watched directory is written.
+
+    Directories are watched instead of the files, editors often save by
+    writing a new file and renaming it over the old one.
+
+    Raises:
+        OSError: inotify is not available
+    """
+    def __init__(self):
+        if not platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        # libc is already loaded, find_library would run ldconfig in a subprocess
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._libc.inotify_init1.argtypes = [ctypes.c_int]
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories = set()
+
+    def add(self, directory):
+        """Watch a directory, once.
+
+        Args:
+            directory (str): directory path
+
+        Raises:
+            OSError: the directory cannot be watched
+        """
+        if directory in self._directories:
+            return
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if self._libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self._directories.add(directory)
+
+    def wait(self, timeout, wake_fd=None):
+        """Wait for events and read them.
+
+        Args:
+            timeout (float): seconds to wait at most
+            wake_fd (int, optional): file descriptor that ends the wait when it becomes readable
+
+        Returns:
+            set[str]: names of the files with an event, relative to their directory
+        """
+        fds = [self.fd] if wake_fd is None else [self.fd, wake_fd]
+        if self.fd not in select.select(fds, [], [], timeout)[0]:
+            return set()
+        names = set()
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def close(self):
+        """Close the inotify instance and all its watches.
+        """
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class FileWatcher(threading.Thread):
+    """Thread calling back when any of a few files changes.
+
+    With inotify the change is noticed right away. The files are also checked
+    every `interval` seconds, which is all there is where inotify is not
+    available. A file changed when its modification time or size is not the
+    same any more. Events are debounced, so an editor writing a file in
+    several steps triggers one callback, and nothing is reported while a file
+    is missing, e.g. between deleting and renaming.
+
+    Args:
+        paths (list[str]): files to watch
+        callback (callable): called with the list of changed paths, from the watcher thread
+        interval (float): seconds between checking the files
+        debounce (float): seconds to wait for more events after a change
+
+    Attributes:
+        paths (list[str]): files watched
+        logger (Logger): logger object used to write logs from this thread
+    """
+    def __init__(self, paths, callback, interval=1.0, debounce=0.2):
+        super(FileWatcher, self).__init__(name="FileWatcher")
+        self.daemon = True
+        self.callback = callback
+        self.interval = interval
+        self.debounce = debounce
+        self.logger = logging.getLogger(self.name)
+        self._stop_event = threading.Event()
+        # written to by `stop`, so the thread does not sleep out the rest of an inotify wait
+        self._wake_read, self._wake_write = os.pipe()
+        self._wake_lock = threading.Lock()
+        self.watch(paths)
+
+    def watch(self, paths):
+        """Replace the files watched, changes from now on are reported.
+
+        Args:
+            paths (list[str]): files to watch
+        """
+        self.paths = list(paths)
+        self._stamps = {path: _stamp(path) for path in self.paths}
+
+    def stop(self):
+        """Stop watching, the thread finishes right away, or after the callback it is running.
+        """
+        self._stop_event.set()
+        with self._wake_lock:
+            # the thread closes the pipe when it finishes
+            if self._wake_write >= 0:
+                os.write(self._wake_write, b"\0")
+
+    def run(self):
+        try:
+            inotify = Inotify()
+        except OSError as e:
+            self.logger.debug(f"Polling the files every {self.interval}s, inotify is not available: {e}")
+            inotify = None
+
+        try:
+            while not self._stop_event.is_set():
+                paths = self.paths
+                if inotify is not None:
+                    try:
+                        for path in paths:
+                            inotify.add(os.path.dirname(os.path.abspath(path)))
+                    except OSError as e:
+                        self.logger.debug(f"Polling the files every {self.interval}s: {e}")
+                        inotify.close()
+                        inotify = None
+                if inotify is None:
+                    self._stop_event.wait(self.interval)
+                elif inotify.wait(self.interval, self._wake_read) & {os.path.basename(path) for path in paths}:
+                    # let the editor finish writing
+                    self._stop_event.wait(self.debounce)
+                    inotify.wait(0)
+                if not self._stop_event.is_set():
+                    self._check(paths)
+        finally:
+            if inotify is not None:
+                inotify.close()
+            with self._wake_lock:
+                os.close(self._wake_read)
+                os.close(self._wake_write)
+                self._wake_read = self._wake_write = -1
+
+    def _check(self, paths):
+        stamps = {path: _stamp(path) for path in paths}
+        if paths is not self.paths or None in stamps.values():
+            return
+        changed = [path for path in paths if stamps[path] != self._stamps.get(path)]
+        if not changed:
+            return
+        self._stamps = stamps
+        self.logger.debug(f"Changed: {', '.join(changed)}")
+        try:
+            self.callback(changed)
+        except Exception as e:
+            self.logger.error(f"Reloading after a change of {', '.join(changed)} failed: {e}")
+
+
+def _stamp(path):
+    """Modification time and size of a file, None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,342 @@
+import ctypes
+import logging
+import threading
+from ctypes import POINTER, Structure, byref, c_char_p, c_int, c_uint, c_ulong, c_void_p
+from ctypes.util import find_library
+
+import numpy as np
+
+
+class XImage(Structure):
+    _fields_ = [
+        ("width", c_int),
+        ("height", c_int),
+        ("xoffset", c_int),
+        ("format", c_int),
+        ("data", c_void_p),
+        ("byte_order", c_int),
+        ("bitmap_unit", c_int),
+        ("bitmap_bit_order", c_int),
+        ("bitmap_pad", c_int),
+        ("depth", c_int),
+        ("bytes_per_line", c_int),
+        ("bits_per_pixel", c_int),
+        ("red_mask", c_ulong),
+        ("green_mask", c_ulong),
+        ("blue_mask", c_ulong),
+        ("obdata", c_void_p),
+        ("f", c_void_p * 6),
+    ]
+
+
+class XShmSegmentInfo(Structure):
+    _fields_ = [
+        ("shmseg", c_ulong),
+        ("shmid", c_int),
+        ("shmaddr", c_void_p),
+        ("readOnly", c_int),
+    ]
+
+
+class XErrorEvent(Structure):
+    _fields_ = [
+        ("type", c_int),
+        ("display", c_void_p),
+        ("resourceid", c_ulong),
+        ("serial", c_ulong),
+        ("error_code", ctypes.c_ubyte),
+        ("request_code", ctypes.c_ubyte),
+        ("minor_code", ctypes.c_ubyte),
+    ]
+
+
+ZPIXMAP = 2
+ALL_PLANES = c_ulong(-1).value
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+_xlib = None
+_xext = None
+_libc = None
+# X error codes of every open session by display connection, the error handler is process-wide
+_errors = {}
+_errors_lock = threading.Lock()
+# the handler installed before the first session opened, e.g. by mss
+_previous_handler = None
+
+
+def _load_libraries():
+    """Load Xlib, Xext and libc and declare the functions used here.
+
+    Raises:
+        OSError: a library is missing
+    """
+    global _xlib, _xext, _libc
+    if _xlib is not None:
+        return
+
+    names = {name: find_library(name) for name in ("X11", "Xext", "c")}
+    missing = [name for name, path in names.items() if path is None]
+    if missing:
+        raise OSError(f"Libraries not found: {', '.join(missing)}")
+    xlib, xext = ctypes.CDLL(names["X11"]), ctypes.CDLL(names["Xext"])
+    libc = ctypes.CDLL(names["c"], use_errno=True)
+
+    xlib.XOpenDisplay.argtypes = [c_char_p]
+    xlib.XOpenDisplay.restype = c_void_p
+    xlib.XCloseDisplay.argtypes = [c_void_p]
+    xlib.XDefaultScreen.argtypes = [c_void_p]
+    xlib.XRootWindow.argtypes = [c_void_p, c_int]
+    xlib.XRootWindow.restype = c_ulong
+    xlib.XDefaultVisual.argtypes = [c_void_p, c_int]
+    xlib.XDefaultVisual.restype = c_void_p
+    xlib.XDefaultDepth.argtypes = [c_void_p, c_int]
+    xlib.XSync.argtypes = [c_void_p, c_int]
+    xlib.XFree.argtypes = [c_void_p]
+    xlib.XSetErrorHandler.restype = c_void_p
+
+    xext.XShmQueryExtension.argtypes = [c_void_p]
+    xext.XShmCreateImage.argtypes = [
+        c_void_p, c_void_p, c_uint, c_int, c_void_p, POINTER(XShmSegmentInfo), c_uint, c_uint]
+    xext.XShmCreateImage.restype = POINTER(XImage)
+    xext.XShmAttach.argtypes = [c_void_p, POINTER(XShmSegmentInfo)]
+    xext.XShmDetach.argtypes = [c_void_p, POINTER(XShmSegmentInfo)]
+    xext.XShmGetImage.argtypes = [c_void_p, c_ulong, POINTER(XImage), c_int, c_int, c_ulong]
+
+    libc.shmget.argtypes = [c_int, ctypes.c_size_t, c_int]
+    libc.shmat.argtypes = [c_int, c_void_p, c_int]
+    libc.shmat.restype = c_void_p
+    libc.shmdt.argtypes = [c_void_p]
+    libc.shmctl.argtypes = [c_int, c_int, c_void_p]
+    xlib.XSetErrorHandler.argtypes = [c_void_p]
+    _xlib, _xext, _libc = xlib, xext, libc
+
+
+class XShmAttachError(OSError):
+    """The X server has the MIT-SHM extension but cannot attach the shared memory,
+    e.g. over ssh -X or from another IPC namespace."""
+
+
+_ErrorHandler = ctypes.CFUNCTYPE(c_int, c_void_p, POINTER(XErrorEvent))
+
+
+@_ErrorHandler
+def _error_handler(display, event):
+    # the default handler exits the process on any X error, the errors of the sessions are recorded instead
+    with _errors_lock:
+        errors = _errors.get(display)
+        if errors is not None:
+            errors.append(event.contents.error_code)
+            return 0
+        previous = _previous_handler
+    # a connection of someone else, e.g. mss
+    if previous:
+        return _ErrorHandler(previous)(display, event)
+    return 0
+
+
+_ERROR_HANDLER = ctypes.cast(_error_handler, c_void_p).value
+
+
+def _watch_errors(display):
+    """Record the X errors of a display connection, installing the error handler for the first one.
+
+    Args:
+        display (int): Display pointer
+    """
+    global _previous_handler
+    with _errors_lock:
+        if not _errors:
+            _previous_handler = _xlib.XSetErrorHandler(_error_handler)
+        _errors[display] = []
+
+
+def _unwatch_errors(display):
+    """Stop recording the X errors of a display connection, restoring the previous handler after the last one.
+
+    Args:
+        display (int): Display pointer
+    """
+    global _previous_handler
+    with _errors_lock:
+        if _errors.pop(display, None) is None or _errors:
+            return
+        replaced = _xlib.XSetErrorHandler(_previous_handler)
+        if replaced != _ERROR_HANDLER:
+            # installed by someone else since, leave theirs
+            _xlib.XSetErrorHandler(replaced)
+        _previous_handler = None
+
+
+def _take_errors(display):
+    """X error codes recorded for a display connection since the last call.
+
+    Args:
+        display (int): Display pointer
+
+    Returns:
+        list[int]: error codes
+    """
+    with _errors_lock:
+        errors = _errors.get(display, [])
+        _errors[display] = []
+        return errors
+
+
+class XShmScreenshot(object):
+    """Capture session using the MIT-SHM extension of X11.
+
+    The X server writes the captured region straight into a shared memory
+    segment, which is exposed as a numpy array without any copy.
+    The segment, the connection and the image are created once when the
+    session is opened and reused for every frame.
+    """
+    def __init__(self, bbox):
+        self.bbox = (bbox[0], bbox[1], bbox[2], bbox[3])
+        self.logger = logging.getLogger("XShmScreenshot")
+        self.size = (self.bbox[2]-self.bbox[0], self.bbox[3]-self.bbox[1])
+        self.position = (self.bbox[0], self.bbox[1])
+        self._display = None
+        self._image = None
+        self._shminfo = None
+        self._array = None
+        self._attached = False
+        self._removed = False
+
+    @classmethod
+    def available(cls):
+        """Check whether an X display with the MIT-SHM extension can be used,
+        by attaching the shared memory of a one pixel image.
+
+        Returns:
+            bool: True if the backend can be used
+        """
+        try:
+            with cls((0, 0, 1, 1)):
+                return True
+        except OSError:
+            return False
+
+    def open(self):
+        """Connect to the X display and set up the shared memory image.
+
+        Returns:
+            self
+
+        Raises:
+            XShmAttachError: the X server cannot attach the shared memory
+            OSError: the display, the extension or the shared memory is not available
+        """
+        _load_libraries()
+        self._display = _xlib.XOpenDisplay(None)
+        if not self._display:
+            raise OSError("Cannot open the X display")
+        _watch_errors(self._display)
+        try:
+            self._create_image()
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def _create_image(self):
+        if not _xext.XShmQueryExtension(self._display):
+            raise OSError("The X server does not support the MIT-SHM extension")
+        screen = _xlib.XDefaultScreen(self._display)
+        self._root = _xlib.XRootWindow(self._display, screen)
+        self._shminfo = XShmSegmentInfo()
+        self._image = _xext.XShmCreateImage(
+            self._display,
+            _xlib.XDefaultVisual(self._display, screen),
+            _xlib.XDefaultDepth(self._display, screen),
+            ZPIXMAP, None, byref(self._shminfo),
+            self.size[0], self.size[1]
+        )
+        if not self._image:
+            raise OSError("XShmCreateImage failed")
+        image = self._image.contents
+        if image.bits_per_pixel != 32:
+            raise OSError(f"Unsupported pixel format: {image.bits_per_pixel} bits per pixel")
+
+        length = image.bytes_per_line * image.height
+        self._shminfo.shmid = _libc.shmget(IPC_PRIVATE, length, IPC_CREAT | 0o600)
+        if self._shminfo.shmid < 0:
+            raise OSError(ctypes.get_errno(), "shmget failed")
+        address = _libc.shmat(self._shminfo.shmid, None, 0)
+        if address is None or address == c_void_p(-1).value:
+            errno = ctypes.get_errno()
+            _libc.shmctl(self._shminfo.shmid, IPC_RMID, None)
+            raise OSError(errno, "shmat failed")
+        self._shminfo.shmaddr = image.data = address
+        self._shminfo.readOnly = 0
+        # the errors of the request arrive asynchronously, XSync waits for them
+        _take_errors(self._display)
+        attached = _xext.XShmAttach(self._display, byref(self._shminfo))
+        _xlib.XSync(self._display, 0)
+        errors = _take_errors(self._display)
+        if not attached or errors:
+            raise XShmAttachError(f"XShmAttach failed, X error codes: {errors}")
+        self._attached = True
+        # the segment is removed as soon as both the server and this process detach from it
+        _libc.shmctl(self._shminfo.shmid, IPC_RMID, None)
+        self._removed = True
+
+        self._array = np.frombuffer(
+            (ctypes.c_ubyte * length).from_address(address), dtype=np.uint8
+        ).reshape(image.height, image.bytes_per_line // 4, 4)
+
+    def grab(self):
+        """Capture the region into the shared memory segment.
+
+        Returns:
+            numpy.ndarray: BGRX pixel buffer with the shape (height, bytes_per_line/4, 4),
+                a view of the shared memory that is overwritten by the next grab
+
+        Raises:
+            OSError: the X server could not capture the region
+        """
+        captured = _xext.XShmGetImage(self._display, self._root, self._image,
+                                      self.position[0], self.position[1], ALL_PLANES)
+        errors = _take_errors(self._display)
+        if not captured or errors:
+            raise OSError(f"XShmGetImage failed, X error codes: {errors}")
+        return self._array
+
+    @property
+    def array(self):
+        """numpy.ndarray: BGRX pixel buffer of the last grab with the shape (height, bytes_per_line/4, 4)"""
+        return self._array
+
+    def close(self):
+        """Detach the shared memory and close the connection.
+        """
+        self._array = None
+        if self._shminfo is not None and self._shminfo.shmaddr:
+            if self._display and self._attached:
+                _xext.XShmDetach(self._display, byref(self._shminfo))
+                _xlib.XSync(self._display, 0)
+            _libc.shmdt(self._shminfo.shmaddr)
+            if not self._removed:
+                # the attach failed before the segment was marked for removal
+                _libc.shmctl(self._shminfo.shmid, IPC_RMID, None)
+            self._shminfo = None
+            self._attached = self._removed = False
+        if self._image:
+            # the data is the shared memory and obdata the segment info, XFree must not touch them
+            self._image.contents.data = None
+            self._image.contents.obdata = None
+            _xlib.XFree(self._image)
+            self._image = None
+        if self._display:
+            _xlib.XCloseDisplay(self._display)
+            _unwatch_errors(self._display)
+            self._display = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        self.logger.debug(f"exit called with exc_type={exc_type}, " +
+                          f"exc_value={exc_value}, exc_traceback={exc_traceback}")